@@ -0,0 +1,15 @@
+import os
+import threading
+
+
+def post_worker_init(worker):
+    """
+    Warm the cache with the most accessed fields when a worker boots. This
+    runs in the background so the worker does not miss its heartbeat, and
+    workers booting together share one execution of each query.
+    """
+    if os.environ.get("WARM_CACHE", "1") == "0":
+        return
+    from src.cache_warming import warm_cache
+
+    threading.Thread(target=warm_cache, daemon=True).start()
@@ -3,3 +3,66 @@ HIERARCHY_FILENAME = "ukbb_data_field_hierarchy_new.csv"
 STORAGE_BUCKET = "biobank-visualisation.appspot.com"
 
 MAX_SELECTIONS = 30
+
+DATASET_FILENAME = "ukbb-dataset.csv"
+COLUMN_STORE_DIRNAME = "ukbb-columns"
+
+# Upper bound on the decoded query results kept in memory by each worker
+LOCAL_CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+# Serialisation of results in the shared cache, see src/codec.py
+CACHE_CODEC = "arrow-zstd"
+
+# Backends of the shared cache, see src/cache_backends.py
+CACHE_MEMORY_MAX_BYTES = 512 * 1024 ** 2
+CACHE_DISK_FILENAME = "ukbb-cache.sqlite3"
+CACHE_DISK_MAX_BYTES = 4 * 1024 ** 3
+# Seconds between two writes of the entries read from the disk cache
+CACHE_DISK_TOUCH_SECONDS = 10
+# Points of each node on the consistent hashing ring of a sharded cache
+CACHE_RING_REPLICAS = 128
+
+FIELD_STATISTICS_FILENAME = "ukbb-field-statistics.json"
+
+# Results are cached for a month, cache keys include the dataset version
+CACHE_TTL_SECONDS = 30 * 24 * 3600
+# Interval at which workers check whether the dataset has been refreshed
+DATASET_VERSION_CHECK_SECONDS = 60
+
+# Approximate number of participants, used when the dataset size is unknown
+COHORT_SIZE = 502_000
+
+# Number of rows read at a time when evaluating queries on the local dataset
+STREAM_CHUNK_ROWS = 50_000
+
+# Time after which a worker that died while executing a query stops other
+# workers from waiting for its result, see src/single_flight.py
+QUERY_LEASE_MS = 120_000
+
+# Connections opened by each worker, see src/resources.py
+REDIS_MAX_CONNECTIONS = 16
+REDIS_POOL_TIMEOUT = 5
+BIGQUERY_MAX_CONNECTIONS = 16
+
+# Sorted set of the number of queries that accessed each data field
+ACCESS_COUNTS_KEY = "access:fields"
+# Seconds between flushes of the access counts of a worker to the cache
+ACCESS_FLUSH_SECONDS = 10
+
+# Cache warming at worker boot, see src/cache_warming.py
+WARM_TOP_FIELDS = 200
+WARM_BUDGET_SECONDS = 60
+
+ENCODING_CATALOG_FILENAME = "ukbb-encodings.arrow"
+
+# Admission control, see src/admission.py. Results of a single request are
+# bounded by the request budget, as large as the local cache of a worker, and
+# those of the queries running concurrently on a worker by the worker budget.
+QUERY_BUDGET_BYTES = LOCAL_CACHE_MAX_BYTES
+WORKER_BUDGET_BYTES = 2 * LOCAL_CACHE_MAX_BYTES
+# Time a query waits for the worker budget before being rejected
+ADMISSION_QUEUE_SECONDS = 10
+# Tighter budgets for results that are expensive to process: embeddings, and
+# scatter plots with a non-linear (lowess) trendline
+EMBEDDING_BUDGET_BYTES = 8 * 1024 ** 2
+LOWESS_BUDGET_BYTES = 1024 ** 2
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import atexit
+import threading
+import time
+from collections import Counter
+from typing import Iterable
+
+from src._constants import ACCESS_COUNTS_KEY, ACCESS_FLUSH_SECONDS
+
+
+class AccessCounter:
+    """
+    Counts the accesses of a worker to each data field in memory.
+
+    Queries only update the counts of their worker, a background thread adds
+    them to a sorted set of the cache every `flush_seconds`, and when the
+    worker exits. Counts that could not be flushed are kept for the next
+    flush.
+    """
+
+    def __init__(
+        self,
+        client,
+        name: str = ACCESS_COUNTS_KEY,
+        flush_seconds: float = ACCESS_FLUSH_SECONDS,
+    ):
+        """
+        :param client: cache holding the sorted set, see CacheBackend.incr_scores
+        :param name: key of the sorted set
+        :param flush_seconds: seconds between two flushes
+        """
+        self.client = client
+        self.name = name
+        self.flush_seconds = flush_seconds
+        self.reset()
+        atexit.register(self.flush)
+
+    def reset(self) -> None:
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        # Started by the first access, so that forked workers start their own
+        self._flusher = None
+
+    @property
+    def pending(self) -> int:
+        """Number of accesses not flushed yet."""
+        return sum(self._pending.values())
+
+    def record(self, fields: Iterable[str]) -> None:
+        with self._lock:
+            self._pending.update(fields)
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._run, name="access-counts", daemon=True
+                )
+                self._flusher.start()
+
+    def flush(self) -> int:
+        """
+        :return: the number of accesses added to the sorted set
+        """
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+        try:
+            self.client.incr_scores(self.name, pending)
+        except Exception as e:
+            print(f"Failed to flush access counts: {e}")
+            with self._lock:
+                self._pending.update(pending)
+            return 0
+        return sum(pending.values())
+
+    def _run(self) -> None:
+        # A reset stops the thread started before it
+        while self._flusher is threading.current_thread():
+            time.sleep(self.flush_seconds)
+            self.flush()
@@ -0,0 +1,372 @@
+from __future__ import annotations
+
+import copy
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, List, Tuple
+
+from src._constants import (
+    ADMISSION_QUEUE_SECONDS,
+    COHORT_SIZE,
+    QUERY_BUDGET_BYTES,
+    WORKER_BUDGET_BYTES,
+)
+from src.predicates import InList, NotNull, NumericCastable, Range
+from src.resources import manager as resources
+from src.value_type import ValueType
+
+# Approximate size of one value of each type in a decoded result. Numbers and
+# codings are 8 bytes, other types are held as Python strings.
+BYTES_PER_VALUE = {
+    ValueType.TEXT: 64,
+    ValueType.DATE: 32,
+    ValueType.TIME: 32,
+    ValueType.COMPOUND: 64,
+}
+DEFAULT_BYTES_PER_VALUE = 8
+
+
+class QueryRejected(Exception):
+    """Raised when a query does not fit the budgets, the message is shown to users."""
+
+
+class QueryCost:
+    """Estimated size of the result of a query, before running it."""
+
+    def __init__(self, rows: int, columns: int, bytes_: int):
+        self.rows = rows
+        self.columns = columns
+        self.bytes = bytes_
+
+    def __str__(self):
+        return (
+            f"about {self.rows:,} rows × {self.columns} columns "
+            f"({format_bytes(self.bytes)})"
+        )
+
+
+class CostModel:
+    """
+    Estimates the cost of a query as rows × columns × bytes per value.
+
+    The rows are those of the dataset, narrowed by the predicates of the query:
+    the number of values of each column that needs to be present comes from
+    the field statistics (or the participant counts of the field metadata),
+    and the selectivity of range filters from their histograms. Columns are
+    assumed to be independent, apart from presence which is bounded by the
+    sparsest column.
+    """
+
+    def __init__(
+        self,
+        statistics: Callable = None,
+        metadata: Callable = None,
+        population: Callable[[], int] = None,
+    ):
+        """
+        :param statistics: ColumnStatistics of a column, or None
+        :param metadata: FieldMetadata of a field, or None
+        :param population: number of participants in the dataset
+        """
+        self._statistics = statistics
+        self._metadata = metadata
+        self._population = population
+
+    def statistics(self, column: str):
+        if self._statistics is None:
+            # The statistics are computed through the gateway, hence the late import
+            from src.field_statistics import FieldStatisticsIndex
+
+            self._statistics = FieldStatisticsIndex.lookup
+        return self._statistics(column)
+
+    def metadata(self, column: str):
+        if self._metadata is None:
+            from src.field_metadata import MetadataCatalog
+
+            self._metadata = MetadataCatalog.get
+        return self._metadata(_field_id(column))
+
+    def population(self) -> int:
+        if self._population is not None:
+            return self._population()
+        from src.dataset_gateway import LocalClient
+
+        if LocalClient.store.is_available():
+            return LocalClient.store.num_rows
+        return COHORT_SIZE
+
+    def estimate(self, _query) -> QueryCost:
+        rows = self.rows(_query)
+        if _query.aggregates:
+            # Only the groups are transferred, one number per aggregate
+            rows = min(rows, self.groups(_query))
+            widths = [DEFAULT_BYTES_PER_VALUE] * len(_query.df_columns)
+        else:
+            widths = [self.value_bytes(column) for column in _query.df_columns]
+        return QueryCost(rows, len(widths), rows * sum(widths))
+
+    def rows(self, _query) -> int:
+        """Estimated number of rows satisfying the predicates of a query."""
+        population = self.population()
+        present, selectivity = population, 1.0
+        for predicate in _query.predicates:
+            statistics = self.statistics(predicate.column)
+            if isinstance(predicate, (NotNull, NumericCastable, Range)):
+                present = min(present, self.count(predicate.column, population))
+            if isinstance(predicate, Range) and statistics is not None:
+                selectivity *= _range_selectivity(
+                    statistics, predicate.low, predicate.high
+                )
+            elif isinstance(predicate, InList) and statistics is not None:
+                distinct = max(statistics.distinct_count, 1)
+                selectivity *= min(1.0, len(predicate.values) / distinct)
+        rows = present * selectivity
+        if _query.sampling is not None:
+            rows *= _query.sampling.fraction - _query.sampling.start
+        if _query.limit is not None:
+            rows = min(rows, _query.limit)
+        return int(rows)
+
+    def count(self, column: str, population: int) -> int:
+        """Number of participants with a value in a column."""
+        statistics = self.statistics(column)
+        if statistics is not None:
+            return statistics.count
+        field = self.metadata(column)
+        if field is not None:
+            return min(field.num_participants, population)
+        return population
+
+    def groups(self, _query) -> int:
+        """Estimated number of groups of an aggregation."""
+        groups = 1
+        for column in _query.group_by:
+            statistics = self.statistics(column)
+            if statistics is None:
+                return self.population()
+            groups *= max(statistics.distinct_count, 1)
+        return groups
+
+    def value_bytes(self, column: str) -> int:
+        if column == "eid":
+            return DEFAULT_BYTES_PER_VALUE
+        field = self.metadata(column)
+        if field is None:
+            return DEFAULT_BYTES_PER_VALUE
+        return BYTES_PER_VALUE.get(field.value_type, DEFAULT_BYTES_PER_VALUE)
+
+
+class AdmissionStats:
+    """Counts of the queries admitted by a worker, and of how they were admitted."""
+
+    def __init__(self):
+        self.admitted = 0
+        self.sampled = 0
+        self.queued = 0
+        self.rejected = 0
+        self.queued_seconds = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "sampled": self.sampled,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "queued_ms": 1000 * self.queued_seconds,
+        }
+
+
+class Admission:
+    """
+    Keeps a single request from monopolising a worker.
+
+    Each query is priced by the cost model before it runs. A query costing more
+    than the per-request budget is answered from a deterministic sample of the
+    participants if it selects rows, and rejected otherwise. Queries that fit
+    their budget run as long as the queries running on the worker fit the
+    per-worker budget: otherwise they wait for others to finish, and are
+    rejected after `queue_seconds`.
+
+    What happened is reported to the users through `notices`.
+    """
+
+    def __init__(
+        self,
+        request_budget: int = QUERY_BUDGET_BYTES,
+        worker_budget: int = WORKER_BUDGET_BYTES,
+        queue_seconds: float = ADMISSION_QUEUE_SECONDS,
+        cost_model: CostModel = None,
+    ):
+        self.request_budget = request_budget
+        self.worker_budget = worker_budget
+        self.queue_seconds = queue_seconds
+        self.cost_model = cost_model or CostModel()
+        self.stats = AdmissionStats()
+        self.reset()
+
+    def reset(self) -> None:
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def count(self, counter: str, amount: float = 1) -> None:
+        """Add to a counter of `stats`, under the lock of the worker budget."""
+        with self._condition:
+            setattr(self.stats, counter, getattr(self.stats, counter) + amount)
+
+    @property
+    def in_flight(self) -> int:
+        """Estimated bytes of the queries running on this worker."""
+        return self._in_flight
+
+    def admit(self, _query, budget: int = None) -> Tuple[object, QueryCost]:
+        """
+        :param budget: bytes the result may take, the per-request budget if None
+        :return: the query to run, which may sample the given one, and its cost
+        :raises QueryRejected: if the query is too expensive and can't be sampled
+        """
+        budget = budget or self.request_budget
+        cost = self.cost_model.estimate(_query)
+        if cost.bytes <= budget:
+            return _query, cost
+        if not _query.is_filtered_projection() or _query.sampling is not None:
+            self.count("rejected")
+            raise QueryRejected(
+                f"This query would return {cost}, more than the "
+                f"{format_bytes(budget)} allowed per request. Select fewer "
+                "fields or narrow down the range filters."
+            )
+        sampled = copy.copy(_query).sample(budget / cost.bytes)
+        sampled_cost = self.cost_model.estimate(sampled)
+        self.count("sampled")
+        notify(
+            f"A random sample of about {sampled_cost.rows:,} of an estimated "
+            f"{cost.rows:,} matching participants is shown, to stay within the "
+            f"{format_bytes(budget)} allowed per request."
+        )
+        return sampled, sampled_cost
+
+    def admit_sample(
+        self, _query, size: int, budget: int = None
+    ) -> Tuple[int, QueryCost]:
+        """
+        Admit a sample of a query drawn by its consumer, see src/sampling.py.
+
+        :param size: number of rows requested
+        :param budget: bytes the sample may take, the per-request budget if None
+        :return: the number of rows to draw, at most `size`, and their cost
+        """
+        budget = budget or self.request_budget
+        cost = self.cost_model.estimate(_query)
+        rows = min(size, cost.rows)
+        row_bytes = max(cost.bytes // max(cost.rows, 1), 1)
+        affordable = int(budget // row_bytes)
+        if rows > affordable:
+            self.count("sampled")
+            notify(
+                f"The sample was reduced from {rows:,} to {affordable:,} "
+                f"participants, to stay within the {format_bytes(budget)} "
+                "allowed per request."
+            )
+            size = rows = affordable
+        return size, QueryCost(rows, cost.columns, rows * row_bytes)
+
+    @contextmanager
+    def running(self, cost: QueryCost) -> Iterator[None]:
+        """
+        Count a query against the per-worker budget while it runs, waiting for
+        other queries to finish if needed. A query is always admitted by an
+        idle worker, whatever its cost.
+
+        :raises QueryRejected: if the worker stays busy for `queue_seconds`
+        """
+        condition = self._condition
+        with condition:
+            start = time.monotonic()
+            deadline = start + self.queue_seconds
+            queued = False
+            while self._in_flight and self._in_flight + cost.bytes > self.worker_budget:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.count("rejected")
+                    raise QueryRejected(
+                        "The explorer is busy with other queries, please try "
+                        "again in a moment."
+                    )
+                queued = True
+                condition.wait(remaining)
+            self._in_flight += cost.bytes
+            self.count("admitted")
+            if queued:
+                self.count("queued")
+                self.count("queued_seconds", time.monotonic() - start)
+        if queued:
+            notify("Your query waited for other queries to finish.")
+        try:
+            yield
+        finally:
+            with condition:
+                self._in_flight -= cost.bytes
+                condition.notify_all()
+
+
+_notices = threading.local()
+
+
+@contextmanager
+def notices() -> Iterator[List[str]]:
+    """
+    Collect the messages explaining how the queries issued by the current
+    thread were admitted, e.g. by a callback.
+    """
+    stack = _notices.__dict__.setdefault("stack", [])
+    collected: List[str] = []
+    stack.append(collected)
+    try:
+        yield collected
+    finally:
+        stack.pop()
+
+
+def notify(message: str) -> None:
+    """
+    Report a message to the innermost `notices` of the current thread. Queries
+    issued outside of `notices`, e.g. by cache warming, have nobody to tell.
+    """
+    stack = getattr(_notices, "stack", None)
+    if stack and message not in stack[-1]:
+        stack[-1].append(message)
+
+
+def format_bytes(size: float) -> str:
+    for unit in ["B", "kB", "MB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def _range_selectivity(statistics, low: float, high: float) -> float:
+    """Share of the values of a column in [low, high], from its histogram."""
+    edges, counts = statistics.histogram_edges, statistics.histogram_counts
+    total = sum(counts)
+    if not total:
+        return 1.0
+    selected = 0.0
+    for left, right, count in zip(edges, edges[1:], counts):
+        overlap = min(high, right) - max(low, left)
+        selected += count * min(max(overlap / ((right - left) or 1.0), 0.0), 1.0)
+    return min(selected / total, 1.0)
+
+
+def _field_id(column: str) -> str:
+    """Field of a column, named `31-0.0` or `_31_0_0` in PROD."""
+    if column.startswith("_"):
+        return column[1:].split("_")[0]
+    return column.split("-")[0]
+
+
+admission = Admission()
+# Queries in flight in the parent process are not running in forked workers
+resources.on_fork(admission.reset)
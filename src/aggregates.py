@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from src.predicates import _to_numeric
+from src.streaming import Aggregator
+
+# Partial results are merged once this many chunks have been aggregated, so
+# that memory stays bounded by the number of groups
+MERGE_EVERY = 16
+
+
+class Aggregate:
+    """
+    An aggregate function of a query, that can be compiled to SQL or computed
+    on a DataFrame. Partial results computed on chunks of rows are merged with
+    the same reduction that computes them.
+    """
+
+    function = None
+    reduction = None
+
+    def __init__(self, column: str = None):
+        self.column = column
+
+    @property
+    def name(self) -> str:
+        """Column of the result holding the aggregate."""
+        return f"{self.function}({self.column})"
+
+    @property
+    def columns(self) -> List[str]:
+        return [self.column]
+
+    def to_sql(self) -> str:
+        raise NotImplementedError
+
+    def values(self, frame: pd.DataFrame) -> pd.Series:
+        """Values of the rows of a frame that are reduced by the aggregate."""
+        raise NotImplementedError
+
+    def key(self) -> list:
+        """JSON-serialisable description of the aggregate, used in cache keys."""
+        return [self.function, self.column]
+
+    def __eq__(self, other):
+        return isinstance(other, Aggregate) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(json.dumps(self.key()))
+
+
+class Min(Aggregate):
+    """Smallest numeric value of a column."""
+
+    function = "min"
+    reduction = "min"
+
+    def to_sql(self) -> str:
+        return f"MIN(SAFE_CAST({self.column} AS FLOAT64))"
+
+    def values(self, frame: pd.DataFrame) -> pd.Series:
+        return _to_numeric(frame[self.column])
+
+
+class Max(Aggregate):
+    """Largest numeric value of a column."""
+
+    function = "max"
+    reduction = "max"
+
+    def to_sql(self) -> str:
+        return f"MAX(SAFE_CAST({self.column} AS FLOAT64))"
+
+    def values(self, frame: pd.DataFrame) -> pd.Series:
+        return _to_numeric(frame[self.column])
+
+
+class Count(Aggregate):
+    """Number of rows."""
+
+    function = "count"
+    reduction = "sum"
+
+    @property
+    def name(self) -> str:
+        return "count"
+
+    @property
+    def columns(self) -> List[str]:
+        return []
+
+    def to_sql(self) -> str:
+        return "COUNT(*)"
+
+    def values(self, frame: pd.DataFrame) -> pd.Series:
+        return pd.Series(np.ones(len(frame), dtype=np.int64), index=frame.index)
+
+
+class QueryAggregator(Aggregator):
+    """Aggregates of a query, computed per value of the `group_by` columns."""
+
+    def __init__(self, aggregates: List[Aggregate], group_by: List[str] = ()):
+        self.aggregates = aggregates
+        self.group_by = list(group_by)
+        self.partials: List[pd.DataFrame] = []
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        data = {
+            aggregate.name: aggregate.values(chunk) for aggregate in self.aggregates
+        }
+        for column in self.group_by:
+            data[column] = chunk[column]
+        self.partials.append(self._reduce(pd.DataFrame(data, index=chunk.index)))
+        if len(self.partials) >= MERGE_EVERY:
+            self.partials = [self._reduce(pd.concat(self.partials))]
+
+    def result(self) -> pd.DataFrame:
+        names = [aggregate.name for aggregate in self.aggregates]
+        columns = [*self.group_by, *names]
+        if not self.partials:
+            sources = [c for a in self.aggregates for c in a.columns]
+            sources.extend(self.group_by)
+            self.update(pd.DataFrame(columns=list(dict.fromkeys(sources))))
+        result = self._reduce(pd.concat(self.partials))
+        if self.group_by:
+            result = result.sort_values(self.group_by, ignore_index=True)
+        return result[columns]
+
+    def _reduce(self, frame: pd.DataFrame) -> pd.DataFrame:
+        reductions = {
+            aggregate.name: aggregate.reduction for aggregate in self.aggregates
+        }
+        if not self.group_by:
+            return pd.DataFrame(
+                {name: [frame[name].agg(how)] for name, how in reductions.items()}
+            )
+        grouped = frame.groupby(self.group_by, sort=False, dropna=True)
+        return grouped.agg(reductions).reset_index()
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List
+
+import pyarrow as pa
+from google.cloud.bigquery_storage import BigQueryReadClient, types
+
+
+class ArrowDownloader:
+    """
+    Downloads the results of BigQuery queries as Arrow record batches.
+
+    Rows are read from the destination table of the query job through the
+    BigQuery Storage API, over several read streams in parallel, instead of
+    being paged as JSON through the REST API. Results small enough to fit in
+    the first page of the REST response are read from it directly, which
+    saves creating a read session.
+    """
+
+    def __init__(
+        self,
+        client,
+        read_client: BigQueryReadClient = None,
+        max_streams: int = 8,
+        min_rows: int = 10_000,
+    ):
+        """
+        :param client: BigQuery client that runs the queries
+        :param read_client: BigQuery Storage client that downloads the results
+        :param max_streams: maximum number of read streams used per result
+        :param min_rows: results with fewer rows are read from the REST API
+        """
+        self.client = client
+        self.read_client = read_client or BigQueryReadClient()
+        self.max_streams = max_streams
+        self.min_rows = min_rows
+
+    def query(self, sql: str) -> pa.Table:
+        """Run a query and download its result."""
+        job = self.client.query(sql)
+        rows = job.result(page_size=self.min_rows)
+        if rows.total_rows < self.min_rows:
+            return rows.to_arrow(create_bqstorage_client=False)
+        return self.read_table(job.destination)
+
+    def read_table(self, table) -> pa.Table:
+        """
+        :param table: reference to the table to download
+        :return: the rows of the table, in the order of its read streams
+        """
+        session = self.read_client.create_read_session(
+            parent=f"projects/{table.project}",
+            read_session=types.ReadSession(
+                table=f"projects/{table.project}/datasets/{table.dataset_id}/tables/{table.table_id}",
+                data_format=types.DataFormat.ARROW,
+            ),
+            max_stream_count=self.max_streams,
+        )
+        schema = pa.ipc.read_schema(
+            pa.py_buffer(session.arrow_schema.serialized_schema)
+        )
+        if not session.streams:
+            return schema.empty_table()
+        with ThreadPoolExecutor(max_workers=len(session.streams)) as pool:
+            streams = pool.map(
+                lambda stream: list(self._read_stream(stream.name, schema)),
+                session.streams,
+            )
+            batches: List[pa.RecordBatch] = [b for stream in streams for b in stream]
+        return pa.Table.from_batches(batches, schema=schema)
+
+    def _read_stream(self, name: str, schema: pa.Schema) -> Iterator[pa.RecordBatch]:
+        for response in self.read_client.read_rows(name):
+            yield pa.ipc.read_record_batch(
+                pa.py_buffer(response.arrow_record_batch.serialized_record_batch),
+                schema,
+            )
@@ -0,0 +1,613 @@
+from __future__ import annotations
+
+import bisect
+import fnmatch
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from src._constants import (
+    CACHE_DISK_FILENAME,
+    CACHE_DISK_MAX_BYTES,
+    CACHE_DISK_TOUCH_SECONDS,
+    CACHE_MEMORY_MAX_BYTES,
+    CACHE_RING_REPLICAS,
+)
+from src.column_store import DATASET_DIR
+from src.resources import manager as resources
+
+# Deletes KEYS[1] if it holds ARGV[1], in one step on the Redis server
+COMPARE_AND_DELETE = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class CacheStats:
+    """Hits, misses and latency of the operations of a cache backend."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.deletes = 0
+        self.get_seconds = 0.0
+        self.max_get_seconds = 0.0
+        self.set_seconds = 0.0
+        self.max_set_seconds = 0.0
+
+    def record_get(self, seconds: float, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.get_seconds += seconds
+        self.max_get_seconds = max(self.max_get_seconds, seconds)
+
+    def record_set(self, seconds: float) -> None:
+        self.writes += 1
+        self.set_seconds += seconds
+        self.max_set_seconds = max(self.max_set_seconds, seconds)
+
+    def to_dict(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "deletes": self.deletes,
+            "get_ms": 1000 * self.get_seconds,
+            "max_get_ms": 1000 * self.max_get_seconds,
+            "set_ms": 1000 * self.set_seconds,
+            "max_set_ms": 1000 * self.max_set_seconds,
+        }
+
+
+class CacheBackend:
+    """
+    Store shared by the cache tiers of DatasetGateway: encoded query results,
+    the leases of SingleFlight and the access counts of the fields.
+
+    Backends implement the subset of the Redis API these rely on, so that
+    they can be swapped for one another. Subclasses implement the underscored
+    methods, the public ones record the statistics of the backend.
+    """
+
+    name = ""
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key: str) -> Optional[bytes]:
+        start = time.perf_counter()
+        value = self._get(_decode(key))
+        self.stats.record_get(time.perf_counter() - start, value is not None)
+        return value
+
+    def set(
+        self, key: str, value: bytes, ex: int = None, px: int = None, nx: bool = False
+    ) -> bool:
+        """
+        :param ex: expire the entry after this many seconds
+        :param px: expire the entry after this many milliseconds
+        :param nx: only set the entry if it does not exist
+        :return: True iff the entry was set
+        """
+        ttl = px / 1000 if px is not None else ex
+        start = time.perf_counter()
+        done = self._set(_decode(key), value, ttl, nx)
+        self.stats.record_set(time.perf_counter() - start)
+        return done
+
+    def delete(self, *keys: str) -> int:
+        """:return: the number of deleted entries"""
+        deleted = self._delete(tuple(map(_decode, keys))) if keys else 0
+        self.stats.deletes += deleted
+        return deleted
+
+    def unlink(self, *keys: str) -> int:
+        """Delete entries, reclaiming their memory later where supported."""
+        return self.delete(*keys)
+
+    def delete_if_equal(self, key: str, value: bytes) -> bool:
+        """
+        Delete an entry only if it holds `value`, in a single atomic step.
+
+        :return: True iff the entry was deleted
+        """
+        value = value.encode() if isinstance(value, str) else value
+        deleted = self._delete_if_equal(_decode(key), value)
+        self.stats.deletes += deleted
+        return deleted
+
+    def exists(self, key: str) -> bool:
+        return self._exists(_decode(key))
+
+    def scan_iter(self, match: str = "*", count: int = 1000) -> Iterator[bytes]:
+        """Iterate over the keys matching a glob-style pattern."""
+        raise NotImplementedError
+
+    def incr_scores(self, name: str, increments: Mapping[str, float]) -> None:
+        """Add the increment of each member to its score in a sorted set."""
+        raise NotImplementedError
+
+    def top_scores(self, name: str, n: int) -> List[Tuple[bytes, float]]:
+        """The `n` members of a sorted set with the highest scores."""
+        raise NotImplementedError
+
+    def metrics(self) -> dict:
+        return {"backend": self.name, **self.stats.to_dict()}
+
+    def _get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: bytes, ttl: Optional[float], nx: bool) -> bool:
+        raise NotImplementedError
+
+    def _delete(self, keys: Tuple[str, ...]) -> int:
+        raise NotImplementedError
+
+    def _exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def _delete_if_equal(self, key: str, value: bytes) -> bool:
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """
+    Entries held by the current process, evicted least-recently-used first
+    once they take more than `max_bytes`. Nothing is shared between workers.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_bytes: int = CACHE_MEMORY_MAX_BYTES):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._scores: Dict[str, Dict[bytes, float]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _set(self, key: str, value: bytes, ttl: Optional[float], nx: bool) -> bool:
+        value = value.encode() if isinstance(value, str) else value
+        if len(value) > self.max_bytes:
+            # Never let a single entry flush the whole cache
+            return False
+        with self._lock:
+            if self._live(key) is not None:
+                if nx:
+                    return False
+                self._pop(key)
+            expires_at = time.monotonic() + ttl if ttl is not None else None
+            self._entries[key] = (value, expires_at)
+            self.current_bytes += len(value)
+            while self.current_bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+            return True
+
+    def _delete(self, keys: Tuple[str, ...]) -> int:
+        with self._lock:
+            return sum(self._pop(key) is not None for key in keys)
+
+    def _exists(self, key: str) -> bool:
+        with self._lock:
+            return self._live(key) is not None
+
+    def _delete_if_equal(self, key: str, value: bytes) -> bool:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None or entry[0] != value:
+                return False
+            self._pop(key)
+            return True
+
+    def scan_iter(self, match: str = "*", count: int = 1000) -> Iterator[bytes]:
+        with self._lock:
+            keys = [key for key in self._entries if fnmatch.fnmatchcase(key, match)]
+        for key in keys:
+            if self.exists(key):
+                yield key.encode()
+
+    def incr_scores(self, name: str, increments: Mapping[str, float]) -> None:
+        with self._lock:
+            scores = self._scores.setdefault(name, {})
+            for member, increment in increments.items():
+                member = member.encode()
+                scores[member] = scores.get(member, 0.0) + increment
+
+    def top_scores(self, name: str, n: int) -> List[Tuple[bytes, float]]:
+        with self._lock:
+            scores = self._scores.get(name, {})
+            return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:n]
+
+    def _live(self, key: str) -> Optional[tuple]:
+        """The entry of a key, dropping it if it has expired."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            self._pop(key)
+            return None
+        return entry
+
+    def _pop(self, key: str) -> Optional[tuple]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= len(entry[0])
+        return entry
+
+
+class DiskBackend(CacheBackend):
+    """
+    Entries persisted to a SQLite database, shared by the workers of a host
+    and kept across restarts. Entries are evicted least-recently-used first
+    once they take more than `max_bytes`.
+
+    The total size of the entries is kept up to date by triggers, in the
+    transactions that insert and delete them. The reads of a worker are
+    recorded in memory, and written along with its next write, or every
+    `touch_seconds`.
+    """
+
+    name = "disk"
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = CACHE_DISK_MAX_BYTES,
+        touch_seconds: float = CACHE_DISK_TOUCH_SECONDS,
+    ):
+        super().__init__()
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.touch_seconds = touch_seconds
+        # Time at which each entry was last read, since the last write
+        self._touched: Dict[str, float] = {}
+        self._touched_at = time.time()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Statements are committed as they run, and wait for the other workers
+        # writing to the database
+        self._connection = sqlite3.connect(
+            str(self.path), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            # Entries replaced by INSERT OR REPLACE fire the delete trigger
+            self._connection.execute("PRAGMA recursive_triggers=ON")
+            self._connection.executescript(
+                """
+                BEGIN IMMEDIATE;
+                CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY,
+                    value BLOB, size INTEGER, expires_at REAL, accessed_at REAL);
+                CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+                CREATE TABLE IF NOT EXISTS scores (name TEXT, member TEXT,
+                    score REAL, PRIMARY KEY (name, member));
+                CREATE TABLE IF NOT EXISTS usage (id INTEGER PRIMARY KEY
+                    CHECK (id = 0), size INTEGER NOT NULL);
+                INSERT OR IGNORE INTO usage
+                    SELECT 0, COALESCE(SUM(size), 0) FROM entries;
+                CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries
+                    BEGIN UPDATE usage SET size = size + NEW.size; END;
+                CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries
+                    BEGIN UPDATE usage SET size = size - OLD.size; END;
+                COMMIT;
+                """
+            )
+
+    def _get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM entries WHERE key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = now
+            if now - self._touched_at >= self.touch_seconds:
+                self._write_touched(now)
+        return bytes(row[0])
+
+    def _set(self, key: str, value: bytes, ttl: Optional[float], nx: bool) -> bool:
+        value = value.encode() if isinstance(value, str) else value
+        if len(value) > self.max_bytes:
+            return False
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            if nx:
+                self._connection.execute(
+                    "DELETE FROM entries WHERE key = ? AND expires_at <= ?", (key, now)
+                )
+            verb = "INSERT OR IGNORE" if nx else "INSERT OR REPLACE"
+            cursor = self._connection.execute(
+                f"{verb} INTO entries VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), len(value), expires_at, now),
+            )
+            if cursor.rowcount == 0:
+                return False
+            self._write_touched(now)
+            self._evict(now)
+        return True
+
+    def _delete(self, keys: Tuple[str, ...]) -> int:
+        with self._lock:
+            cursor = self._connection.execute(
+                f"DELETE FROM entries WHERE key IN ({','.join('?' * len(keys))})", keys
+            )
+        return cursor.rowcount
+
+    def _exists(self, key: str) -> bool:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM entries WHERE key = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        return row is not None
+
+    def _delete_if_equal(self, key: str, value: bytes) -> bool:
+        with self._lock:
+            cursor = self._connection.execute(
+                "DELETE FROM entries WHERE key = ? AND value = ? "
+                "AND (expires_at IS NULL OR expires_at > ?)",
+                (key, sqlite3.Binary(value), time.time()),
+            )
+        return cursor.rowcount > 0
+
+    def scan_iter(self, match: str = "*", count: int = 1000) -> Iterator[bytes]:
+        # Keys are read in batches, so that they can be deleted while iterating
+        last = ""
+        while True:
+            with self._lock:
+                keys = [
+                    row[0]
+                    for row in self._connection.execute(
+                        "SELECT key FROM entries WHERE key GLOB ? AND key > ? "
+                        "ORDER BY key LIMIT ?",
+                        (match, last, count),
+                    )
+                ]
+            yield from (key.encode() for key in keys)
+            if len(keys) < count:
+                return
+            last = keys[-1]
+
+    def incr_scores(self, name: str, increments: Mapping[str, float]) -> None:
+        with self._lock:
+            self._connection.executemany(
+                "INSERT INTO scores VALUES (?, ?, ?) "
+                "ON CONFLICT (name, member) "
+                "DO UPDATE SET score = score + excluded.score",
+                [(name, member, increment) for member, increment in increments.items()],
+            )
+
+    def top_scores(self, name: str, n: int) -> List[Tuple[bytes, float]]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT member, score FROM scores WHERE name = ? "
+                "ORDER BY score DESC, member LIMIT ?",
+                (name, n),
+            ).fetchall()
+        return [(member.encode(), score) for member, score in rows]
+
+    def _write_touched(self, now: float) -> None:
+        """Write the times at which entries were read since the last write."""
+        if self._touched:
+            self._connection.execute("BEGIN")
+            self._connection.executemany(
+                "UPDATE entries SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._touched.items()],
+            )
+            self._connection.execute("COMMIT")
+            self._touched.clear()
+        self._touched_at = now
+
+    def _evict(self, now: float) -> None:
+        """Delete expired entries, then the least recently used, to fit the bound."""
+        (size,) = self._connection.execute("SELECT size FROM usage").fetchone()
+        if size <= self.max_bytes:
+            return
+        evicted = []
+        for key, entry_size in self._connection.execute(
+            "SELECT key, size FROM entries ORDER BY "
+            "(expires_at IS NOT NULL AND expires_at <= ?) DESC, accessed_at",
+            (now,),
+        ):
+            if size <= self.max_bytes:
+                break
+            evicted.append(key)
+            size -= entry_size
+        self._connection.executemany(
+            "DELETE FROM entries WHERE key = ?", [(key,) for key in evicted]
+        )
+
+
+class RedisBackend(CacheBackend):
+    """Entries held by a Redis instance, shared by every worker."""
+
+    name = "redis"
+
+    def __init__(self, client):
+        """:param client: a Redis client"""
+        super().__init__()
+        self.client = client
+        self._compare_and_delete = client.register_script(COMPARE_AND_DELETE)
+
+    def _get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def _set(self, key: str, value: bytes, ttl: Optional[float], nx: bool) -> bool:
+        px = int(ttl * 1000) if ttl is not None else None
+        return bool(self.client.set(key, value, px=px, nx=nx))
+
+    def _delete(self, keys: Tuple[str, ...]) -> int:
+        return self.client.delete(*keys)
+
+    def unlink(self, *keys: str) -> int:
+        deleted = self.client.unlink(*keys) if keys else 0
+        self.stats.deletes += deleted
+        return deleted
+
+    def _exists(self, key: str) -> bool:
+        return bool(self.client.exists(key))
+
+    def _delete_if_equal(self, key: str, value: bytes) -> bool:
+        return bool(self._compare_and_delete(keys=[key], args=[value]))
+
+    def scan_iter(self, match: str = "*", count: int = 1000) -> Iterator[bytes]:
+        return self.client.scan_iter(match=match, count=count)
+
+    def incr_scores(self, name: str, increments: Mapping[str, float]) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for member, increment in increments.items():
+            pipeline.zincrby(name, increment, member)
+        pipeline.execute()
+
+    def top_scores(self, name: str, n: int) -> List[Tuple[bytes, float]]:
+        return self.client.zrevrange(name, 0, n - 1, withscores=True)
+
+    def shutdown(self, save: bool = True) -> None:
+        self.client.shutdown(save=save)
+
+
+class HashRing:
+    """
+    Consistent hashing of keys onto nodes. Each node owns `replicas` points
+    of the ring, and a key belongs to the node of the first point after its
+    hash. Adding or removing a node only moves the keys of that node.
+    """
+
+    def __init__(self, nodes: Iterable[str], replicas: int = CACHE_RING_REPLICAS):
+        points = sorted(
+            (_ring_hash(f"{node}#{i}"), node) for node in nodes for i in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node(self, key: str) -> str:
+        i = bisect.bisect(self._hashes, _ring_hash(key)) % len(self._hashes)
+        return self._nodes[i]
+
+
+class ShardedBackend(CacheBackend):
+    """
+    Entries spread over several backends, typically Redis instances, by
+    consistent hashing of their keys. The capacity of the cache grows with the
+    number of nodes, and adding one only moves a fraction of the entries.
+    """
+
+    name = "sharded"
+
+    def __init__(
+        self, nodes: Dict[str, CacheBackend], replicas: int = CACHE_RING_REPLICAS
+    ):
+        """:param nodes: backend of each node, by name (e.g. `host:port`)"""
+        super().__init__()
+        self.nodes = nodes
+        self.ring = HashRing(nodes, replicas)
+
+    def shard(self, key: str) -> CacheBackend:
+        return self.nodes[self.ring.node(key)]
+
+    def _get(self, key: str) -> Optional[bytes]:
+        return self.shard(key).get(key)
+
+    def _set(self, key: str, value: bytes, ttl: Optional[float], nx: bool) -> bool:
+        px = int(ttl * 1000) if ttl is not None else None
+        return self.shard(key).set(key, value, px=px, nx=nx)
+
+    def _delete(self, keys: Tuple[str, ...]) -> int:
+        return sum(node.delete(*shard) for node, shard in self._by_shard(keys))
+
+    def unlink(self, *keys: str) -> int:
+        deleted = sum(node.unlink(*shard) for node, shard in self._by_shard(keys))
+        self.stats.deletes += deleted
+        return deleted
+
+    def _exists(self, key: str) -> bool:
+        return self.shard(key).exists(key)
+
+    def _delete_if_equal(self, key: str, value: bytes) -> bool:
+        return self.shard(key).delete_if_equal(key, value)
+
+    def scan_iter(self, match: str = "*", count: int = 1000) -> Iterator[bytes]:
+        for node in self.nodes.values():
+            yield from node.scan_iter(match, count)
+
+    def incr_scores(self, name: str, increments: Mapping[str, float]) -> None:
+        self.shard(name).incr_scores(name, increments)
+
+    def top_scores(self, name: str, n: int) -> List[Tuple[bytes, float]]:
+        return self.shard(name).top_scores(name, n)
+
+    def metrics(self) -> dict:
+        return {
+            **super().metrics(),
+            "nodes": {name: node.metrics() for name, node in self.nodes.items()},
+        }
+
+    def _by_shard(self, keys: Iterable[str]) -> List[Tuple[CacheBackend, List[str]]]:
+        shards: Dict[str, List[str]] = {}
+        for key in map(_decode, keys):
+            shards.setdefault(self.ring.node(key), []).append(key)
+        return [(self.nodes[name], shard) for name, shard in shards.items()]
+
+
+def backend_name() -> str:
+    """
+    Backend selected by the `CACHE_BACKEND` environment variable: `memory`,
+    `disk`, `redis` or `sharded`. Deployments use Redis, development uses the
+    disk so that it works without a Redis server.
+    """
+    default = "redis" if os.environ.get("ENV") in ("PROD", "LOCALPROD") else "disk"
+    return os.environ.get("CACHE_BACKEND", default)
+
+
+def make_backend(name: str = None) -> CacheBackend:
+    name = name or backend_name()
+    if name == "memory":
+        return MemoryBackend()
+    if name == "disk":
+        return DiskBackend(DATASET_DIR.joinpath(CACHE_DISK_FILENAME))
+    if name == "redis":
+        return RedisBackend(resources.redis())
+    if name == "sharded":
+        # Nodes are listed as `host:port,host:port`
+        addresses = os.environ["REDIS_NODES"].split(",")
+        return ShardedBackend(
+            {address: RedisBackend(resources.redis(address)) for address in addresses}
+        )
+    raise ValueError(f"Unknown cache backend {name}")
+
+
+class CacheProxy:
+    """Stands for the cache backend of whichever process uses it."""
+
+    def __getattr__(self, name):
+        return getattr(resources.get("cache", make_backend), name)
+
+
+def _decode(key) -> str:
+    """Keys are given as strings, or as bytes like the keys scanned from Redis."""
+    return key.decode() if isinstance(key, bytes) else key
+
+
+def _ring_hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
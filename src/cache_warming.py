@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import argparse
+import re
+import time
+from typing import List, Tuple
+
+from src._constants import ACCESS_COUNTS_KEY, WARM_BUDGET_SECONDS, WARM_TOP_FIELDS
+from src.dash_app import cache
+from src.dataset_gateway import DatasetGateway, Query
+from src.field_metadata import MetadataCatalog
+from src.field_statistics import FieldStatisticsIndex
+from src.value_type import ValueType
+
+# Number of fields fetched from the data source by a single query
+WARM_BATCH_SIZE = 20
+
+
+def top_fields(n: int) -> List[Tuple[str, int]]:
+    """
+    :param n: number of fields to return
+    :return: the most accessed data fields with their number of accesses
+    """
+    return [
+        (field.decode(), int(count))
+        for field, count in cache.top_scores(ACCESS_COUNTS_KEY, n)
+    ]
+
+
+def warm_cache(
+    top_n: int = WARM_TOP_FIELDS, budget_seconds: float = WARM_BUDGET_SECONDS
+) -> dict:
+    """
+    Prefetch the most accessed fields, and the bounds of the numeric ones,
+    into the cache tiers. Fields are warmed by decreasing popularity until
+    the time budget runs out.
+
+    :param top_n: number of fields to warm
+    :param budget_seconds: no query is started once this time has elapsed
+    :return: a summary of the fields that were warmed
+    """
+    start_time = time.monotonic()
+    deadline = start_time + budget_seconds
+    fields = [field for field, _ in top_fields(top_n)]
+    report = {"fields": 0, "min_max": 0, "failed": 0, "skipped": 0}
+    gateway = DatasetGateway()
+
+    for start in range(0, len(fields), WARM_BATCH_SIZE):
+        batch = fields[start : start + WARM_BATCH_SIZE]
+        if time.monotonic() > deadline:
+            report["skipped"] += len(batch)
+            continue
+        try:
+            # Columns are fetched as they are, into the per-column entries
+            # served to projections, rather than admitted and maybe sampled
+            gateway.submit_columns(Query(["eid", *batch]))
+            report["fields"] += len(batch)
+        except Exception as e:
+            print(f"Failed to warm fields {batch}: {e}")
+            report["failed"] += len(batch)
+
+    # Range filters use the precomputed bounds of the fields that have them
+    numeric_fields = _numeric_fields()
+    bounded = [
+        field
+        for field in fields
+        if _field_id(field) in numeric_fields
+        and FieldStatisticsIndex.lookup(field) is None
+    ]
+    if bounded and time.monotonic() > deadline:
+        report["skipped"] += len(bounded)
+    elif bounded:
+        try:
+            # Bounds of the fields warmed above are computed from their cached
+            # columns, the others share a single aggregation
+            DatasetGateway.submit_many(
+                [Query(["eid", field]).get_min_max() for field in bounded],
+                record_access=False,
+            )
+            report["min_max"] += len(bounded)
+        except Exception as e:
+            print(f"Failed to warm bounds of fields {bounded}: {e}")
+            report["failed"] += len(bounded)
+
+    report["seconds"] = time.monotonic() - start_time
+    print(f"Warmed the cache: {report}")
+    return report
+
+
+def _numeric_fields() -> set:
+    numeric = MetadataCatalog.fields([ValueType.INTEGER, ValueType.CONT])
+    return {field.field_id for field in numeric}
+
+
+def _field_id(column: str) -> str:
+    """Field of a column, named `_21001_0_0` in PROD and `21001-0.0` locally."""
+    return re.split("[-._]", column.lstrip("_"))[0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Prefetch the most accessed fields into the cache."
+    )
+    parser.add_argument("--top", type=int, default=WARM_TOP_FIELDS)
+    parser.add_argument("--budget", type=float, default=WARM_BUDGET_SECONDS)
+    args = parser.parse_args()
+    warm_cache(args.top, args.budget)
@@ -0,0 +1,244 @@
+from __future__ import annotations
+
+import argparse
+import json
+import struct
+import time
+from io import StringIO
+from typing import Dict, List
+
+import pandas as pd
+import pyarrow as pa
+
+# Every encoded entry starts with: magic, format version, codec id,
+# compression id and the size of the uncompressed payload.
+MAGIC = b"UKBC"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sBBBQ")
+
+COMPRESSIONS = ["uncompressed", "lz4", "zstd"]
+
+
+class CodecError(Exception):
+    pass
+
+
+class CodecStats:
+    """Running totals used to compare the cost and efficiency of codecs."""
+
+    def __init__(self):
+        self.encoded = 0
+        self.decoded = 0
+        self.encode_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.raw_bytes = 0
+        self.encoded_bytes = 0
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.raw_bytes / self.encoded_bytes if self.encoded_bytes else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "encoded": self.encoded,
+            "decoded": self.decoded,
+            "encode_ms": 1000 * self.encode_seconds,
+            "decode_ms": 1000 * self.decode_seconds,
+            "raw_bytes": self.raw_bytes,
+            "encoded_bytes": self.encoded_bytes,
+            "compression_ratio": self.compression_ratio,
+        }
+
+
+class Codec:
+    """Serialises query results for storage in the shared cache."""
+
+    codec_id: int
+    name: str
+
+    def __init__(self, compression: str = "uncompressed"):
+        if compression not in COMPRESSIONS:
+            raise CodecError(f"Unknown compression {compression}")
+        self.compression = compression
+        self.stats = CodecStats()
+
+    def encode(self, frame: pd.DataFrame) -> bytes:
+        start = time.perf_counter()
+        payload = self._serialise(frame)
+        encoded = self._pack(payload)
+        self.stats.encode_seconds += time.perf_counter() - start
+        self.stats.encoded += 1
+        self.stats.raw_bytes += int(frame.memory_usage(index=True, deep=True).sum())
+        self.stats.encoded_bytes += len(encoded)
+        return encoded
+
+    def decode(self, encoded: bytes) -> pd.DataFrame:
+        start = time.perf_counter()
+        frame = self._deserialise(self._unpack(encoded))
+        self.stats.decode_seconds += time.perf_counter() - start
+        self.stats.decoded += 1
+        return frame
+
+    def _pack(self, payload: bytes) -> bytes:
+        compression_id = COMPRESSIONS.index(self.compression)
+        header = HEADER.pack(
+            MAGIC, FORMAT_VERSION, self.codec_id, compression_id, len(payload)
+        )
+        if self.compression != "uncompressed":
+            payload = pa.compress(payload, codec=self.compression, asbytes=True)
+        return header + payload
+
+    def _unpack(self, encoded: bytes) -> bytes:
+        magic, version, codec_id, compression_id, size = HEADER.unpack_from(encoded)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise CodecError(f"Unsupported cache entry format {magic}:{version}")
+        payload = encoded[HEADER.size :]
+        compression = COMPRESSIONS[compression_id]
+        if compression != "uncompressed":
+            payload = pa.decompress(
+                payload, decompressed_size=size, codec=compression, asbytes=True
+            )
+        return payload
+
+    def _serialise(self, frame: pd.DataFrame) -> bytes:
+        raise NotImplementedError
+
+    def _deserialise(self, payload: bytes) -> pd.DataFrame:
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    """The historical encoding of cached results. Lossy for dtypes."""
+
+    codec_id = 0
+    name = "json"
+
+    def _serialise(self, frame: pd.DataFrame) -> bytes:
+        return frame.to_json().encode("utf-8")
+
+    def _deserialise(self, payload: bytes) -> pd.DataFrame:
+        return pd.read_json(StringIO(payload.decode("utf-8")))
+
+
+class ArrowCodec(Codec):
+    """Arrow IPC stream of the result. Preserves dtypes."""
+
+    codec_id = 1
+    name = "arrow"
+
+    def encode_table(self, table: pa.Table, columns: List[str] = None) -> bytes:
+        """
+        Encode an Arrow table directly, without a pandas round trip.
+
+        :param columns: names of the columns once decoded, defaults to those
+                        of the table
+        """
+        start = time.perf_counter()
+        columns = columns or table.column_names
+        encoded = self._pack(self._write_ipc(self._with_names(table, columns)))
+        self.stats.encode_seconds += time.perf_counter() - start
+        self.stats.encoded += 1
+        self.stats.raw_bytes += table.nbytes
+        self.stats.encoded_bytes += len(encoded)
+        return encoded
+
+    def _serialise(self, frame: pd.DataFrame) -> bytes:
+        # Results may hold the same field twice (e.g. as X axis and colour),
+        # which Arrow schemas do not allow, so columns are stored by position
+        # and their names restored from the schema metadata.
+        positional = frame.copy(deep=False)
+        positional.columns = [str(i) for i in range(len(frame.columns))]
+        # Filtered results keep the index of the rows they were selected from,
+        # which is not part of the result
+        table = pa.Table.from_pandas(positional, preserve_index=False)
+        return self._write_ipc(self._with_names(table, list(frame.columns)))
+
+    def _deserialise(self, payload: bytes) -> pd.DataFrame:
+        table = pa.ipc.open_stream(pa.py_buffer(payload)).read_all()
+        frame = table.to_pandas()
+        metadata = table.schema.metadata or {}
+        if b"columns" in metadata:
+            frame.columns = json.loads(metadata[b"columns"])
+        return frame
+
+    @staticmethod
+    def _with_names(table: pa.Table, columns: list) -> pa.Table:
+        table = table.rename_columns([str(i) for i in range(table.num_columns)])
+        return table.replace_schema_metadata(
+            {
+                **(table.schema.metadata or {}),
+                b"columns": json.dumps([str(c) for c in columns]),
+            }
+        )
+
+    @staticmethod
+    def _write_ipc(table: pa.Table) -> bytes:
+        sink = pa.BufferOutputStream()
+        writer = pa.ipc.new_stream(sink, table.schema)
+        writer.write_table(table)
+        writer.close()
+        return sink.getvalue().to_pybytes()
+
+
+_codec_classes = {JsonCodec.codec_id: JsonCodec, ArrowCodec.codec_id: ArrowCodec}
+_codecs: Dict[str, Codec] = {}
+
+
+def get_codec(name: str) -> Codec:
+    """
+    Return the shared codec for a name such as "json", "arrow" or
+    "arrow-zstd", so that statistics accumulate per codec.
+    """
+    if name not in _codecs:
+        _codecs[name] = _make_codec(name)
+    return _codecs[name]
+
+
+def _make_codec(name: str) -> Codec:
+    codec_name, _, compression = name.partition("-")
+    classes = {cls.name: cls for cls in _codec_classes.values()}
+    if codec_name not in classes:
+        raise CodecError(f"Unknown codec {name}")
+    return classes[codec_name](compression or "uncompressed")
+
+
+def decode(encoded: bytes) -> pd.DataFrame:
+    """
+    Decode a cache entry with whichever codec wrote it. Entries that predate
+    the header are JSON.
+    """
+    if not encoded.startswith(MAGIC):
+        return pd.read_json(StringIO(encoded.decode("utf-8")))
+    _, _, codec_id, compression_id, _ = HEADER.unpack_from(encoded)
+    if codec_id not in _codec_classes or compression_id >= len(COMPRESSIONS):
+        raise CodecError(f"Unknown codec {codec_id}:{compression_id}")
+    name = _codec_classes[codec_id].name
+    if compression_id:
+        name += f"-{COMPRESSIONS[compression_id]}"
+    return get_codec(name).decode(encoded)
+
+
+def benchmark(frame: pd.DataFrame, names: List[str] = None) -> pd.DataFrame:
+    """
+    Compare codecs on a sample result.
+
+    :return: one row per codec with encode/decode times and compression ratio
+    """
+    names = names or ["json"] + [f"arrow-{c}" for c in COMPRESSIONS]
+    rows = []
+    for name in names:
+        codec = _make_codec(name)
+        codec.decode(codec.encode(frame))
+        rows.append({"codec": name, **codec.stats.to_dict()})
+    return pd.DataFrame(rows).set_index("codec")
+
+
+if __name__ == "__main__":
+    from src.column_store import ColumnStore
+
+    parser = argparse.ArgumentParser(
+        description="Compare cache codecs on columns of the column store."
+    )
+    parser.add_argument("columns", nargs="+")
+    args = parser.parse_args()
+    print(benchmark(ColumnStore().read(["eid", *args.columns])).to_string())
@@ -0,0 +1,424 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from src._constants import COLUMN_STORE_DIRNAME, DATASET_FILENAME
+from src.packed_fields import PackedField
+
+DATASET_DIR = Path(os.path.dirname(__file__)).parent.joinpath(Path("dataset"))
+MANIFEST_FILENAME = "manifest.json"
+STORE_FORMAT_VERSION = 1
+
+
+class ColumnStore:
+    """
+    Columnar on-disk copy of the UK Biobank dataset.
+
+    Every column of the source CSV (`eid`, `31-0.0`, `21001-0.0`, ...) is
+    stored in its own uncompressed Arrow IPC file, with all files sharing the
+    row order of the `eid` column. Reading a field therefore only touches the
+    bytes of that field instead of tokenising the whole CSV.
+
+    Columns can also be memory-mapped: the mapping is read-only and backed by
+    the OS page cache, so every gunicorn worker that maps a column shares the
+    same physical copy of it.
+
+    The array slots of multi-valued fields can additionally be stored packed,
+    see PackedField, in one file per instance of the field (`20002-0`).
+
+    Delta baskets are merged into the store column by column, see `update`.
+    The manifest records the revision of each column, bumped whenever the
+    column is replaced, so that results computed from other columns remain
+    valid.
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path) if path else DATASET_DIR.joinpath(COLUMN_STORE_DIRNAME)
+        self._manifest = None
+        self._manifest_stat = None
+        self._mapped = {}
+        self._packed = {}
+
+    def is_available(self) -> bool:
+        """True iff the store has been fully ingested at this location."""
+        return self.path.joinpath(MANIFEST_FILENAME).is_file()
+
+    @property
+    def manifest(self) -> dict:
+        if self._manifest is None:
+            manifest_path = self.path.joinpath(MANIFEST_FILENAME)
+            self._manifest_stat = _stat(manifest_path)
+            with open(manifest_path) as f:
+                self._manifest = json.load(f)
+        return self._manifest
+
+    def refresh(self) -> bool:
+        """
+        Reload the manifest if the store has been updated by another process,
+        and forget the mappings of the columns that have been replaced.
+
+        :return: True iff the store has been updated
+        """
+        if self._manifest is None:
+            return False
+        if _stat(self.path.joinpath(MANIFEST_FILENAME)) == self._manifest_stat:
+            return False
+        previous = self._manifest
+        self._manifest = None
+        if not self.is_available():
+            self._mapped, self._packed = {}, {}
+            return True
+        replaced = {
+            column
+            for column in previous["columns"]
+            if self.revision(column) != previous.get("revisions", {}).get(column, 0)
+        }
+        self._mapped = {c: a for c, a in self._mapped.items() if c not in replaced}
+        self._packed = {
+            instance: packed
+            for instance, packed in self._packed.items()
+            if replaced.isdisjoint(self.manifest.get("packed", {}).get(instance, []))
+        }
+        return True
+
+    def revision(self, column: str) -> int:
+        """Number of the update that last replaced a column, 0 if none did."""
+        return self.manifest.get("revisions", {}).get(column, 0)
+
+    @property
+    def num_rows(self) -> int:
+        return self.manifest["rows"]
+
+    def columns(self) -> List[str]:
+        return list(self.manifest["columns"].keys())
+
+    def column_path(self, column: str) -> Path:
+        return self.path.joinpath(f"{column}.arrow")
+
+    def read_column(self, column: str) -> pa.ChunkedArray:
+        if column not in self.manifest["columns"]:
+            raise KeyError(f"Column {column} is not part of the dataset")
+        return feather.read_table(self.column_path(column)).column(0)
+
+    def read(self, columns: List[str]) -> pd.DataFrame:
+        """Read the given columns, in the requested order, into a DataFrame."""
+        table = pa.Table.from_arrays(
+            [self.read_column(column) for column in columns], names=columns
+        )
+        return table.to_pandas()
+
+    def map_column(self, column: str) -> pa.ChunkedArray:
+        """Memory-map a column, reusing the mapping on subsequent calls."""
+        if column not in self._mapped:
+            if column not in self.manifest["columns"]:
+                raise KeyError(f"Column {column} is not part of the dataset")
+            source = pa.memory_map(str(self.column_path(column)), "r")
+            self._mapped[column] = pa.ipc.open_file(source).read_all().column(0)
+        return self._mapped[column]
+
+    def mapped_frame(self, columns: List[str]) -> pd.DataFrame:
+        """
+        Build a DataFrame whose numeric columns are read-only views over the
+        memory-mapped files. Every column is kept in its own pandas block so
+        that pandas does not consolidate (and therefore copy) them.
+        """
+        table = pa.Table.from_arrays(
+            [self.map_column(column) for column in columns], names=columns
+        )
+        return table.to_pandas(split_blocks=True, self_destruct=False)
+
+    def packed_path(self, instance: str) -> Path:
+        return self.path.joinpath(f"{instance}.packed.arrow")
+
+    def has_packed(self, instance: str) -> bool:
+        """:param instance: an instance of a field, e.g. `20002-0`"""
+        return instance in self.manifest.get("packed", {})
+
+    def map_packed(self, instance: str) -> PackedField:
+        """Memory-map the packed array slots of an instance of a field."""
+        if instance not in self._packed:
+            if not self.has_packed(instance):
+                raise KeyError(f"Instance {instance} has not been packed")
+            source = pa.memory_map(str(self.packed_path(instance)), "r")
+            array = pa.ipc.open_file(source).read_all().column(0).chunk(0)
+            eids = self.map_column("eid").to_numpy()
+            self._packed[instance] = PackedField.from_arrow(eids, array)
+        return self._packed[instance]
+
+    def iter_chunks(
+        self, columns: List[str], chunk_rows: int
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Read the given columns in chunks of `chunk_rows` rows. Chunks are
+        slices of the memory-mapped columns, so only the chunk being converted
+        to pandas is ever materialised.
+        """
+        arrays = [self.map_column(column) for column in columns]
+        for start in range(0, self.num_rows, chunk_rows):
+            table = pa.Table.from_arrays(
+                [array.slice(start, chunk_rows) for array in arrays], names=columns
+            )
+            yield table.to_pandas(split_blocks=True, self_destruct=False)
+
+    def write_column(self, column: str, array: pa.Array) -> None:
+        """
+        Write a column, replacing it atomically: workers that mapped the
+        previous file keep reading it until they refresh the store.
+        """
+        tmp_path = Path(str(self.column_path(column)) + ".tmp")
+        feather.write_feather(
+            pa.Table.from_arrays([array], names=[column]),
+            str(tmp_path),
+            compression="uncompressed",
+        )
+        os.replace(tmp_path, self.column_path(column))
+
+    def write_packed(self, instance: str, slots: List[str], eids: np.ndarray) -> None:
+        """Pack the array slots of an instance of a field, see PackedField."""
+        print(f"Packing the {len(slots)} array slots of {instance}")
+        frame = pd.concat(
+            [
+                feather.read_table(str(self.column_path(slot))).to_pandas()
+                for slot in slots
+            ],
+            axis=1,
+        )
+        table = pa.table({instance: PackedField.from_columns(eids, frame).to_arrow()})
+        tmp_path = Path(str(self.packed_path(instance)) + ".tmp")
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, self.packed_path(instance))
+
+    def write_manifest(self, manifest: dict) -> None:
+        manifest_path = self.path.joinpath(MANIFEST_FILENAME)
+        tmp_manifest_path = self.path.joinpath(MANIFEST_FILENAME + ".tmp")
+        with open(tmp_manifest_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_manifest_path, manifest_path)
+
+    @classmethod
+    def ingest(
+        cls,
+        csv_path: Path,
+        path: Path = None,
+        columns_per_pass: int = 500,
+        packed_fields: Iterable[str] = (),
+    ) -> ColumnStore:
+        """
+        Convert the dataset CSV into a column store.
+
+        The CSV is scanned once per group of `columns_per_pass` columns so that
+        memory usage stays bounded by the size of one group, not of the whole
+        dataset. The manifest is written last: an interrupted ingestion never
+        leaves behind a store that looks usable.
+
+        :param csv_path: path to the dataset CSV
+        :param path: directory in which the store is created
+        :param columns_per_pass: number of columns parsed per scan of the CSV
+        :param packed_fields: multi-valued fields whose array slots are also
+                              stored packed
+        :return: the ingested ColumnStore
+        """
+        store = cls(path)
+        store.path.mkdir(parents=True, exist_ok=True)
+        manifest_path = store.path.joinpath(MANIFEST_FILENAME)
+        if manifest_path.is_file():
+            manifest_path.unlink()
+
+        all_columns = list(pd.read_csv(csv_path, nrows=0).columns)
+        if "eid" not in all_columns:
+            raise ValueError(f"{csv_path} does not have an eid column")
+        all_columns.remove("eid")
+        all_columns.insert(0, "eid")
+
+        dtypes, num_rows = {}, None
+        for start in range(0, len(all_columns), columns_per_pass):
+            group = all_columns[start : start + columns_per_pass]
+            print(f"Ingesting columns {start} to {start + len(group)}")
+            frame = pd.read_csv(csv_path, usecols=group)
+            num_rows = len(frame)
+            for column in group:
+                array = _to_arrow(frame[column])
+                store.write_column(column, array)
+                dtypes[column] = str(array.type)
+
+        packed = _array_slots(all_columns, set(map(str, packed_fields)))
+        eids = feather.read_table(str(store.column_path("eid"))).column(0).to_numpy()
+        for instance, slots in packed.items():
+            store.write_packed(instance, slots, eids)
+
+        stat = os.stat(csv_path)
+        store.write_manifest(
+            {
+                "format": STORE_FORMAT_VERSION,
+                "source": str(csv_path),
+                # Unchanged by updates, which only bump the revision of columns
+                "version": f"{Path(csv_path).name}@{stat.st_size}-{int(stat.st_mtime)}",
+                "rows": num_rows,
+                "columns": dtypes,
+                "packed": packed,
+                "revisions": {},
+                "updates": [],
+            }
+        )
+        return store
+
+    def update(
+        self,
+        csv_path: Path,
+        columns_per_pass: int = 500,
+        packed_fields: Iterable[str] = (),
+    ) -> List[str]:
+        """
+        Merge a delta basket into the store. Columns of the basket that are
+        not part of the store are added. In the other columns of the basket,
+        the values of its participants are overwritten and the values of the
+        remaining participants are kept. Columns missing from the basket are
+        left untouched.
+
+        :param csv_path: path to the basket CSV, holding an eid column and
+                         the changed columns
+        :param columns_per_pass: number of columns parsed per scan of the CSV
+        :param packed_fields: multi-valued fields whose array slots are stored
+                              packed, in addition to the ones already packed
+        :return: the columns that have been added or replaced
+        :raises ValueError: if the basket holds participants that are not
+                            part of the store, which requires a full ingest
+        """
+        changed = [c for c in pd.read_csv(csv_path, nrows=0).columns if c != "eid"]
+        eids = self.read_column("eid").to_numpy()
+        rows = pd.Index(eids).get_indexer(pd.read_csv(csv_path, usecols=["eid"])["eid"])
+        if (rows < 0).any():
+            raise ValueError(
+                f"{csv_path} holds {int((rows < 0).sum())} participants that are "
+                "not part of the store, ingest the whole dataset instead"
+            )
+
+        manifest = dict(self.manifest)
+        dtypes = dict(manifest["columns"])
+        revisions = dict(manifest.get("revisions", {}))
+        updates = list(manifest.get("updates", []))
+        revision = len(updates) + 1
+        for start in range(0, len(changed), columns_per_pass):
+            group = changed[start : start + columns_per_pass]
+            print(f"Updating columns {start} to {start + len(group)}")
+            frame = pd.read_csv(csv_path, usecols=["eid", *group])
+            for column in group:
+                previous = self.read([column])[column] if column in dtypes else None
+                array = _to_arrow(_merge(previous, frame[column], rows, len(eids)))
+                self.write_column(column, array)
+                dtypes[column] = str(array.type)
+                revisions[column] = revision
+
+        packed = dict(manifest.get("packed", {}))
+        fields = set(map(str, packed_fields)) | {i.split("-")[0] for i in packed}
+        slots = _array_slots(list(dtypes), fields)
+        for instance in sorted({i for i in slots if set(slots[i]) & set(changed)}):
+            self.write_packed(instance, slots[instance], eids)
+            packed[instance] = slots[instance]
+
+        updates.append(str(csv_path))
+        self.write_manifest(
+            {
+                **manifest,
+                "columns": dtypes,
+                "packed": packed,
+                "revisions": revisions,
+                "updates": updates,
+            }
+        )
+        self.refresh()
+        return changed
+
+
+def _array_slots(columns: List[str], fields: set) -> Dict[str, List[str]]:
+    """Columns of each instance of the given fields, e.g. `20002-0.0` to `20002-0.33`."""
+    slots: Dict[str, List[str]] = {}
+    for column in columns:
+        instance, _, array = column.partition(".")
+        if instance.split("-")[0] in fields and array:
+            slots.setdefault(instance, []).append(column)
+    for instance in slots:
+        slots[instance].sort(key=lambda column: int(column.partition(".")[2]))
+    return slots
+
+
+def _merge(
+    previous: Optional[pd.Series], values: pd.Series, rows: np.ndarray, num_rows: int
+) -> pd.Series:
+    """
+    Overwrite the given rows of a column with new values.
+
+    :param previous: values of the column, None if it is a new column
+    :param rows: row of the column of each value
+    """
+    numeric = pd.api.types.is_numeric_dtype(values)
+    if previous is None:
+        previous = pd.Series(np.nan if numeric else None, index=range(num_rows))
+    elif not (numeric and pd.api.types.is_numeric_dtype(previous)):
+        # Text and numbers mixed in a column are stored as text
+        previous = previous.astype(object)
+    elif np.result_type(previous.dtype, values.dtype) != previous.dtype:
+        previous = previous.astype(np.result_type(previous.dtype, values.dtype))
+    merged = previous.copy()
+    merged.iloc[rows] = values.to_numpy()
+    return merged
+
+
+def _stat(path: Path) -> Optional[tuple]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def _to_arrow(series: pd.Series) -> pa.Array:
+    """
+    Convert a parsed CSV column into an Arrow array. Numeric columns keep
+    NaN as a value rather than a null so their buffers can later be used
+    as-is by numpy. Anything else is stored as nullable strings.
+    """
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return pa.array(series.to_numpy())
+    values = series.where(series.isna(), series.astype(str))
+    return pa.array(values, type=pa.string(), from_pandas=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Convert the UK Biobank dataset CSV into a column store."
+    )
+    parser.add_argument(
+        "--csv", type=Path, default=DATASET_DIR.joinpath(Path(DATASET_FILENAME))
+    )
+    parser.add_argument(
+        "--out", type=Path, default=DATASET_DIR.joinpath(COLUMN_STORE_DIRNAME)
+    )
+    parser.add_argument("--columns-per-pass", type=int, default=500)
+    parser.add_argument(
+        "--no-packing",
+        action="store_true",
+        help="do not pack the array slots of categorical (multiple) fields",
+    )
+    args = parser.parse_args()
+
+    packed_fields = []
+    if not args.no_packing:
+        from src.field_metadata import MetadataCatalog
+        from src.value_type import ValueType
+
+        packed_fields = [
+            field.field_id for field in MetadataCatalog.fields([ValueType.CAT_MULT])
+        ]
+    ColumnStore.ingest(args.csv, args.out, args.columns_per_pass, packed_fields)
@@ -4,8 +4,12 @@ from functools import wraps
 
 import dash
 import dash_bootstrap_components as dbc
-from redis import Redis
 import atexit
+from flask import jsonify
+
+from src.admission import admission
+from src.cache_backends import CacheProxy, backend_name
+from src.resources import manager
 
 sys.path.append(os.path.join(os.path.dirname(__file__), "hierarchy_tree"))
 app = dash.Dash(
@@ -18,20 +22,34 @@ app = dash.Dash(
 if not os.environ.get("ENV") == "PROD" and not os.environ.get("ENV") == "LOCALPROD":
     os.environ["ENV"] = "LOCAL"
 
-cache = Redis(
-    host=os.environ.get(
-        "REDISHOST", "redis" if os.environ.get("ENV") == "LOCALPROD" else "localhost"
-    ),
-    port=os.environ.get("REDISPORT", 6379),
-)
+# Each gunicorn worker opens the cache backend on its own, see src/cache_backends.py
+cache = CacheProxy()
 
 app.config.suppress_callback_exceptions = True
 app.config.prevent_initial_callbacks = True
 app.title = "UK Biobank Explorer"
 
 
+@app.server.route("/metrics/resources")
+def resource_metrics():
+    """Connection pool usage of the worker serving the request."""
+    return jsonify(manager.metrics())
+
+
+@app.server.route("/metrics/admission")
+def admission_metrics():
+    """Queries admitted, sampled, queued and rejected by the worker."""
+    return jsonify({**admission.stats.to_dict(), "in_flight": admission.in_flight})
+
+
+@app.server.route("/metrics/cache")
+def cache_metrics():
+    """Hits, misses and latency of the cache backend of the worker."""
+    return jsonify(cache.metrics())
+
+
 def shutdown_redis():
-    if os.environ.get("ENV") != "PROD":
+    if os.environ.get("ENV") != "PROD" and backend_name() == "redis":
         print("Shutting down redis")
         cache.shutdown(save=True)
 
@@ -7,14 +7,37 @@ import os
 import time
 from io import StringIO
 from pathlib import Path
-from typing import List, Union
+from typing import Dict, Iterator, List, Optional, Union
 
 import defusedxml.ElementTree as ETree
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 import requests
 from google.cloud import bigquery
 from src.dash_app import cache
-from src._constants import TABLE_NAME
+from src import codec
+from src.arrow_download import ArrowDownloader
+from src._constants import (
+    TABLE_NAME,
+    DATASET_FILENAME,
+    LOCAL_CACHE_MAX_BYTES,
+    CACHE_CODEC,
+    STREAM_CHUNK_ROWS,
+    QUERY_LEASE_MS,
+    CACHE_TTL_SECONDS,
+)
+from src import local_engine
+from src.access_counts import AccessCounter
+from src.admission import admission
+from src.aggregates import Aggregate, Count, Max, Min
+from src.column_store import ColumnStore, DATASET_DIR
+from src.dataset_version import dataset_version
+from src.predicates import NotNull, Predicate, Sample
+from src.query_cache import LRUCache
+from src.resources import manager as resources
+from src.single_flight import SingleFlight
+from src.streaming import MinMax, aggregate, csv_chunks
 from src.tree.node import NodeIdentifier
 
 
@@ -29,28 +52,117 @@ class Singleton(type):
 
 class Query:
     def __init__(self, columns: List[str], limit: int = None, where: str = None):
-        self.deferred_min_max = False
+        # Field whose extremum values the query computes, see get_min_max
+        self.min_max_column: Optional[str] = None
         self.df_columns = columns
         self.limit = limit
         self.where = where
         self.query_columns = columns
+        self.predicates: List[Predicate] = []
+        self.sampling: Optional[Sample] = None
+        # Aggregates computed over the selected rows, see aggregate
+        self.aggregates: List[Aggregate] = []
+        self.group_by: List[str] = []
 
     def hash(self):
         hash_key = sorted(self.query_columns.copy())
         if self.limit is not None:
             hash_key.append(self.limit)
+        if self.aggregates:
+            hash_key.append(
+                ["aggregate", [a.key() for a in self.aggregates], self.group_by]
+            )
+        if self.where:
+            hash_key.append(["where", self.where])
+        hash_key.extend(
+            sorted((predicate.key() for predicate in self.predicates), key=json.dumps)
+        )
+        if self.sampling is not None:
+            hash_key.append(self.sampling.key())
+        revisions = LocalClient.revisions(self.referenced_columns())
+        if revisions:
+            hash_key.append(["revisions", revisions])
         hash_key = tuple(hash_key)
-        return hashlib.sha224(json.dumps(hash_key).encode("utf-8")).hexdigest()
+        return dataset_version.key(
+            hashlib.sha224(json.dumps(hash_key).encode("utf-8")).hexdigest()
+        )
+
+    def is_projection(self) -> bool:
+        """True iff the query selects whole columns without any transformation."""
+        return self.is_filtered_projection() and not self.is_filtered()
+
+    def is_filtered_projection(self) -> bool:
+        """True iff the query selects columns, possibly filtering or sampling rows."""
+        return (
+            not self.aggregates
+            and self.limit is None
+            and not self.where
+            and self.query_columns == self.df_columns
+            and "*" not in self.query_columns
+        )
+
+    def is_filtered(self) -> bool:
+        return bool(self.predicates) or self.sampling is not None
+
+    def referenced_columns(self) -> List[str]:
+        """Columns that need to be read to evaluate the query."""
+        columns = ["eid", *self.query_columns]
+        for predicate in self.predicates:
+            columns.extend(predicate.columns)
+        for aggregate_ in self.aggregates:
+            columns.extend(aggregate_.columns)
+        columns.extend(self.group_by)
+        return list(dict.fromkeys(columns))
+
+    def conditions(self) -> List[str]:
+        """SQL conditions that rows need to satisfy to be part of the result."""
+        conditions = [f"({self.where})"] if self.where else []
+        conditions.extend(f"({predicate.to_sql()})" for predicate in self.predicates)
+        if self.sampling is not None:
+            conditions.append(f"({self.sampling.to_sql()})")
+        return conditions
 
     def build(self) -> str:
         """Compile the Query object into a canonical SQL querystring."""
-        base_query = f"SELECT {','.join([str(column) for column in self.query_columns])} FROM `{TABLE_NAME}`"
-        if self.where:
-            base_query += f"WHERE {self.where}"
+        if self.aggregates:
+            selected = [
+                *self.group_by,
+                *[aggregate_.to_sql() for aggregate_ in self.aggregates],
+            ]
+        else:
+            selected = self.query_columns
+        base_query = f"SELECT {','.join([str(column) for column in selected])} FROM `{TABLE_NAME}`"
+        conditions = self.conditions()
+        if conditions:
+            base_query += f" WHERE {' AND '.join(conditions)}"
+        if self.group_by:
+            keys = ",".join(self.group_by)
+            base_query += f" GROUP BY {keys} ORDER BY {keys}"
         if self.limit:
             base_query += f" LIMIT {self.limit}"
         return base_query
 
+    def select(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Rows of a frame that satisfy the predicates and sampling of the query."""
+        if not self.is_filtered():
+            return frame
+        mask = np.ones(len(frame), dtype=bool)
+        for predicate in self.predicates:
+            mask &= predicate.mask(frame)
+        if self.sampling is not None:
+            mask &= self.sampling.mask(frame)
+        return frame[mask]
+
+    def apply(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        Evaluate the predicates, sampling and limit of the query on a frame
+        holding its referenced columns, as the data source would.
+        """
+        frame = self.select(frame)[self.query_columns].reset_index(drop=True)
+        if self.limit is not None:
+            frame = frame.iloc[: self.limit]
+        return frame
+
     @classmethod
     def from_identifier(cls, node_identifier: NodeIdentifier) -> Query:
         """Create a Query from a single data field identifier."""
@@ -68,54 +180,132 @@ class Query:
         Transform the Query into an aggregation query for extremum values of the
         selected data fields.
         """
-        if os.environ.get("ENV") == "PROD":
-            columns = []
-            for id in self.df_columns[1:]:
-                columns.append(f"MIN(CAST({id} as NUMERIC))")
-                columns.append(f"MAX(CAST({id} as NUMERIC))")
-            self.where = []
-            for id in self.df_columns[1:]:
-                self.where.append(f'{id} != ""')
-            self.where = " AND ".join(self.where)
-            self.query_columns = columns
-        else:
-            self.deferred_min_max = True
-        self.df_columns = ["min", "max"]
+        columns = self.df_columns[1:]
+        if len(columns) == 1:
+            self.min_max_column = columns[0]
+        self.aggregate(*[f(column) for column in columns for f in (Min, Max)])
+        if len(columns) == 1:
+            self.df_columns = ["min", "max"]
         return self
 
+    def aggregate(self, *aggregates: Aggregate, group_by: Union[str, List[str]] = None):
+        """
+        Transform the Query into an aggregation of the selected rows, computed
+        per distinct value of the `group_by` column(s) if given. Rows where one
+        of them is null are left out.
+        """
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        self.aggregates = list(aggregates)
+        self.group_by = list(group_by or [])
+        self.df_columns = [
+            *self.group_by,
+            *[aggregate_.name for aggregate_ in self.aggregates],
+        ]
+        self.filter(*[NotNull(column) for column in self.group_by])
+        return self
+
+    def group_count(self, *columns: str):
+        """
+        Count the selected rows taking each value of a column, or each
+        combination of values of several columns (a cross-tabulation).
+        """
+        return self.aggregate(Count(), group_by=list(columns))
+
     def limit_output(self, limit: int):
         """Limit the number of rows returned once this query gets executed."""
         self.limit = limit
         return self
 
+    def filter(self, *predicates: Predicate):
+        """Only return the rows that satisfy all of the given predicates."""
+        self.predicates.extend(predicates)
+        return self
+
+    def sample(self, fraction: float, seed: int = 0, start: float = 0.0):
+        """Only return a deterministic sample of the rows, see Sample."""
+        self.sampling = Sample(fraction, seed, start)
+        return self
+
     @classmethod
     def all(cls):
         return Query(["*"])
 
 
 class LocalClient:
-    def __init__(self, columns: List[str], aggregate=False):
-        self.columns = columns
-        self.aggregate = aggregate
+    store = ColumnStore()
+
+    def __init__(self, _query: Query):
+        self._query = _query
         self.df = None
 
     @classmethod
     def query(cls, _query: Query):
-        return LocalClient(_query.query_columns, _query.deferred_min_max)
+        return LocalClient(_query)
 
-    def result(self):
-        self.df = pd.read_csv(
-            Path(os.path.dirname(__file__)).parent.joinpath(
-                Path("dataset/ukbb-dataset.csv")
-            ),
-            usecols=self.columns,
+    @classmethod
+    def can_map(cls, _query: Query) -> bool:
+        """
+        Column projections can be answered straight from the memory-mapped
+        column store, which is cheaper than any cache lookup. Raw SQL
+        conditions are left to `query`, which rejects them.
+        """
+        return (
+            os.environ.get("ENV") != "PROD"
+            and not _query.aggregates
+            and not _query.where
+            and cls.store.is_available()
         )
 
-        if self.aggregate:
-            self.df = pd.DataFrame(
-                [[self.df[self.columns[1]].min(), self.df[self.columns[1]].max()]],
-                columns=["min", "max"],
-            )
+    @classmethod
+    def mapped(cls, _query: Query) -> pd.DataFrame:
+        """
+        DataFrame over the memory-mapped columns of the query. Unfiltered
+        projections are zero-copy, filtered ones only copy the matching rows.
+        """
+        if _query.is_filtered():
+            result = local_engine.execute(_query, cls.chunks(_query))
+        else:
+            result = cls.store.mapped_frame(_query.query_columns)
+            if _query.limit is not None:
+                result = result.iloc[: _query.limit]
+        result.columns = _query.df_columns
+        return result
+
+    @classmethod
+    def revisions(cls, columns: List[str]) -> Dict[str, int]:
+        """
+        Revision of the columns that have been replaced by an update of the
+        column store, see ColumnStore.update. Results computed from these
+        columns are cached under keys of their current revision.
+        """
+        if os.environ.get("ENV") == "PROD" or not cls.store.is_available():
+            return {}
+        revisions = {column: cls.store.revision(column) for column in columns}
+        return {column: revision for column, revision in revisions.items() if revision}
+
+    @classmethod
+    def columns(cls) -> List[str]:
+        """Columns of the local dataset."""
+        if cls.store.is_available():
+            return cls.store.columns()
+        dataset_path = DATASET_DIR.joinpath(Path(DATASET_FILENAME))
+        return list(pd.read_csv(dataset_path, nrows=0).columns)
+
+    @classmethod
+    def chunks(
+        cls, _query: Query, chunk_rows: int = STREAM_CHUNK_ROWS
+    ) -> Iterator[pd.DataFrame]:
+        """Read the columns referenced by a query chunk by chunk."""
+        columns = _query.referenced_columns()
+        if cls.store.is_available():
+            # Only the requested columns are read from the column store
+            return cls.store.iter_chunks(columns, chunk_rows)
+        dataset_path = DATASET_DIR.joinpath(Path(DATASET_FILENAME))
+        return csv_chunks(dataset_path, columns, chunk_rows)
+
+    def result(self):
+        self.df = local_engine.execute(self._query, self.chunks(self._query))
         return self
 
     def to_dataframe(self) -> pd.DataFrame:
@@ -124,43 +314,358 @@ class LocalClient:
 
 class DatasetGateway(metaclass=Singleton):
     def __init__(self):
-        self.client: Union[bigquery.Client, LocalClient]
+        # Decoded results recently served by this worker, in front of Redis
+        self.local_cache = LRUCache(LOCAL_CACHE_MAX_BYTES)
+        self.codec = codec.get_codec(CACHE_CODEC)
+        # Identical queries submitted concurrently are only executed once
+        self.single_flight = SingleFlight(cache, QUERY_LEASE_MS)
+        # Accesses to the fields are flushed to the cache in the background
+        self.access_counts = AccessCounter(cache)
+        # The gateway may be created before gunicorn forks its workers
+        resources.on_fork(self.single_flight.reset)
+        resources.on_fork(self.local_cache.reset)
+        resources.on_fork(self.access_counts.reset)
+
+    @property
+    def client(self) -> Union[bigquery.Client, LocalClient]:
+        """The data source client of the current worker."""
         if os.environ.get("ENV") == "PROD":
-            self.client = bigquery.Client()
-        else:
-            self.client = LocalClient
+            return resources.bigquery()
+        return LocalClient
+
+    @property
+    def downloader(self) -> Optional[ArrowDownloader]:
+        """Downloads results as Arrow over parallel read streams, PROD only."""
+        if os.environ.get("ENV") != "PROD":
+            return None
+        return resources.get(
+            "downloader",
+            lambda: ArrowDownloader(resources.bigquery(), resources.bigquery_read()),
+        )
 
     @classmethod
-    def submit(cls, _query: Query) -> pd.DataFrame:
-        key = _query.hash()
-        # Lookup if the query has been previously cached
-        result = cache.get(key)
-
+    def submit(
+        cls, _query: Query, record_access: bool = True, budget: int = None
+    ) -> pd.DataFrame:
+        """
+        :param record_access: count the access to the fields of the query, see
+                              src/cache_warming.py
+        :param budget: bytes the result may take, see src/admission.py. Queries
+                       over budget are sampled, or rejected if they can't be.
+        :raises QueryRejected: if the query does not fit the budgets
+        """
+        # Cached results are priced too, as they cost as much to process
+        _query, cost = admission.admit(_query, budget)
+        if LocalClient.can_map(_query):
+            return LocalClient.mapped(_query)
+
+        gateway = cls()
+        if record_access:
+            gateway.record_access(_query)
+        result = gateway.cached(_query)
+        if result is not None:
+            return result
         # If not cached, we execute the query and ingress from the database
+        with admission.running(cost):
+            if _query.is_projection():
+                return gateway.submit_columns(_query)
+            return gateway.fetch(_query.hash(), _query)
+
+    @classmethod
+    def submit_many(
+        cls, queries: List[Query], record_access: bool = True
+    ) -> List[pd.DataFrame]:
+        """
+        Submit queries issued together, e.g. by one user interaction, with as
+        few scans of the data source as possible:
+
+        - the columns referenced by every projection are fetched at once,
+        - extremum values of these columns are computed from them,
+        - the remaining extremum values are computed by a single aggregation.
+
+        Every result is cached as if its query had been submitted on its own.
+        The scans shared by several queries are priced and counted against
+        the budget of the worker, see src/admission.py. Columns that don't fit
+        the per-request budget together are fetched query by query.
+
+        :return: the result of each query, in order
+        """
+        gateway = cls()
+        results: List[Optional[pd.DataFrame]] = []
+        for _query in queries:
+            if record_access and not LocalClient.can_map(_query):
+                gateway.record_access(_query)
+            results.append(gateway.cached(_query))
+        pending = [i for i, result in enumerate(results) if result is None]
+
+        rows = [i for i in pending if queries[i].is_filtered_projection()]
+        columns = list(
+            dict.fromkeys(
+                column
+                for i in rows
+                for column in queries[i].referenced_columns()
+                if column != "eid"
+            )
+        )
+        prefetched = []
+        if columns:
+            # A single scan for the columns missing from the cache
+            _query = Query(["eid", *columns])
+            cost = admission.cost_model.estimate(_query)
+            if cost.bytes <= admission.request_budget:
+                with admission.running(cost):
+                    gateway.submit_columns(_query)
+                prefetched = columns
+        for i in rows:
+            results[i] = cls.submit(queries[i], record_access=False)
+
+        aggregates = [i for i in pending if queries[i].min_max_column is not None]
+        from_columns, merged = [], []
+        for i in aggregates:
+            column = queries[i].min_max_column
+            if column in prefetched or gateway.lookup(column_key(column)) is not None:
+                from_columns.append(i)
+            else:
+                merged.append(i)
+        for i in from_columns:
+            column = queries[i].min_max_column
+            values = gateway.submit_columns(Query(["eid", column]))
+            (results[i],) = aggregate([_to_numeric_frame(values)], MinMax(column))
+            gateway.store(queries[i].hash(), results[i])
+        if merged:
+            bounds = gateway.fetch_min_max([queries[i].min_max_column for i in merged])
+            for i in merged:
+                results[i] = bounds[queries[i].min_max_column]
+                gateway.store(queries[i].hash(), results[i])
+
+        for i in pending:
+            if results[i] is None:
+                results[i] = cls.submit(queries[i], record_access=False)
+        return results
+
+    def cached(self, _query: Query) -> Optional[pd.DataFrame]:
+        """
+        Answer a query from the column store or the cache tiers, without
+        running anything on the data source.
+
+        :return: the result of the query, or None if it is not cached
+        """
+        if LocalClient.can_map(_query):
+            return LocalClient.mapped(_query)
+        if _query.is_projection():
+            return self.submit_columns(_query, fetch=False)
+        result = self.from_cached_columns(_query)
         if result is None:
-            query = _query
-            result_columns = query.df_columns
-            if os.environ.get("ENV") == "PROD":
-                query = _query.build()
-            result: pd.DataFrame
-            result = cls().client.query(query).result().to_dataframe()
-            result.columns = result_columns
-            result_json = result.to_json()
-            cache.set(key, result_json)
-        # Otherwise we simply get the result from the cache.
-        else:
-            result_json = result.decode("utf-8")
-            result = pd.read_json(result_json)
+            result = self.lookup(_query.hash())
         return result
 
+    def fetch_min_max(self, columns: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        Compute the extremum values of several fields with a single scan of the
+        data source, bypassing the cache.
+
+        :return: for each field, a frame of its "min" and "max"
+        :raises QueryRejected: if the query does not fit the budgets
+        """
+        _query, cost = admission.admit(Query(["eid", *columns]).get_min_max())
+        with admission.running(cost):
+            values = self.execute(_query).iloc[0].tolist()
+        return {
+            column: pd.DataFrame([values[2 * i : 2 * i + 2]], columns=["min", "max"])
+            for i, column in enumerate(columns)
+        }
+
+    def record_access(self, _query: Query) -> None:
+        """Count one access to each of the data fields of a query."""
+        fields = [
+            column
+            for column in _query.referenced_columns()
+            if column not in ("eid", "*") and "(" not in column
+        ]
+        if fields:
+            self.access_counts.record(fields)
+
+    def fetch(self, key: str, _query: Query) -> pd.DataFrame:
+        """Execute a query and cache its result, once for concurrent requests."""
+
+        def compute():
+            if self.downloader is None or not isinstance(self.codec, codec.ArrowCodec):
+                result = self.execute(_query)
+                self.store(key, result)
+                return result
+            # The downloaded batches are encoded as they are, pandas is only
+            # needed for the result handed back to the caller
+            table = self.execute_arrow(_query)
+            result = _to_frame(table, _query.df_columns)
+            self.store(key, result, self.codec.encode_table(table, _query.df_columns))
+            return result
+
+        return self.single_flight.do(key, lambda: self.lookup(key), compute)
+
+    def evaluate(self, _query: Query) -> pd.DataFrame:
+        """Evaluate a query as cheaply as possible, without caching its result."""
+        if LocalClient.can_map(_query):
+            return LocalClient.mapped(_query)
+        result = self.from_cached_columns(_query)
+        return result if result is not None else self.execute(_query)
+
+    def from_cached_columns(self, _query: Query) -> Optional[pd.DataFrame]:
+        """
+        Filters are cheaper to evaluate on columns that are already cached
+        than to push down to the data source.
+
+        :return: the result of the query, or None if some columns are not cached
+        """
+        if not (_query.is_filtered_projection() or _query.aggregates):
+            return None
+        columns = self.submit_columns(Query(_query.referenced_columns()), fetch=False)
+        if columns is None:
+            return None
+        result = local_engine.execute(_query, [columns])
+        result.columns = _query.df_columns
+        return result
+
+    def submit_columns(
+        self, _query: Query, fetch: bool = True
+    ) -> Optional[pd.DataFrame]:
+        """
+        Answer a projection column by column. Each column is cached on its own,
+        alongside the eids it is aligned with, so that any combination of
+        previously fetched columns can be served from the cache and only the
+        missing columns are fetched from the data source.
+
+        :param fetch: if False, return None instead of fetching missing columns
+        """
+        columns = list(dict.fromkeys(c for c in _query.query_columns if c != "eid"))
+        columns = columns or ["eid"]
+
+        pieces = {}
+        for column in columns:
+            piece = self.lookup(column_key(column))
+            if piece is not None:
+                pieces[column] = piece
+
+        missing = [column for column in columns if column not in pieces]
+        if missing and not fetch:
+            return None
+        if missing:
+            fetched = self.fetch_columns(missing)
+            for column in missing:
+                pieces[column] = fetched[list(dict.fromkeys(["eid", column]))]
+
+        result = _assemble(pieces, columns)[_query.query_columns]
+        result.columns = _query.df_columns
+        return result
+
+    def fetch_columns(self, columns: List[str]) -> pd.DataFrame:
+        """
+        Fetch columns from the data source and cache each of them, once for
+        concurrent requests of the same columns.
+        """
+        _query = Query(["eid", *[c for c in columns if c != "eid"]])
+
+        def lookup():
+            pieces = {column: self.lookup(column_key(column)) for column in columns}
+            if any(piece is None for piece in pieces.values()):
+                return None
+            return _assemble(pieces, columns)
+
+        def compute():
+            fetched = self.execute(_query).sort_values("eid", ignore_index=True)
+            for column in columns:
+                self.store(
+                    column_key(column), fetched[list(dict.fromkeys(["eid", column]))]
+                )
+            return fetched
+
+        return self.single_flight.do(_query.hash(), lookup, compute)
+
+    def lookup(self, key: str) -> Optional[pd.DataFrame]:
+        """Retrieve a result from the cache tiers, or None if it is not cached."""
+        # Lookup if this worker has answered the query recently
+        result = self.local_cache.get(key)
+        if result is None:
+            # Lookup if the query has been previously cached
+            encoded = cache.get(key)
+            if encoded is not None:
+                result = codec.decode(encoded)
+                self.local_cache.set(key, result)
+        return result
+
+    def store(self, key: str, result: pd.DataFrame, encoded: bytes = None) -> None:
+        """
+        :param encoded: the result already encoded by the codec of the gateway
+        """
+        cache.set(
+            key,
+            encoded if encoded is not None else self.codec.encode(result),
+            ex=CACHE_TTL_SECONDS,
+        )
+        self.local_cache.set(key, result)
+
+    def execute(self, _query: Query) -> pd.DataFrame:
+        """Run a query against the data source, bypassing the cache."""
+        if self.downloader is not None:
+            return _to_frame(self.execute_arrow(_query), _query.df_columns)
+        result: pd.DataFrame
+        result = self.client.query(_query).result().to_dataframe()
+        result.columns = _query.df_columns
+        return result
+
+    def execute_arrow(self, _query: Query) -> pa.Table:
+        """Run a query against BigQuery and download its result as Arrow."""
+        return self.downloader.query(_query.build())
+
+
+def _to_numeric_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Values that cannot be cast to numbers become NaN, as with SAFE_CAST."""
+    return frame.apply(pd.to_numeric, errors="coerce")
+
+
+def _to_frame(table: pa.Table, columns: List[str]) -> pd.DataFrame:
+    result = table.to_pandas()
+    result.columns = columns
+    return result
+
+
+def column_key(column: str) -> str:
+    """Cache key of a single column of the dataset, aligned on eid."""
+    key = ["column", column, *LocalClient.revisions([column]).values()]
+    return dataset_version.key(
+        hashlib.sha224(json.dumps(key).encode("utf-8")).hexdigest()
+    )
+
+
+def _assemble(pieces: Dict[str, pd.DataFrame], columns: List[str]) -> pd.DataFrame:
+    """
+    Join cached columns on eid. Columns fetched together share the same eid
+    array, in which case they are simply placed side by side.
+    """
+    eid = pieces[columns[0]]["eid"]
+    data = {"eid": eid.to_numpy()}
+    misaligned = []
+    for column in columns:
+        if column == "eid":
+            continue
+        piece = pieces[column]
+        if piece["eid"].equals(eid):
+            data[column] = piece[column].to_numpy()
+        else:
+            misaligned.append(column)
+    result = pd.DataFrame(data)
+    for column in misaligned:
+        result = result.merge(pieces[column], on="eid", how="outer")
+    return result
+
 
 def field_id_meta_data():
     """
-    :return: public metadata of the UK Biobank, loaded from memory.
+    :return: public metadata of the UK Biobank, parsed once per process.
+        The frame is shared, callers must not modify it.
     """
-    return pd.read_csv(
-        os.path.join(os.path.dirname(__file__), "ukbb-public-fields-metadata.csv")
-    )
+    from src.field_metadata import MetadataCatalog
+
+    return MetadataCatalog().frame
 
 
 def data_encoding_meta_data(encoding_id):
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+from src._constants import DATASET_FILENAME, DATASET_VERSION_CHECK_SECONDS, TABLE_NAME
+from src.column_store import DATASET_DIR
+from src.dash_app import cache
+from src.resources import manager as resources
+
+# Cache keys of results computed from the dataset are `dataset:<version>:<hash>`
+KEY_PREFIX = "dataset:"
+# Number of keys scanned, and deleted, per round trip to Redis
+INVALIDATE_BATCH_SIZE = 1000
+
+
+def dataset_fingerprint() -> str:
+    """Identifies the version of the dataset the application is serving."""
+    if os.environ.get("ENV") == "PROD":
+        table = resources.bigquery().get_table(TABLE_NAME)
+        return f"{TABLE_NAME}@{table.modified.isoformat()}"
+    # The gateway keys its results by dataset version, hence the late import
+    from src.dataset_gateway import LocalClient
+
+    store = LocalClient.store
+    if store.is_available():
+        # Updates of the store only change the revision of the replaced
+        # columns, see LocalClient.revisions
+        store.refresh()
+        if "version" in store.manifest:
+            return f"{store.path.name}@{store.manifest['version']}"
+    source = (
+        store.path.joinpath("manifest.json")
+        if store.is_available()
+        else DATASET_DIR.joinpath(DATASET_FILENAME)
+    )
+    if not source.is_file():
+        return ""
+    stat = source.stat()
+    return f"{source.name}@{stat.st_size}-{int(stat.st_mtime)}"
+
+
+def version_id(fingerprint: str) -> str:
+    """Short identifier of a dataset fingerprint, used in cache keys."""
+    return hashlib.sha224(fingerprint.encode("utf-8")).hexdigest()[:12]
+
+
+class DatasetVersion:
+    """
+    Version of the dataset served by this worker. It is folded into every
+    cache key, so that results computed from another release of the dataset
+    are never served and can be invalidated by prefix.
+
+    The fingerprint is checked again every `check_seconds`, so that running
+    workers move on to a refreshed dataset without restarting.
+    """
+
+    def __init__(
+        self,
+        fingerprint: Callable[[], str] = dataset_fingerprint,
+        check_seconds: float = DATASET_VERSION_CHECK_SECONDS,
+    ):
+        self.fingerprint = fingerprint
+        self.check_seconds = check_seconds
+        self._version: Optional[str] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> str:
+        with self._lock:
+            now = time.monotonic()
+            if self._version is None or now - self._checked_at >= self.check_seconds:
+                self._version = version_id(self.fingerprint())
+                self._checked_at = now
+            return self._version
+
+    def key(self, digest: str) -> str:
+        """Cache key of a result of the current version of the dataset."""
+        return f"{KEY_PREFIX}{self.current()}:{digest}"
+
+
+def invalidate(version: str = None, keep: str = None, client=cache) -> int:
+    """
+    Delete cached results by dataset version, without blocking Redis.
+
+    :param version: version whose results are deleted, every version if None
+    :param keep: version whose results are kept
+    :return: number of deleted keys
+    """
+    pattern = f"{KEY_PREFIX}{version or '*'}:*"
+    kept = f"{KEY_PREFIX}{keep}:".encode() if keep else None
+    deleted, batch = 0, []
+    for key in client.scan_iter(match=pattern, count=INVALIDATE_BATCH_SIZE):
+        if kept is not None and key.startswith(kept):
+            continue
+        batch.append(key)
+        if len(batch) >= INVALIDATE_BATCH_SIZE:
+            deleted += client.unlink(*batch)
+            batch = []
+    if batch:
+        deleted += client.unlink(*batch)
+    return deleted
+
+
+dataset_version = DatasetVersion()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Delete the cached results of previous dataset versions."
+    )
+    parser.add_argument(
+        "--version", help="only delete the results of this dataset version"
+    )
+    args = parser.parse_args()
+    current = dataset_version.current()
+    print(f"Serving dataset version {current}")
+    print(f"Deleted {invalidate(args.version, keep=current)} cached results")
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from src.dataset_gateway import LocalClient, data_encoding_meta_data
+from src.encoding_catalog import EncodingCatalog, read_tsv_encoding
+from src.field_metadata import MetadataCatalog
+from src.field_statistics import FieldStatisticsIndex, fetch_column
+from src.value_type import ValueType
+
+
+def ingest_delta(
+    csv_path: Path,
+    columns_per_pass: int = 500,
+    fetch_encoding: Callable[[int], Dict] = data_encoding_meta_data,
+) -> List[str]:
+    """
+    Merge a delta basket of new fields and updated participants into the
+    local column store, then update the statistics and encodings of the
+    changed fields.
+
+    Cached results computed from the changed columns are no longer served,
+    as their cache keys hold the revision of these columns. Results computed
+    from other columns keep being served.
+
+    :param csv_path: path to the basket CSV, see ColumnStore.update
+    :param fetch_encoding: returns the mapping from codings to meanings of an
+                           encoding
+    :return: the columns that have been added or replaced
+    """
+    store = LocalClient.store
+    if not store.is_available():
+        raise ValueError("Ingest the dataset first: python -m src.column_store")
+    packed_fields = [
+        field.field_id for field in MetadataCatalog.fields([ValueType.CAT_MULT])
+    ]
+    changed = store.update(csv_path, columns_per_pass, packed_fields)
+
+    FieldStatisticsIndex.update(changed, fetch_column)
+    encoding_ids = {EncodingCatalog.encoding_of_field(column) for column in changed}
+    encoding_ids.discard(None)
+    if encoding_ids:
+        EncodingCatalog.update(encoding_ids, fetch_encoding)
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Merge a delta basket into the local column store."
+    )
+    parser.add_argument("csv", type=Path, help="basket CSV, with an eid column")
+    parser.add_argument("--columns-per-pass", type=int, default=500)
+    parser.add_argument(
+        "--tsv-dir",
+        type=Path,
+        default=None,
+        help="directory of coding<id>.tsv files, instead of the showcase",
+    )
+    args = parser.parse_args()
+    fetch = read_tsv_encoding(args.tsv_dir) if args.tsv_dir else data_encoding_meta_data
+    changed = ingest_delta(args.csv, args.columns_per_pass, fetch)
+    print(f"Updated {len(changed)} columns")
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import argparse
+import os
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from src._constants import ENCODING_CATALOG_FILENAME
+from src.column_store import DATASET_DIR
+from src.dataset_gateway import Singleton, data_encoding_meta_data
+from src.field_metadata import MetadataCatalog
+
+
+class Encoding(Mapping):
+    """
+    The codings of one categorical encoding and their meanings, read-only
+    mapping from a coding to its meaning.
+
+    Codings are kept sorted in an array, next to their meanings, and looked
+    up by binary search rather than through a dict of Python objects.
+    """
+
+    def __init__(self, codings: np.ndarray, meanings: np.ndarray):
+        # Integer codings are looked up as integers, like the showcase files
+        # parsed by pandas
+        numeric = pd.to_numeric(pd.Series(codings), errors="coerce")
+        if len(codings) and numeric.notna().all() and (numeric % 1 == 0).all():
+            codings = numeric.astype(np.int64).to_numpy()
+        order = np.argsort(codings, kind="stable")
+        self.codings = codings[order]
+        self.meanings = meanings[order]
+
+    def __getitem__(self, coding):
+        try:
+            position = int(np.searchsorted(self.codings, coding))
+        except (TypeError, ValueError):
+            raise KeyError(coding)
+        if position == len(self.codings) or self.codings[position] != coding:
+            raise KeyError(coding)
+        return self.meanings[position]
+
+    def __iter__(self):
+        return iter(self.codings.tolist())
+
+    def __len__(self):
+        return len(self.codings)
+
+
+class EncodingCatalog(metaclass=Singleton):
+    """
+    Local copy of every categorical encoding of the UK Biobank showcase.
+
+    The catalog is a single Arrow IPC file holding (encoding_id, coding,
+    meaning) rows sorted by encoding. It is memory-mapped, so all gunicorn
+    workers share one copy of it through the OS page cache. Each worker only
+    sorts the codings of an encoding the first time it is needed.
+    Encodings missing from the catalog are fetched from the showcase once
+    per worker.
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = path or DATASET_DIR.joinpath(ENCODING_CATALOG_FILENAME)
+        self._table: Optional[pa.Table] = None
+        self._offsets: Dict[int, tuple] = {}
+        self._encodings: Dict[int, Encoding] = {}
+        self.load()
+
+    def load(self) -> None:
+        self._table, self._offsets, self._encodings = None, {}, {}
+        if not os.path.isfile(self.path):
+            return
+        source = pa.memory_map(str(self.path), "r")
+        self._table = pa.ipc.open_file(source).read_all()
+        ids = self._table.column("encoding_id").to_numpy()
+        encoding_ids, starts = np.unique(ids, return_index=True)
+        stops = np.append(starts[1:], len(ids))
+        self._offsets = dict(zip(encoding_ids.tolist(), zip(starts, stops)))
+
+    @classmethod
+    def lookup(cls, encoding_id: int) -> Encoding:
+        """Mapping from the codings of an encoding to their meaning."""
+        return cls().encoding(int(encoding_id))
+
+    def encoding(self, encoding_id: int) -> Encoding:
+        encoding = self._encodings.get(encoding_id)
+        if encoding is None:
+            if encoding_id in self._offsets:
+                start, stop = self._offsets[encoding_id]
+                rows = self._table.slice(start, stop - start)
+                encoding = Encoding(
+                    rows.column("coding").to_numpy(zero_copy_only=False),
+                    rows.column("meaning").to_numpy(zero_copy_only=False),
+                )
+            else:
+                print(f"Encoding {encoding_id} is not in the catalog, fetching it")
+                encoding = _to_encoding(data_encoding_meta_data(encoding_id))
+            self._encodings[encoding_id] = encoding
+        return encoding
+
+    @classmethod
+    def encoding_of_field(cls, field_id) -> Optional[int]:
+        """
+        :param field_id: a field, or any of its columns such as `31-0.0`
+        :return: the encoding of a categorical field, None for other fields
+        """
+        field = MetadataCatalog.get(field_id)
+        return field.encoding_id if field is not None else None
+
+    @classmethod
+    def prefetch(cls, field_ids: Iterable) -> None:
+        """
+        Prepare, in the background, the encodings of fields that are about to
+        be plotted, e.g. the ones selected in the tree.
+        """
+        encoding_ids = {cls.encoding_of_field(field_id) for field_id in field_ids}
+        encoding_ids.discard(None)
+        catalog = cls()
+        missing = [e for e in encoding_ids if e not in catalog._encodings]
+        if missing:
+            threading.Thread(
+                target=lambda: [catalog.encoding(e) for e in missing], daemon=True
+            ).start()
+
+    @classmethod
+    def build(
+        cls,
+        encoding_ids: Iterable[int],
+        fetch: Callable[[int], Dict] = data_encoding_meta_data,
+        path: Path = None,
+    ) -> EncodingCatalog:
+        """
+        Import encodings into the catalog.
+
+        :param encoding_ids: encodings to import
+        :param fetch: returns the mapping from codings to meanings of an encoding
+        """
+        path = path or DATASET_DIR.joinpath(ENCODING_CATALOG_FILENAME)
+        ids: List[int] = []
+        codings: List[str] = []
+        meanings: List[str] = []
+        for encoding_id in sorted(set(int(e) for e in encoding_ids)):
+            meaning_of = fetch(encoding_id)
+            ids.extend([encoding_id] * len(meaning_of))
+            codings.extend(str(coding) for coding in meaning_of.keys())
+            meanings.extend(str(meaning) for meaning in meaning_of.values())
+        table = pa.table(
+            {
+                "encoding_id": pa.array(ids, type=pa.int32()),
+                "coding": pa.array(codings, type=pa.string()),
+                "meaning": pa.array(meanings, type=pa.string()),
+            }
+        )
+        tmp_path = Path(str(path) + ".tmp")
+        with pa.OSFile(str(tmp_path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        catalog = cls()
+        if catalog.path == path:
+            catalog.load()
+        return catalog
+
+    @classmethod
+    def update(
+        cls,
+        encoding_ids: Iterable[int],
+        fetch: Callable[[int], Dict] = data_encoding_meta_data,
+        path: Path = None,
+    ) -> EncodingCatalog:
+        """
+        Import encodings into the catalog again, e.g. the ones of updated
+        fields, keeping the other encodings of the catalog.
+        """
+        path = path or DATASET_DIR.joinpath(ENCODING_CATALOG_FILENAME)
+        encoding_ids = {int(e) for e in encoding_ids}
+        kept: Dict[int, Dict] = {}
+        if os.path.isfile(path):
+            rows = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+            for encoding_id, encoding in rows.to_pandas().groupby("encoding_id"):
+                if encoding_id not in encoding_ids:
+                    kept[int(encoding_id)] = dict(
+                        zip(encoding["coding"], encoding["meaning"])
+                    )
+        return cls.build(
+            encoding_ids | kept.keys(),
+            lambda e: kept[e] if e in kept else fetch(e),
+            path,
+        )
+
+
+def metadata_encodings() -> List[int]:
+    """Every encoding used by a field of the metadata."""
+    encoding_ids = {field.encoding_id for field in MetadataCatalog.fields()}
+    encoding_ids.discard(None)
+    return sorted(encoding_ids)
+
+
+def read_tsv_encoding(directory: Path) -> Callable[[int], Dict]:
+    """
+    Fetch encodings from a directory of files downloaded from the showcase,
+    named `coding<encoding_id>.tsv`.
+    """
+
+    def fetch(encoding_id: int) -> Dict:
+        frame = pd.read_csv(directory.joinpath(f"coding{encoding_id}.tsv"), sep="\t")
+        return frame.set_index("coding")["meaning"].to_dict()
+
+    return fetch
+
+
+def _to_encoding(meaning_of: Dict) -> Encoding:
+    codings = np.array([str(coding) for coding in meaning_of.keys()], dtype=object)
+    meanings = np.array(list(meaning_of.values()), dtype=object)
+    return Encoding(codings, meanings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Import the encodings of every categorical field."
+    )
+    parser.add_argument(
+        "--tsv-dir",
+        type=Path,
+        default=None,
+        help="directory of coding<id>.tsv files, instead of the showcase",
+    )
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args()
+    fetch = read_tsv_encoding(args.tsv_dir) if args.tsv_dir else data_encoding_meta_data
+    EncodingCatalog.build(metadata_encodings(), fetch, args.out)
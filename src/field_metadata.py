@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import os
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from src.dataset_gateway import Singleton
+from src.tree.node import NodeIdentifier
+from src.value_type import ValueType
+
+METADATA_PATH = os.path.join(
+    os.path.dirname(__file__), "ukbb-public-fields-metadata.csv"
+)
+
+
+class FieldMetadata:
+    """Public metadata of one data field of the UK Biobank."""
+
+    def __init__(
+        self,
+        field_id: str,
+        value_type: ValueType,
+        encoding_id: Optional[int],
+        instanced: bool,
+        instance_min: int,
+        instance_max: int,
+        array_min: int,
+        array_max: int,
+        num_participants: int,
+    ):
+        self.field_id = field_id
+        self.value_type = value_type
+        self.encoding_id = encoding_id
+        self.instanced = instanced
+        self.instance_min = instance_min
+        self.instance_max = instance_max
+        self.array_min = array_min
+        self.array_max = array_max
+        self.num_participants = num_participants
+
+    @property
+    def instances(self) -> range:
+        return range(self.instance_min, self.instance_max + 1)
+
+    @property
+    def arrays(self) -> range:
+        return range(self.array_min, self.array_max + 1)
+
+    @property
+    def is_categorical(self) -> bool:
+        return self.value_type in (ValueType.CAT_SINGLE, ValueType.CAT_MULT)
+
+    def columns(self) -> List[str]:
+        """Identifiers of every column of the field, e.g. `31-0.0`."""
+        return [
+            f"{self.field_id}-{instance}.{array}"
+            for instance in self.instances
+            for array in self.arrays
+        ]
+
+
+class MetadataCatalog(metaclass=Singleton):
+    """
+    Field metadata, parsed once per process and indexed by field identifier.
+    """
+
+    def __init__(self, path: str = METADATA_PATH):
+        self.path = path
+        self.frame = pd.read_csv(path)
+        self._fields: Dict[str, FieldMetadata] = {
+            str(row.field_id): _to_field(row)
+            for row in self.frame.itertuples(index=False)
+        }
+
+    @classmethod
+    def lookup(cls, field_id) -> FieldMetadata:
+        """
+        :param field_id: a field, or any of its columns such as `31-0.0`
+        :raises KeyError: if the field is not described by the metadata
+        """
+        return cls()._fields[NodeIdentifier(str(field_id)).field_id]
+
+    @classmethod
+    def get(cls, field_id) -> Optional[FieldMetadata]:
+        return cls()._fields.get(NodeIdentifier(str(field_id)).field_id)
+
+    @classmethod
+    def fields(cls, value_types: Iterable[ValueType] = None) -> List[FieldMetadata]:
+        """
+        :param value_types: only return fields of these types
+        :return: metadata of every field, in the order of the metadata file
+        """
+        fields = cls()._fields.values()
+        if value_types is None:
+            return list(fields)
+        value_types = set(value_types)
+        return [field for field in fields if field.value_type in value_types]
+
+
+def _to_field(row) -> FieldMetadata:
+    return FieldMetadata(
+        field_id=str(row.field_id),
+        value_type=ValueType(int(row.value_type)),
+        encoding_id=int(row.encoding_id) or None,
+        instanced=int(row.instanced) == 1,
+        instance_min=int(row.instance_min),
+        instance_max=int(row.instance_max),
+        array_min=int(row.array_min),
+        array_max=int(row.array_max),
+        num_participants=int(row.num_participants),
+    )
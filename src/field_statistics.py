@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src._constants import FIELD_STATISTICS_FILENAME
+from src.column_store import DATASET_DIR
+from src.dataset_gateway import DatasetGateway, LocalClient, Query, Singleton
+from src.dataset_version import dataset_fingerprint
+from src.field_metadata import MetadataCatalog
+from src.tree.node import NodeIdentifier
+
+HISTOGRAM_BINS = 20
+
+
+class ColumnStatistics:
+    """Summary of the values of one column of the dataset."""
+
+    def __init__(
+        self,
+        count: int,
+        null_count: int,
+        distinct_count: int,
+        minimum: float = None,
+        maximum: float = None,
+        histogram_edges: List[float] = None,
+        histogram_counts: List[int] = None,
+    ):
+        self.count = count
+        self.null_count = null_count
+        self.distinct_count = distinct_count
+        self.min = minimum
+        self.max = maximum
+        self.histogram_edges = histogram_edges or []
+        self.histogram_counts = histogram_counts or []
+
+    @classmethod
+    def compute(cls, values: pd.Series) -> ColumnStatistics:
+        """
+        :param values: every value of a column, as stored in the dataset
+        """
+        present = values.replace("", np.nan).dropna()
+        numeric = pd.to_numeric(present, errors="coerce").dropna()
+        statistics = cls(
+            count=int(len(present)),
+            null_count=int(len(values) - len(present)),
+            distinct_count=int(present.nunique()),
+        )
+        if len(numeric):
+            statistics.min = float(numeric.min())
+            statistics.max = float(numeric.max())
+            counts, edges = np.histogram(numeric.to_numpy(), bins=HISTOGRAM_BINS)
+            statistics.histogram_edges = edges.tolist()
+            statistics.histogram_counts = counts.tolist()
+        return statistics
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "null_count": self.null_count,
+            "distinct_count": self.distinct_count,
+            "minimum": self.min,
+            "maximum": self.max,
+            "histogram_edges": self.histogram_edges,
+            "histogram_counts": self.histogram_counts,
+        }
+
+    @classmethod
+    def from_dict(cls, values: dict) -> ColumnStatistics:
+        return cls(**values)
+
+
+class FieldStatisticsIndex(metaclass=Singleton):
+    """
+    Precomputed statistics of every column of the dataset, built offline and
+    loaded once per worker. The index is ignored if it was built from a
+    different version of the dataset than the one currently served.
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = path or DATASET_DIR.joinpath(FIELD_STATISTICS_FILENAME)
+        self.columns: Dict[str, ColumnStatistics] = {}
+        self.field_counts: Dict[str, int] = {}
+        self.load()
+
+    def load(self) -> None:
+        self.columns, self.field_counts = {}, {}
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path) as f:
+            index = json.load(f)
+        if index.get("fingerprint") != dataset_fingerprint():
+            print("Ignoring field statistics built from another dataset version")
+            return
+        for db_id, values in index["columns"].items():
+            statistics = ColumnStatistics.from_dict(values)
+            self.columns[db_id] = statistics
+            field_id = NodeIdentifier(_meta_id(db_id)).field_id
+            self.field_counts[field_id] = (
+                self.field_counts.get(field_id, 0) + statistics.count
+            )
+
+    @classmethod
+    def lookup(cls, db_id: str) -> Optional[ColumnStatistics]:
+        """Statistics of a column, or None if it is not part of the index."""
+        return cls().columns.get(db_id)
+
+    @classmethod
+    def field_count(cls, field_id: str) -> Optional[int]:
+        """Number of values of a field, over all its columns, if indexed."""
+        return cls().field_counts.get(str(field_id))
+
+    @classmethod
+    def build(
+        cls,
+        columns: Iterable[str],
+        fetch: Callable[[str], pd.Series],
+        path: Path = None,
+    ) -> FieldStatisticsIndex:
+        """
+        Compute the statistics of the given columns and write the index.
+
+        :param columns: database identifiers of the columns to index
+        :param fetch: returns all the values of a column, or raises KeyError
+                      if the column is not part of the dataset
+        """
+        path = path or DATASET_DIR.joinpath(FIELD_STATISTICS_FILENAME)
+        return cls._write({}, columns, fetch, path)
+
+    @classmethod
+    def update(
+        cls,
+        columns: Iterable[str],
+        fetch: Callable[[str], pd.Series],
+        path: Path = None,
+    ) -> FieldStatisticsIndex:
+        """
+        Compute the statistics of the given columns again, e.g. after they
+        have been updated, keeping the statistics of the other columns.
+
+        :param columns: database identifiers of the columns to index
+        :param fetch: see build
+        """
+        path = path or DATASET_DIR.joinpath(FIELD_STATISTICS_FILENAME)
+        statistics = {}
+        if os.path.isfile(path):
+            with open(path) as f:
+                index = json.load(f)
+            if index.get("fingerprint") == dataset_fingerprint():
+                statistics = index["columns"]
+        return cls._write(statistics, columns, fetch, path)
+
+    @classmethod
+    def _write(
+        cls,
+        statistics: Dict[str, dict],
+        columns: Iterable[str],
+        fetch: Callable[[str], pd.Series],
+        path: Path,
+    ) -> FieldStatisticsIndex:
+        for db_id in columns:
+            try:
+                statistics[db_id] = ColumnStatistics.compute(fetch(db_id)).to_dict()
+            except KeyError:
+                statistics.pop(db_id, None)
+        tmp_path = Path(str(path) + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"fingerprint": dataset_fingerprint(), "columns": statistics}, f)
+        os.replace(tmp_path, path)
+        index = cls()
+        if index.path == path:
+            index.load()
+        return index
+
+
+def metadata_columns() -> List[str]:
+    """Database identifiers of every column described by the field metadata."""
+    return [
+        NodeIdentifier(column).db_id()
+        for field in MetadataCatalog.fields()
+        for column in field.columns()
+    ]
+
+
+def fetch_column(db_id: str) -> pd.Series:
+    """Read every value of a column, bypassing the query cache."""
+    if os.environ.get("ENV") != "PROD":
+        return LocalClient.store.read([db_id])[db_id]
+    try:
+        return DatasetGateway().execute(Query([db_id]))[db_id]
+    except Exception as e:
+        raise KeyError(db_id) from e
+
+
+def _meta_id(db_id: str) -> str:
+    """Map a database identifier (`_31_0_0` in PROD) back to `31-0.0`."""
+    if db_id.startswith("_"):
+        field_id, instance_id, part_id = db_id[1:].split("_")
+        return f"{field_id}-{instance_id}.{part_id}"
+    return db_id
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the statistics index of every field of the dataset."
+    )
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args()
+    if os.environ.get("ENV") != "PROD" and not LocalClient.store.is_available():
+        raise SystemExit("Ingest the dataset first: python -m src.column_store")
+    FieldStatisticsIndex.build(metadata_columns(), fetch_column, args.out)
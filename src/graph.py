@@ -14,6 +14,7 @@ from src.graph_data import (
     get_column_names,
     get_graph_axes_title,
     get_field_name,
+    get_instance_labels,
     largest_triangle_three_buckets,
 )
 
@@ -150,8 +151,12 @@ def bar_plot(
 ):
     colour_name = None if (colour_id is None) else get_graph_axes_title(colour_id)
     processed_df = to_categorical_data(node_id_x, filtered_data, colour_name)
-    fig = px.bar(processed_df, x="categories", y="counts", color=colour_name)
-    return format_graph(fig, node_id_x, None, (colour_id is not None))
+    return bar_counts_plot(node_id_x, processed_df, colour_name)
+
+
+def bar_counts_plot(node_id_x: NodeIdentifier, counts: pd.DataFrame, colour_name=None):
+    fig = px.bar(counts, x="categories", y="counts", color=colour_name)
+    return format_graph(fig, node_id_x, None, (colour_name is not None))
 
 
 def pie_plot(
@@ -162,7 +167,11 @@ def pie_plot(
     trendline=None,
 ):
     processed_df = to_categorical_data(node_id_x, filtered_data)
-    fig = px.pie(processed_df, names="categories", values="counts")
+    return pie_counts_plot(node_id_x, processed_df)
+
+
+def pie_counts_plot(node_id_x: NodeIdentifier, counts: pd.DataFrame, colour_name=None):
+    fig = px.pie(counts, names="categories", values="counts")
     return format_graph(fig, node_id_x, None, True)
 
 
@@ -185,7 +194,73 @@ def format_graph(fig, node_id_x, node_id_y, showlegend):
     return fig
 
 
+def instances_violin_plot(
+    node_id_x: NodeIdentifier, wide: pd.DataFrame, trendline: int = None
+):
+    """One violin per instance of a field, side by side."""
+    labels = get_instance_labels(node_id_x.field_id)
+    fig = go.Figure()
+    for column in wide.columns.drop("eid"):
+        fig.add_trace(go.Violin(y=wide[column].dropna(), name=labels[column]))
+    fig.update_traces(meanline_visible=True, box_visible=True, opacity=0.6)
+    fig.update_layout(yaxis_title=get_field_name(node_id_x.field_id))
+    return format_graph(fig, node_id_x, None, False)
+
+
+def instances_scatter_plot(
+    node_id_x: NodeIdentifier, wide: pd.DataFrame, trendline: int = None
+):
+    """
+    Values of each later instance of a field against the first one, for the
+    participants who attended both visits.
+    """
+    labels = get_instance_labels(node_id_x.field_id)
+    first, *later = wide.columns.drop("eid")
+    pairs = pd.concat(
+        [
+            pd.DataFrame(
+                {
+                    labels[first]: wide[first],
+                    "Later instance": wide[column],
+                    "Instance": labels[column],
+                }
+            ).dropna()
+            for column in later
+        ],
+        ignore_index=True,
+    )
+    trendline_arg = {1: "ols", 2: "lowess"}.get(trendline)
+    fig = px.scatter(
+        data_frame=pairs,
+        x=labels[first],
+        y="Later instance",
+        color="Instance",
+        trendline=trendline_arg,
+        render_mode="webgl",
+    )
+    return format_graph(fig, node_id_x, None, True)
+
+
 switcher = {1: violin_plot, 2: scatter_plot, 3: bar_plot, 4: pie_plot}
+# Graphs of every instance of a single field
+instances_switcher = {6: instances_violin_plot, 7: instances_scatter_plot}
+
+
+# Graphs of the number of participants taking each label
+counts_switcher = {3: bar_counts_plot, 4: pie_counts_plot}
+
+
+def get_counts_plot(counts: DataFrame, str_id_x, str_id_colour, graph_type):
+    """Returns a graph of already counted categorical data"""
+    colour_name = (
+        get_graph_axes_title(NodeIdentifier(str_id_colour)) if str_id_colour else None
+    )
+    return counts_switcher[graph_type](NodeIdentifier(str_id_x), counts, colour_name)
+
+
+def get_instances_plot(wide: DataFrame, str_id_x, graph_type, trendline):
+    """Returns a graph comparing the instances of a field"""
+    return instances_switcher[graph_type](NodeIdentifier(str_id_x), wide, trendline)
 
 
 def get_field_plot(
@@ -1,14 +1,18 @@
 import math
 import time
 
+import numpy as np
 import pandas as pd
 from pandas.core.frame import DataFrame
 import dash_bootstrap_components as dbc
-import functools
+from src.dataset_gateway import DatasetGateway, Query
 from src.value_type import ValueType
-from src.dataset_gateway import field_id_meta_data, data_encoding_meta_data
+from src.encoding_catalog import EncodingCatalog
+from src.field_metadata import MetadataCatalog
+from src.packed_fields import PackedField
+from src.predicates import NumericCastable
 from src.tree.node import NodeIdentifier
-from src.tree.node_utils import get_field_names_to_inst
+from src.tree.name_index import NameIndex
 
 
 def largest_triangle_three_buckets(data: pd.DataFrame, ratio=0.5):
@@ -92,28 +96,14 @@ def is_categorical_data(node_id: NodeIdentifier):
     )
 
 
-def has_multiple_instances(field_info):
-    """Determine if a data field has multiple instances"""
-    return field_info["instanced"].values[0] == 1
-
-
-@functools.lru_cache
 def get_field_type(field_id):
     """Determine the data type of a field from its identifier"""
-    df = field_id_meta_data()
-    x_value_type_id = int(df[df["field_id"] == int(field_id)]["value_type"].values[0])
-    return ValueType(x_value_type_id)
+    return MetadataCatalog.lookup(field_id).value_type
 
 
 def get_categorical_dict(node_id):
     """Returns a dict relating encoding to name of each label in category"""
-    field_id_meta = field_id_meta_data()
-    encoding_id = int(
-        field_id_meta.loc[field_id_meta["field_id"] == int(node_id.field_id)][
-            "encoding_id"
-        ].values[0]
-    )
-    return data_encoding_meta_data(encoding_id)
+    return EncodingCatalog.lookup(MetadataCatalog.lookup(node_id.field_id).encoding_id)
 
 
 def prune_data(dataframe: DataFrame):
@@ -125,55 +115,22 @@ def prune_data(dataframe: DataFrame):
     return remove_non_numeric
 
 
-# Global data used for all operations
-field_names_to_inst = get_field_names_to_inst()
-field_names_to_ids = field_names_to_inst.loc[
-    field_names_to_inst["InstanceID"].isnull()
-][["FieldID", "NodeName"]].dropna(how="any", axis=0)
-field_names_to_ids["FieldID"] = field_names_to_ids["FieldID"].apply(
-    lambda field_id: str(int(field_id))
-)
 pd.set_option("display.max_rows", None, "display.max_columns", None)
 
 
 def get_field_name(field_id):
     """Extract a human-readable name from a data field identifier."""
-    row_with_name = field_names_to_ids.loc[
-        field_names_to_ids["FieldID"] == str(field_id), "NodeName"
-    ]
-    return row_with_name.item()
+    return NameIndex.field_name(field_id)
 
 
 def get_graph_axes_title(node_id: NodeIdentifier):
     """Generate title for a graph axis from a data field identifier"""
-    if not node_id:
-        return None
-    return f"{get_field_name(node_id.field_id)} ({node_id.db_id()})"
+    return NameIndex.axis_title(node_id)
 
 
 def get_inst_name_dict(field_id):
     """Extract the different instance names of a given data field."""
-    field_id_meta = field_id_meta_data()
-    field_info = field_id_meta[field_id_meta["field_id"] == int(field_id)]
-    inst_names = field_names_to_inst.loc[
-        field_names_to_inst["FieldID"] == int(field_id)
-    ].copy()
-
-    if has_multiple_instances(field_info):
-        # There are multiple instances. Drop row with field name
-        inst_names = inst_names.loc[inst_names["InstanceID"].notnull()]
-        inst_names["MetaID"] = inst_names.apply(
-            (lambda row: f"{field_id}-{int(row.InstanceID)}.0"), axis=1
-        )
-    else:
-        instance = (
-            field_info["instance_min"].iloc[0]
-            if inst_names["InstanceID"].isna().values.any()
-            else inst_names["InstanceID"].iloc[0]
-        )
-        inst_names["MetaID"] = field_id + f"-{instance}.0"
-    inst_name_dict = dict(zip(inst_names["MetaID"], inst_names["NodeName"]))
-    return inst_name_dict
+    return NameIndex.instance_names(field_id)
 
 
 def to_categorical_data(node_id, filtered_data, colour_name=None):
@@ -209,6 +166,121 @@ def to_categorical_data(node_id, filtered_data, colour_name=None):
     return encoding_counts[columns_to_return]
 
 
+def to_categorical_counts(node_id, grouped: DataFrame, colour_id=None):
+    """
+    Label the counts of a categorical field computed by the data source
+
+    :param grouped: the value of the field, of the colour if given, and the
+                    number of participants taking them, see Query.group_count
+    """
+    colour_name = None if colour_id is None else get_graph_axes_title(colour_id)
+    keys = list(grouped.columns[:-1])
+    counts = grouped.copy()
+    counts[keys] = counts[keys].apply(pd.to_numeric, errors="coerce")
+    # Values only differing by their formatting (1 and 1.0) are counted together
+    counts = counts.groupby(keys, as_index=False, sort=True)[grouped.columns[-1]].sum()
+    counts.columns = (
+        ["value", "counts"] if colour_name is None else ["value", colour_name, "counts"]
+    )
+
+    encoding_dict = get_categorical_dict(node_id)
+    counts["categories"] = counts["value"].astype(int).map(encoding_dict)
+    columns = ["categories", "counts"]
+    return counts[columns if colour_name is None else [colour_name, *columns]]
+
+
+DESCRIBE_INDEX = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+
+
+def weighted_describe(values: np.ndarray, weights: np.ndarray) -> pd.Series:
+    """
+    Same as Series.describe, for a series holding each value as many times as
+    its weight.
+    """
+    present = ~np.isnan(values) & (weights > 0)
+    order = np.argsort(values[present], kind="stable")
+    values, weights = values[present][order], weights[present][order]
+    count = weights.sum()
+    if not count:
+        return pd.Series([0.0, *[np.nan] * 7], index=DESCRIBE_INDEX)
+
+    mean = (values * weights).sum() / count
+    variance = (
+        (weights * (values - mean) ** 2).sum() / (count - 1) if count > 1 else np.nan
+    )
+    # Value of the k-th row once sorted, interpolated linearly as by describe
+    positions = np.array([0.25, 0.5, 0.75]) * (count - 1)
+    cumulative = np.cumsum(weights)
+    low = values[np.searchsorted(cumulative, np.floor(positions), side="right")]
+    high = values[np.searchsorted(cumulative, np.ceil(positions), side="right")]
+    quartiles = low + (high - low) * (positions - np.floor(positions))
+    return pd.Series(
+        [count, mean, math.sqrt(variance), values[0], *quartiles, values[-1]],
+        index=DESCRIBE_INDEX,
+    )
+
+
+def get_count_statistics(grouped: DataFrame, node_id_x: NodeIdentifier):
+    """Summary statistics of a field computed from the counts of its values"""
+    stats = weighted_describe(
+        pd.to_numeric(grouped.iloc[:, 0], errors="coerce").to_numpy(float),
+        grouped.iloc[:, -1].to_numpy(float),
+    )
+    stats = pd.DataFrame([stats])
+    stats.insert(0, "Variables", [get_field_name(node_id_x.field_id)])
+    return dbc.Table.from_dataframe(stats, striped=True, bordered=True, hover=True)
+
+
+def is_multi_valued(node_id: NodeIdentifier):
+    """Determine if a categorical field holds several values per instance."""
+    field = MetadataCatalog.lookup(node_id.field_id)
+    return field.value_type == ValueType.CAT_MULT and len(field.arrays) > 1
+
+
+def to_multi_categorical_data(packed: PackedField, node_id, colour_id=None):
+    """
+    Process every array slot of a multi-valued field and return the number of
+    participants taking each label
+    """
+    if colour_id is None:
+        counts = packed.count()
+    else:
+        colour_name = get_graph_axes_title(colour_id)
+        colours = DatasetGateway.submit(
+            Query.from_identifier(colour_id).filter(NumericCastable(colour_id.db_id()))
+        )
+        # Position of the colour of each participant, -1 if it has none
+        position = pd.Index(colours["eid"]).get_indexer(packed.eids)
+        values = pd.to_numeric(colours.iloc[:, 1]).to_numpy()
+        groups = np.where(position >= 0, values[position], np.nan)
+        counts = packed.count(position >= 0, groups)
+        counts = counts.rename(columns={"group": colour_name})
+
+    encoding_dict = {str(k): v for k, v in get_categorical_dict(node_id).items()}
+    counts["categories"] = counts["value"].map(encoding_dict).fillna(counts["value"])
+    counts = counts.rename(columns={"count": "counts"}).drop(columns="value")
+    columns = ["categories", "counts"]
+    return counts[columns if colour_id is None else [colour_name, *columns]]
+
+
+def get_multi_valued_statistics(packed: PackedField, node_id):
+    """Summary of the values reported in every array slot of a field"""
+    reported = np.diff(packed.offsets)
+    stats = pd.DataFrame(
+        {
+            "Variables": [get_field_name(node_id.field_id)],
+            "participants": [int(np.count_nonzero(reported))],
+            "values": [int(reported.sum())],
+            "distinct values": [len(packed.dictionary)],
+            "mean values per participant": [
+                reported[reported > 0].mean() if reported.any() else 0
+            ],
+            "max values per participant": [int(reported.max(initial=0))],
+        }
+    )
+    return dbc.Table.from_dataframe(stats, striped=True, bordered=True, hover=True)
+
+
 def rename_category_entries(filtered_data, node_id):
     """
     Modify entries of the specific column of input dataframe to label names.
@@ -227,6 +299,27 @@ def get_inst_names_options(raw_id):
     return get_inst_name_dict(field_id)
 
 
+def get_instance_labels(field_id):
+    """Short name of each instance of a field, e.g. `Imaging visit (2014+)`."""
+    return {
+        meta_id: name.split(")", 1)[0] + ")" if ")" in name else name
+        for meta_id, name in get_inst_name_dict(field_id).items()
+    }
+
+
+def get_instance_statistics(wide: DataFrame, field_id):
+    """
+    Summary statistics of each instance of a field.
+
+    :param wide: one column per instance, as returned by fetch_instances
+    """
+    labels = get_instance_labels(field_id)
+    instances = wide.loc[:, wide.columns != "eid"]
+    stats = instances.describe().transpose()
+    stats.insert(0, "Instances", [labels[column] for column in instances.columns])
+    return dbc.Table.from_dataframe(stats, striped=True, bordered=True, hover=True)
+
+
 def get_statistics(data, node_id_x: NodeIdentifier, node_id_y: NodeIdentifier = None):
     """Update the summary statistics when the dropdown selection changes"""
     if (node_id_x is None) | (data is None):
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+from typing import List
+
+import os
+
+import pandas as pd
+
+from src.dataset_gateway import DatasetGateway, LocalClient, Query, _to_numeric_frame
+from src.field_metadata import MetadataCatalog
+from src.packed_fields import PackedField
+from src.tree.name_index import NameIndex
+from src.tree.node import NodeIdentifier
+from src.value_type import ValueType
+
+# Value types whose values are plotted as numbers
+NUMERIC_TYPES = (
+    ValueType.INTEGER,
+    ValueType.CONT,
+    ValueType.CAT_SINGLE,
+    ValueType.CAT_MULT,
+)
+
+
+def instance_columns(field_id: str) -> List[NodeIdentifier]:
+    """Identifiers of the columns holding each instance of a field."""
+    return [NodeIdentifier(meta_id) for meta_id in NameIndex.instance_names(field_id)]
+
+
+def fetch_instances(field_id: str) -> pd.DataFrame:
+    """
+    Fetch every instance of a field in a single scan of the data source. Each
+    instance is cached as a column of its own, so plots of a single instance
+    are served from the same result.
+
+    :return: a wide frame holding the eid and one column per instance, named
+             after the instance (e.g. `21001-2.0`). Values of numeric and
+             categorical fields are cast to numbers.
+    """
+    node_ids = instance_columns(field_id)
+    wide = DatasetGateway.submit(Query.from_identifiers(node_ids))
+    wide = wide.set_axis(["eid", *[node_id.meta_id() for node_id in node_ids]], axis=1)
+    if MetadataCatalog.lookup(field_id).value_type in NUMERIC_TYPES:
+        wide = pd.concat([wide[["eid"]], _to_numeric_frame(wide.iloc[:, 1:])], axis=1)
+    return wide
+
+
+def to_long(wide: pd.DataFrame) -> pd.DataFrame:
+    """
+    :param wide: instances of a field, as returned by fetch_instances
+    :return: one row per participant and instance with a value, with columns
+             `eid`, `instance` and `value`
+    """
+    long = wide.melt(id_vars="eid", var_name="instance", value_name="value")
+    long = long.dropna(subset=["value"])
+    instances = {c: int(NodeIdentifier(c).instance_id) for c in wide.columns[1:]}
+    long["instance"] = long["instance"].map(instances)
+    return long.reset_index(drop=True)
+
+
+def array_columns(node_id: NodeIdentifier) -> List[NodeIdentifier]:
+    """Identifiers of the columns holding each array slot of an instance."""
+    field = MetadataCatalog.lookup(node_id.field_id)
+    return [
+        NodeIdentifier(f"{node_id.field_id}-{node_id.instance_id}.{array}")
+        for array in field.arrays
+    ]
+
+
+def fetch_arrays(node_id: NodeIdentifier) -> PackedField:
+    """
+    Every array slot of an instance of a multi-valued field, packed per
+    participant. Locally, fields packed by the column store are memory-mapped.
+    Otherwise the slots are fetched in a single scan, and cached as columns.
+
+    :param node_id: any column of the instance, e.g. `20002-0.0`
+    """
+    instance = f"{node_id.field_id}-{node_id.instance_id}"
+    local = os.environ.get("ENV") != "PROD"
+    store = LocalClient.store
+    if local and store.is_available() and store.has_packed(instance):
+        return store.map_packed(instance)
+
+    slots = [slot.db_id() for slot in array_columns(node_id)]
+    if local:
+        # The local dataset may only hold some of the slots
+        columns = set(LocalClient.columns())
+        slots = [slot for slot in slots if slot in columns]
+    data = DatasetGateway.submit(Query(["eid", *slots]))
+    return PackedField.from_columns(data["eid"].to_numpy(), data[slots])
@@ -7,14 +7,19 @@ from sklearn.manifold import TSNE
 from umap import UMAP
 
 from src.dash_app import app
-from src.dataset_gateway import DatasetGateway, Query
+from src._constants import EMBEDDING_BUDGET_BYTES
+from src.admission import QueryRejected, admission, notices
+from src.dataset_gateway import Query
 from src.layout.cards.settings.callbacks.instance_selection import (
     _get_updated_instances,
 )
 from src.layout.cards.settings.callbacks.variable_selection import get_dropdown_id
+from src.predicates import NumericCastable
+from src.sampling import draw_sample
 from src.tree.node import NodeIdentifier
 import plotly.express as px
 import numpy as np
+import pandas as pd
 import dash
 from src.dash_app import app
 
@@ -229,6 +234,26 @@ umap_neighbours_slider = dbc.FormGroup(
     ]
 )
 
+sample_strata_dropdown = dbc.FormGroup(
+    [
+        dbc.Label("Stratify by"),
+        dcc.Dropdown(
+            id="sample-strata-dropdown",
+            options=[
+                {"label": "None", "value": "none"},
+                {"label": "Sex", "value": "31-0.0"},
+                {"label": "Assessment centre", "value": "54-0.0"},
+            ],
+            value="none",
+        ),
+        dbc.FormText(
+            "Participants are sampled at random. Stratifying the sample preserves the proportion of each group "
+            "of the selected field in the sample.",
+            color="secondary",
+        ),
+    ]
+)
+
 tabs = [
     dbc.Tabs(
         [
@@ -363,6 +388,7 @@ analysis_tab_content = {
                         ),
                     ]
                 ),
+                sample_strata_dropdown,
                 dbc.Card(
                     children=[
                         dbc.CardHeader(dimensionality_tabs),
@@ -413,6 +439,7 @@ analysis_tab_content = {
                         ),
                     ]
                 ),
+                sample_strata_dropdown,
                 dbc.Card(
                     children=[
                         dbc.CardHeader(clustering_tabs),
@@ -510,36 +537,51 @@ def tab_contents_clustering(tab_id):
     return new_content
 
 
-def compute_embedding(dimensions, sample_size, data_fields, estimator):
+def compute_embedding(dimensions, sample_size, sample_strata, data_fields, estimator):
     """
     Single entry-point for computations for all dimensionality reduction
     algorithms proposed to users.
 
     :param dimensions: number of spatial dimensions of the output space
     :param sample_size: number of points to consider as part as the embedding
+    :param sample_strata: data field to stratify the sample by, or "none"
     :param data_fields: data fields to embed
     :param estimator: an object that implements `fit_transform`
-    :return: a scatter plot of the embedding
+    :return: a scatter plot of the embedding, titled with what admission
+             control did to the sample if anything
+    :raises QueryRejected: if the worker stays busy with other queries
     """
     # The slider uses a logarithmic scale for a better UX, we need to compute
     # the actual sample size that corresponds to the label.
     corrected_sample_size = int(10 ** sample_size)
 
-    # Query and prune data
+    # Sample participants that have a value for every selected field
     selected = [_get_updated_instances(var["value"])[2] for var in data_fields]
     identifiers = list(map(NodeIdentifier, selected))
-    features = DatasetGateway.submit(
-        Query.from_identifiers(identifiers).limit_output(corrected_sample_size)
+    query = Query.from_identifiers(identifiers).filter(
+        *[NumericCastable(identifier.db_id()) for identifier in identifiers]
     )
-    features = features.replace(r"^\s*$", np.nan, regex=True).dropna()
-    features = features.drop(features[features.eid == "eid"].index)
+    strata = None
+    if sample_strata and sample_strata != "none":
+        strata = NodeIdentifier(sample_strata).db_id()
+    with notices() as messages:
+        # Fitting an embedding is much slower than fetching its sample, which
+        # is reduced to fit a tighter budget than other queries
+        corrected_sample_size, cost = admission.admit_sample(
+            query, corrected_sample_size, EMBEDDING_BUDGET_BYTES
+        )
+        with admission.running(cost):
+            features = draw_sample(query, corrected_sample_size, strata=strata)
+            features = features.iloc[:, 1:].apply(pd.to_numeric)
 
-    # Generate the projection
-    projection = estimator.fit_transform(features.iloc[:, 1:].to_numpy())
+            # Generate the projection
+            projection = estimator.fit_transform(features.to_numpy())
     if dimensions == 3:
         fig = px.scatter_3d(projection, x=0, y=1, z=2, size=1)
     else:
         fig = px.scatter(projection, x=0, y=1, render_mode="webgl")
+    if messages:
+        fig.update_layout(title=" ".join(messages))
     return fig
 
 
@@ -565,6 +607,7 @@ def compute_embedding(dimensions, sample_size, data_fields, estimator):
         State(component_id="tsne-epoch-slider", component_property="value"),
         State(component_id=get_dropdown_id("all"), component_property="options"),
         State(component_id="sample-size-slider", component_property="value"),
+        State(component_id="sample-strata-dropdown", component_property="value"),
     ],
     prevent_initial_call=True,
 )
@@ -581,6 +624,7 @@ def embedding(
     tsne_epochs,
     data_fields,
     sample_size,
+    sample_strata,
 ):
     """
     Dispatch function for dimensionality reduction algorithms.
@@ -599,6 +643,7 @@ def embedding(
 
     :param data_fields: data fields to embed
     :param sample_size: number of points to consider as part as the embedding
+    :param sample_strata: data field to stratify the sample by, or "none"
 
     :return: a Plotly Figure and a loading placeholder
     """
@@ -627,7 +672,10 @@ def embedding(
             n_iter=tsne_epochs,
         )
         dimensions = umap_dimensions
-    return (
-        compute_embedding(dimensions, sample_size, data_fields, estimator),
-        dummy_loading_output,
-    )
+    try:
+        figure = compute_embedding(
+            dimensions, sample_size, sample_strata, data_fields, estimator
+        )
+    except QueryRejected as e:
+        figure = px.scatter(title=str(e))
+    return figure, dummy_loading_output
@@ -51,8 +51,9 @@ def update_colour_visible(graph_type, selected_nodes):
         if is_violin_colour:
             violin_options.append(option)
 
-    if (graph_type == 4) | (graph_type is None):
-        # Currently do not support colour for pie charts
+    if graph_type in (4, 6, 7, None):
+        # Currently do not support colour for pie charts, instances of a
+        # field are coloured by instance
         return {"display": "none"}, {}, None
     if graph_type == 1:
         # Only categorical data can be used for violin plot colouring
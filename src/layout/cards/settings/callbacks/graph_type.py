@@ -2,7 +2,8 @@ import dash_core_components as dcc
 from src.dash_app import app
 
 from dash.dependencies import Input, Output
-from src.graph_data import get_field_type
+from src.field_statistics import FieldStatisticsIndex
+from src.graph_data import get_field_type, get_inst_name_dict
 from src.value_type import ValueType
 from .variable_selection import get_dropdown_id as get_var_dropdown_id
 
@@ -53,11 +54,20 @@ def update_graph_type(variable_dropdown_x, variable_dropdown_y):
         "bar": {"label": "Bar", "value": 3},
         "pie": {"label": "Pie", "value": 4},
         # "box": {"label": "Box", "value": 5,},
+        "instances_violin": {"label": "Violin (all instances)", "value": 6},
+        "instances_scatter": {"label": "Scatter (all instances)", "value": 7},
     }
 
     if variable_dropdown_x is None:
         return [], None, True, "Select a graph type"
 
+    if any(
+        FieldStatisticsIndex.field_count(field_id) == 0
+        for field_id in (variable_dropdown_x, variable_dropdown_y)
+        if field_id is not None
+    ):
+        return [], None, True, "No data available for this field"
+
     graph_selection_list = []
 
     if variable_dropdown_y is None:
@@ -73,6 +83,13 @@ def update_graph_type(variable_dropdown_x, variable_dropdown_y):
             if graph_type in supported_graphs:
                 graph_selection_list.append(option)
 
+        if (value_type == ValueType.INTEGER or value_type == ValueType.CONT) and len(
+            get_inst_name_dict(field_id)
+        ) > 1:
+            # Visits of the participants can be compared from a single query
+            graph_selection_list.append(options["instances_violin"])
+            graph_selection_list.append(options["instances_scatter"])
+
     else:
         # Both variables selected
         # Logic is:
@@ -7,9 +7,29 @@ import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output, State
 from src.dash_app import dash, app
 
+from src._constants import LOWESS_BUDGET_BYTES
+from src.admission import QueryRejected, notices
 from src.dataset_gateway import DatasetGateway, Query
-from src.graph_data import get_statistics, prune_data, largest_triangle_three_buckets
-from src.graph import get_field_plot
+from src.predicates import NumericCastable, Range
+from src.graph_data import (
+    get_count_statistics,
+    get_instance_statistics,
+    get_multi_valued_statistics,
+    get_statistics,
+    is_multi_valued,
+    prune_data,
+    largest_triangle_three_buckets,
+    to_categorical_counts,
+    to_multi_categorical_data,
+)
+from src.graph import (
+    counts_switcher,
+    get_counts_plot,
+    get_field_plot,
+    get_instances_plot,
+    instances_switcher,
+)
+from src.instances import fetch_arrays, fetch_instances
 from src.tree.node import NodeIdentifier
 
 # Functions to get ids of components
@@ -95,55 +115,99 @@ def get_data(
     else:
         trigger = ctx.triggered[0]["prop_id"].split(".")[0]
 
-    # If the callback was triggered by pressing "plot" in the settings
-    if trigger == "settings-card-submit":
-        # Query for data based on the selected settings
-        data, node_id_x, node_id_y = get_data_from_settings(
-            x_value, y_value, colour, x_filter, y_filter
-        )
+    # Queries over budget are sampled, queued or rejected, see src/admission.py
+    try:
+        with notices() as messages:
+            # Compare every instance of the X variable, fetched in a single query
+            if trigger == "settings-card-submit" and graph_type in instances_switcher:
+                data = get_instances_from_settings(x_value, x_filter)
+                plotted_data_update = data.to_json(date_format="iso", orient="split")
+                statistics_update = get_instance_statistics(
+                    data, NodeIdentifier(x_value).field_id
+                )
+                graph_figure_update = get_instances_plot(
+                    data, x_value, graph_type, trendline
+                )
 
-        # Filter data
-        plotted_data_json, removed_eids = get_filtered_data(
-            data, x_value, y_value, x_filter, y_filter
-        )
-        graph_data_update = data
+            # Categorical plots only need the count of each label, not the cohort
+            elif trigger == "settings-card-submit" and graph_type in counts_switcher:
+                node_id_x = NodeIdentifier(x_value)
+                # Pie charts are not coloured
+                colour = colour if graph_type != 4 else None
+                colour_id = NodeIdentifier(colour) if colour else None
+                if is_multi_valued(node_id_x):
+                    # Count the labels of every array slot of the field at once
+                    packed = fetch_arrays(node_id_x)
+                    if x_filter is not None:
+                        packed = packed.between(*x_filter)
+                    counts = to_multi_categorical_data(packed, node_id_x, colour_id)
+                    statistics_update = get_multi_valued_statistics(packed, node_id_x)
+                else:
+                    grouped = get_counts_from_settings(x_value, colour, x_filter)
+                    counts = to_categorical_counts(node_id_x, grouped, colour_id)
+                    statistics_update = get_count_statistics(grouped, node_id_x)
+                plotted_data_update = counts.to_json(date_format="iso", orient="split")
+                graph_figure_update = get_counts_plot(
+                    counts, x_value, colour, graph_type
+                )
 
-        # Compute summary statistics
-        statistics_update = get_statistics(removed_eids, node_id_x, node_id_y)
-        plotted_data_update = plotted_data_json
-        graph_figure_update = get_field_plot(
-            removed_eids, x_value, y_value, colour, graph_type, trendline
-        )
-        download_btn_update = False
-
-    # If the callback was triggered by a selection on the plot (i.e. lasso tool)
-    elif trigger == "graph" and selected_data:
-        points = selected_data["points"]
-        points = [(p["x"], p["y"]) for p in points]
-        points_x, points_y = zip(*points)
-        df = None
-        node_id_x = None
-        node_id_y = None
-
-        if x_value is not None:
-            node_id_x = NodeIdentifier(x_value)
-            df = pd.DataFrame({node_id_x.field_id: points_x})
-        if y_value is not None:
-            node_id_y = NodeIdentifier(y_value)
-            df = pd.DataFrame(
-                {node_id_x.field_id: points_x, node_id_y.field_id: points_y}
-            )
+            # If the callback was triggered by pressing "plot" in the settings
+            elif trigger == "settings-card-submit":
+                # Lowess trendlines are slow to fit, so their data is sampled sooner
+                budget = (
+                    LOWESS_BUDGET_BYTES if graph_type == 2 and trendline == 2 else None
+                )
+                # Query for data based on the selected settings
+                data, node_id_x, node_id_y = get_data_from_settings(
+                    x_value, y_value, colour, x_filter, y_filter, budget
+                )
 
-        # Compute summary statistics of the sub-selection
-        statistics_update = get_statistics(df, node_id_x, node_id_y)
-        data = pd.read_json(current_data, orient="split")
-        plotted_data_json = data.loc[
-            (data[data.columns[1]].isin(points_x))
-            & (data[data.columns[2]].isin(points_y))
-        ]
-        plotted_data_update = plotted_data_json.to_json(
-            date_format="iso", orient="split"
-        )
+                # Range filters have already been applied by the data source
+                plotted_data_json, removed_eids = get_filtered_data(data)
+                graph_data_update = data
+
+                # Compute summary statistics
+                statistics_update = get_statistics(removed_eids, node_id_x, node_id_y)
+                plotted_data_update = plotted_data_json
+                graph_figure_update = get_field_plot(
+                    removed_eids, x_value, y_value, colour, graph_type, trendline
+                )
+                download_btn_update = False
+
+            # If the callback was triggered by a selection on the plot (i.e. lasso tool)
+            elif trigger == "graph" and selected_data:
+                points = selected_data["points"]
+                points = [(p["x"], p["y"]) for p in points]
+                points_x, points_y = zip(*points)
+                df = None
+                node_id_x = None
+                node_id_y = None
+
+                if x_value is not None:
+                    node_id_x = NodeIdentifier(x_value)
+                    df = pd.DataFrame({node_id_x.field_id: points_x})
+                if y_value is not None:
+                    node_id_y = NodeIdentifier(y_value)
+                    df = pd.DataFrame(
+                        {node_id_x.field_id: points_x, node_id_y.field_id: points_y}
+                    )
+
+                # Compute summary statistics of the sub-selection
+                statistics_update = get_statistics(df, node_id_x, node_id_y)
+                data = pd.read_json(current_data, orient="split")
+                plotted_data_json = data.loc[
+                    (data[data.columns[1]].isin(points_x))
+                    & (data[data.columns[2]].isin(points_y))
+                ]
+                plotted_data_update = plotted_data_json.to_json(
+                    date_format="iso", orient="split"
+                )
+    except QueryRejected as e:
+        statistics_update = dbc.Alert(str(e), color="danger")
+        messages = []
+    if messages and statistics_update is not dash.no_update:
+        alerts = [dbc.Alert(message, color="warning") for message in messages]
+        statistics_update = [*alerts, statistics_update]
 
     return (
         statistics_update,
@@ -156,16 +220,20 @@ def get_data(
     )
 
 
-def get_data_from_settings(x_value, y_value, colour, x_filter, y_filter):
+def get_data_from_settings(x_value, y_value, colour, x_filter, y_filter, budget=None):
     """
     Query the database abstraction for data based on the selected settings
-    and prune the result.
+    and prune the result. Range filters and the removal of non-numeric values
+    are pushed down to the data source, so only the rows that will be plotted
+    are transferred.
 
     :param x_value: data field on the X axis
     :param y_value: data field on the Y axis
     :param colour: optional colouring parameter
     :param x_filter: optional range filter on @x_value
     :param y_filter: optional range filter on @y_value
+    :param budget: optional bytes the data may take, it is sampled if it
+                   doesn't fit, see src/admission.py
     :return:
     """
     data = None
@@ -185,48 +253,86 @@ def get_data_from_settings(x_value, y_value, colour, x_filter, y_filter):
         node_id_x = NodeIdentifier(x_value)
         colour_id = None if (not colour) else NodeIdentifier(colour)
         columns_of_interest = [node_id_x] if (not colour) else [node_id_x, colour_id]
-        if not y_value:
-            data = prune_data(
-                DatasetGateway.submit(Query.from_identifiers(columns_of_interest))
-            )
-        else:
+        if y_value:
             node_id_y = NodeIdentifier(y_value)
             columns_of_interest = (
                 [node_id_x, node_id_y]
                 if (not colour_id)
                 else [node_id_x, node_id_y, colour_id]
             )
-            data = prune_data(
-                DatasetGateway.submit(Query.from_identifiers(columns_of_interest))
+        query = Query.from_identifiers(columns_of_interest).filter(
+            *get_predicates(
+                columns_of_interest, [(node_id_x, x_filter), (node_id_y, y_filter)]
             )
+        )
+        data = prune_data(DatasetGateway.submit(query, budget=budget))
     return data, node_id_x, node_id_y
 
 
-def get_filtered_data(data, x_value, y_value, x_filter, y_filter):
+def get_counts_from_settings(x_value, colour, x_filter):
     """
-    Apply range filters to the data.
+    Count the participants taking each value of the data field on the X axis,
+    and each colour if given. The counts are computed by the data source, so
+    only a few rows are transferred and cached.
 
-    :param data: current DataFrame
-    :param x_value: data field on the X axis
-    :param y_value: data field on the Y axis
+    :param x_value: categorical data field on the X axis
+    :param colour: optional colouring parameter
     :param x_filter: optional range filter on @x_value
-    :param y_filter: optional range filter on @y_value
-    :return: filtered DataFrame
+    :return: a DataFrame with the value of X, of the colour if given, and the
+             number of participants taking them, in a "count" column
     """
-    filtered_data = _filter_data_aux(data, x_value, x_filter)
-    filtered_data = _filter_data_aux(filtered_data, y_value, y_filter)
-    plotted_data_json = filtered_data.to_json(date_format="iso", orient="split")
+    node_id_x = NodeIdentifier(x_value)
+    node_ids = [node_id_x] if (not colour) else [node_id_x, NodeIdentifier(colour)]
+    query = (
+        Query(["eid"])
+        .filter(*get_predicates(node_ids, [(node_id_x, x_filter)]))
+        .group_count(*[node_id.db_id() for node_id in node_ids])
+    )
+    return DatasetGateway.submit(query)
 
-    removed_eids = filtered_data.loc[:, filtered_data.columns != "eid"]
 
-    return plotted_data_json, removed_eids
+def get_instances_from_settings(x_value, x_filter):
+    """
+    Query every instance of the data field on the X axis.
 
+    :param x_value: an instance of the data field
+    :param x_filter: optional range filter, applied to the values of every
+                     instance
+    :return: a DataFrame with the eid and one column per instance
+    """
+    data = fetch_instances(NodeIdentifier(x_value).field_id)
+    if x_filter is not None:
+        instances = data.columns.drop("eid")
+        low, high = x_filter
+        values = data[instances]
+        data[instances] = values.where((values >= low) & (values <= high))
+    return data
 
-def _filter_data_aux(filtered_data, value, filter):
-    """Applies a single filter to data"""
-    if value != "" and filter is not None:
-        node_id = NodeIdentifier(value)
-        filtered_data = filtered_data[
-            filtered_data[node_id.db_id()].between(filter[0], filter[1])
-        ]
-    return filtered_data
+
+def get_predicates(node_ids, range_filters):
+    """
+    Build the predicates that rows need to satisfy in order to be plotted.
+
+    :param node_ids: data fields that are plotted
+    :param range_filters: pairs of data field and optional range filter on it
+    :return: a list of Predicates
+    """
+    predicates = [NumericCastable(node_id.db_id()) for node_id in node_ids]
+    for node_id, range_filter in range_filters:
+        if node_id is not None and range_filter is not None:
+            predicates.append(Range(node_id.db_id(), range_filter[0], range_filter[1]))
+    return predicates
+
+
+def get_filtered_data(data):
+    """
+    Serialise the filtered data and strip participant identifiers.
+
+    :param data: current DataFrame, already filtered by the data source
+    :return: the JSON of the plotted data and a DataFrame without eids
+    """
+    plotted_data_json = data.to_json(date_format="iso", orient="split")
+
+    removed_eids = data.loc[:, data.columns != "eid"]
+
+    return plotted_data_json, removed_eids
@@ -1,11 +1,14 @@
 import time
 
+import numpy as np
 import pandas as pd
 import dash_core_components as dcc
 import dash_html_components as html
 
-from dataset_gateway import Query, DatasetGateway
+from src.admission import QueryRejected
+from src.dataset_gateway import Query, DatasetGateway
 from src.dash_app import dash, app
+from src.field_statistics import FieldStatisticsIndex
 
 from dash.dependencies import Input, MATCH, Output, State
 from src.tree.node import NodeIdentifier
@@ -58,14 +61,44 @@ def update_settings_options(value):
     # Normalise the identifier
     node_id = NodeIdentifier(value)
 
-    # Query the database for min and max
-    min_max = DatasetGateway.submit(Query.from_identifier(node_id).get_min_max())
-    df_min = int(min_max["min"].values[0])
-    df_max = int(min_max["max"].values[0] + 1)
+    statistics = FieldStatisticsIndex.lookup(node_id.db_id())
+    if statistics is not None and statistics.min is not None:
+        # Use the precomputed bounds of the field
+        df_min = int(statistics.min)
+        df_max = int(statistics.max + 1)
+    else:
+        # Query the database for min and max, which is computed from the
+        # column if it is already cached
+        try:
+            min_max = DatasetGateway.submit(
+                Query.from_identifier(node_id).get_min_max()
+            )
+        except QueryRejected:
+            # The field can't be filtered without its bounds
+            return (None, None, None, None, {"display": "none"})
+        df_min = int(min_max["min"].values[0])
+        df_max = int(min_max["max"].values[0] + 1)
     return (
         df_min,
         df_max,
         [df_min, df_max],
-        {df_min: str(df_min), df_max: str(df_max)},
+        get_marks(df_min, df_max, statistics),
         {"display": "block"},
     )
+
+
+def get_marks(df_min, df_max, statistics=None):
+    """
+    Label both ends of the slider and, if the statistics of the field are
+    known, its median, estimated from their histogram.
+    """
+    marks = {df_min: str(df_min), df_max: str(df_max)}
+    if statistics is not None and statistics.histogram_counts:
+        # Interpolate the median within its bin, assuming the values of the
+        # bin are spread uniformly
+        cumulative = np.concatenate([[0], np.cumsum(statistics.histogram_counts)])
+        median = np.interp(cumulative[-1] / 2, cumulative, statistics.histogram_edges)
+        median = int(round(median))
+        if df_min < median < df_max:
+            marks[median] = str(median)
+    return marks
@@ -22,4 +22,4 @@ def get_trendline_dropdown(arg=None):
     Input(component_id="settings-graph-type-dropdown", component_property="value"),
 )
 def update_trendline_dropdown(value):
-    return value != 2
+    return value not in (2, 7)
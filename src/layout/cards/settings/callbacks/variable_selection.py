@@ -4,6 +4,7 @@ from dash.dependencies import Input, MATCH, Output, State
 from src.dash_app import app
 from src.tree.node_utils import get_option
 from src._constants import MAX_SELECTIONS
+from src.encoding_catalog import EncodingCatalog
 
 
 def get_option_dropdown(var: str):
@@ -38,6 +39,8 @@ def update_dropdown(n, selected_nodes):
     :param selected_nodes: currently selected data fields
     """
     options = [get_option(node) for node in selected_nodes]
+    # Categorical fields that are selected are likely to be plotted next
+    EncodingCatalog.prefetch(option["value"] for option in options)
     return (
         f"{len(options)}/{MAX_SELECTIONS} variables selected",
         options,
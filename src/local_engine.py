@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable
+
+import pandas as pd
+
+from src.aggregates import QueryAggregator
+from src.streaming import aggregate, collect
+
+if TYPE_CHECKING:
+    from src.dataset_gateway import Query
+
+
+def execute(_query: Query, chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Execute the plan of a query, the one compiled to SQL by `Query.build`, on
+    chunks of the columns it references. Predicates are evaluated as boolean
+    masks and aggregates as partial reductions merged across chunks, so that
+    nothing but the result is materialised.
+
+    :param chunks: chunks of rows holding `_query.referenced_columns()`
+    :return: the result of the query, with the columns of the data source
+    """
+    if _query.where:
+        raise NotImplementedError(
+            f"Raw SQL conditions can only be evaluated by BigQuery: {_query.where}"
+        )
+    if not _query.aggregates:
+        rows = (_query.apply(chunk) for chunk in chunks)
+        return collect(rows, _query.query_columns, _query.limit)
+    aggregator = QueryAggregator(_query.aggregates, _query.group_by)
+    (result,) = aggregate((_query.select(chunk) for chunk in chunks), aggregator)
+    if _query.limit is not None:
+        result = result.iloc[: _query.limit]
+    return result
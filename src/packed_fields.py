@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+
+class PackedField:
+    """
+    Values of every array slot of one instance of a multi-valued field (e.g.
+    the 34 self-reported illnesses of `20002-0.0` to `20002-0.33`), packed in
+    compressed sparse row form.
+
+    The codes of participant `i` are `codes[offsets[i]:offsets[i + 1]]`, and
+    each code is an index into `dictionary`, the sorted distinct values of the
+    field as strings. Empty slots take no space, and counts or membership
+    tests over every slot are a single pass over `codes`.
+    """
+
+    def __init__(
+        self,
+        eids: np.ndarray,
+        offsets: np.ndarray,
+        codes: np.ndarray,
+        dictionary: np.ndarray,
+    ):
+        self.eids = eids
+        self.offsets = offsets
+        self.codes = codes
+        self.dictionary = dictionary
+        self._row_ids: Optional[np.ndarray] = None
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def from_columns(cls, eids: np.ndarray, slots: pd.DataFrame) -> PackedField:
+        """
+        :param eids: eid of each row of `slots`
+        :param slots: one column per array slot, empty slots are null or ""
+        """
+        values = slots.to_numpy()
+        if values.dtype.kind in "biuf":
+            present = ~np.isnan(values.astype(float))
+        else:
+            present = pd.notna(values) & (values != "")
+        # Boolean indexing walks the matrix row by row, keeping the codes of
+        # each participant together
+        dictionary, codes = np.unique(
+            _code_strings(values[present]), return_inverse=True
+        )
+        offsets = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(present.sum(axis=1), out=offsets[1:])
+        return cls(np.asarray(eids), offsets, codes.astype(np.int32), dictionary)
+
+    @classmethod
+    def from_arrow(cls, eids: np.ndarray, array: pa.ListArray) -> PackedField:
+        """Zero-copy view over a list array of dictionary-encoded strings."""
+        return cls(
+            eids,
+            array.offsets.to_numpy(),
+            array.values.indices.to_numpy(),
+            array.values.dictionary.to_numpy(zero_copy_only=False),
+        )
+
+    def to_arrow(self) -> pa.ListArray:
+        values = pa.DictionaryArray.from_arrays(
+            pa.array(self.codes, type=pa.int32()),
+            pa.array(self.dictionary, type=pa.string()),
+        )
+        return pa.ListArray.from_arrays(
+            pa.array(self.offsets.astype(np.int32), type=pa.int32()), values
+        )
+
+    def row_ids(self) -> np.ndarray:
+        """Row of each packed code."""
+        if self._row_ids is None:
+            self._row_ids = np.repeat(np.arange(len(self)), np.diff(self.offsets))
+        return self._row_ids
+
+    def contains(self, values: Iterable) -> np.ndarray:
+        """
+        :return: for each row, True iff any of its slots takes one of `values`
+        """
+        wanted = np.isin(self.dictionary, _code_strings(np.asarray(list(values))))
+        hits = wanted[self.codes]
+        return np.bincount(self.row_ids()[hits], minlength=len(self)) > 0
+
+    def between(self, low: float, high: float) -> PackedField:
+        """
+        :return: the field without the values of its slots that don't lie in
+                 [low, high] as numbers, e.g. to apply a range filter
+        """
+        numbers = pd.to_numeric(pd.Series(self.dictionary), errors="coerce")
+        kept = numbers.between(low, high).to_numpy()[self.codes]
+        offsets = np.zeros_like(self.offsets)
+        np.cumsum(
+            np.bincount(self.row_ids()[kept], minlength=len(self)), out=offsets[1:]
+        )
+        used, codes = np.unique(self.codes[kept], return_inverse=True)
+        return PackedField(
+            self.eids, offsets, codes.astype(np.int32), self.dictionary[used]
+        )
+
+    def count(self, rows: np.ndarray = None, groups: np.ndarray = None) -> pd.DataFrame:
+        """
+        Number of participants taking each value in any of their slots. A
+        participant who reports a value twice is counted once.
+
+        :param rows: only count the rows where this mask is True
+        :param groups: count separately for each group, one value per row.
+                       Rows of a null group must be excluded by `rows`.
+        :return: a frame with the `value` and its `count`, preceded by the
+                 `group` if `groups` is given
+        """
+        row_ids, codes = self.row_ids(), self.codes
+        if rows is not None:
+            selected = rows[row_ids]
+            row_ids, codes = row_ids[selected], codes[selected]
+        # Drop duplicated (row, code) pairs
+        size = max(len(self.dictionary), 1)
+        pairs = np.unique(row_ids.astype(np.int64) * size + codes)
+        row_ids, codes = np.divmod(pairs, size)
+
+        if groups is None:
+            counts = np.bincount(codes, minlength=size)
+            present = np.flatnonzero(counts)
+            return pd.DataFrame(
+                {"value": self.dictionary[present], "count": counts[present]}
+            )
+        group_codes, group_values = pd.factorize(groups[row_ids], sort=True)
+        keys, counts = np.unique(
+            group_codes.astype(np.int64) * size + codes, return_counts=True
+        )
+        group_codes, codes = np.divmod(keys, size)
+        return pd.DataFrame(
+            {
+                "group": np.asarray(group_values)[group_codes],
+                "value": self.dictionary[codes],
+                "count": counts,
+            }
+        )
+
+
+def _code_strings(values: np.ndarray) -> np.ndarray:
+    """
+    Normalise codes to strings. Integer codings parsed as floats locally
+    (1065.0) are written as integers, as they are in the encodings.
+    """
+    series = pd.Series(values, dtype=object)
+    numbers = pd.to_numeric(series, errors="coerce")
+    integral = numbers.notna() & (numbers % 1 == 0)
+    strings = series.astype(str)
+    strings[integral] = numbers[integral].astype(np.int64).astype(str)
+    return strings.to_numpy(dtype=object)
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import json
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+# Row hashes are computed with 31-bit integer arithmetic so that BigQuery
+# (INT64, which errors on overflow) and numpy produce exactly the same values.
+HASH_BITS = 31
+HASH_MASK = (1 << HASH_BITS) - 1
+_HASH_MULTIPLIERS = (0x45D9F3B, 0x2C1B3C6D)
+
+
+class Predicate:
+    """A row filter that can be compiled to SQL or evaluated on a DataFrame."""
+
+    def __init__(self, column: str):
+        self.column = column
+
+    @property
+    def columns(self) -> List[str]:
+        return [self.column]
+
+    def to_sql(self) -> str:
+        raise NotImplementedError
+
+    def mask(self, frame: pd.DataFrame) -> np.ndarray:
+        raise NotImplementedError
+
+    def key(self) -> list:
+        """JSON-serialisable description of the predicate, used in cache keys."""
+        raise NotImplementedError
+
+    def __eq__(self, other):
+        return isinstance(other, Predicate) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(json.dumps(self.key()))
+
+
+class NotNull(Predicate):
+    """Rows where the column holds a non-empty value."""
+
+    def to_sql(self) -> str:
+        return f'{self.column} IS NOT NULL AND CAST({self.column} AS STRING) != ""'
+
+    def mask(self, frame: pd.DataFrame) -> np.ndarray:
+        values = frame[self.column]
+        if pd.api.types.is_numeric_dtype(values):
+            return values.notna().to_numpy()
+        return (values.notna() & (values.astype(str) != "")).to_numpy()
+
+    def key(self) -> list:
+        return ["not_null", self.column]
+
+
+class NumericCastable(Predicate):
+    """Rows where the column can be interpreted as a number."""
+
+    def to_sql(self) -> str:
+        return f"SAFE_CAST({self.column} AS FLOAT64) IS NOT NULL"
+
+    def mask(self, frame: pd.DataFrame) -> np.ndarray:
+        return _to_numeric(frame[self.column]).notna().to_numpy()
+
+    def key(self) -> list:
+        return ["numeric", self.column]
+
+
+class Range(Predicate):
+    """Rows where the numeric value of the column lies in [low, high]."""
+
+    def __init__(self, column: str, low: float, high: float):
+        """
+        :raises ValueError: if a bound is not a finite number, bounds come
+                            from the client and are written into the SQL
+        """
+        super().__init__(column)
+        self.low = float(low)
+        self.high = float(high)
+        if not np.isfinite([self.low, self.high]).all():
+            raise ValueError(f"Invalid range bounds: {low}, {high}")
+
+    def to_sql(self) -> str:
+        return f"SAFE_CAST({self.column} AS FLOAT64) BETWEEN {self.low} AND {self.high}"
+
+    def mask(self, frame: pd.DataFrame) -> np.ndarray:
+        return _to_numeric(frame[self.column]).between(self.low, self.high).to_numpy()
+
+    def key(self) -> list:
+        return ["range", self.column, self.low, self.high]
+
+
+class InList(Predicate):
+    """Rows where the column takes one of the given values."""
+
+    def __init__(self, column: str, values: list):
+        super().__init__(column)
+        self.values = [str(value) for value in values]
+
+    def to_sql(self) -> str:
+        values = ", ".join(json.dumps(value) for value in self.values)
+        return f"CAST({self.column} AS STRING) IN ({values})"
+
+    def mask(self, frame: pd.DataFrame) -> np.ndarray:
+        values = frame[self.column]
+        if pd.api.types.is_numeric_dtype(values):
+            # Integer codings parsed as floats locally are matched as numbers
+            numbers = pd.to_numeric(pd.Series(self.values), errors="coerce")
+            return np.isin(values.to_numpy(), numbers.dropna().to_numpy())
+        return (values.notna() & values.astype(str).isin(self.values)).to_numpy()
+
+    def key(self) -> list:
+        return ["in", self.column, sorted(self.values)]
+
+
+class Sample(Predicate):
+    """
+    Deterministic sample of rows, selected by a hash of their eid.
+
+    A row is kept iff its hash falls in [start, fraction) of the hash space.
+    Samples drawn with the same seed are therefore nested: every row of a
+    10% sample is part of the 20% sample, and the 10-20% band holds exactly
+    the rows that the latter adds to the former.
+    """
+
+    def __init__(self, fraction: float, seed: int = 0, start: float = 0.0):
+        super().__init__("eid")
+        self.fraction = fraction
+        self.seed = seed
+        self.start = start
+
+    @property
+    def threshold(self) -> int:
+        return hash_threshold(self.fraction)
+
+    def to_sql(self) -> str:
+        row_hash = row_hash_sql("eid", self.seed)
+        condition = f"{row_hash} < {self.threshold}"
+        if self.start > 0:
+            condition = f"{row_hash} >= {hash_threshold(self.start)} AND {condition}"
+        return condition
+
+    def mask(self, frame: pd.DataFrame) -> np.ndarray:
+        hashes = row_hash(frame["eid"].to_numpy(), self.seed)
+        mask = hashes < self.threshold
+        if self.start > 0:
+            mask &= hashes >= hash_threshold(self.start)
+        return mask
+
+    def key(self) -> list:
+        return ["sample", self.start, self.fraction, self.seed]
+
+
+def hash_threshold(fraction: float) -> int:
+    """Row hashes below this value make up `fraction` of the hash space."""
+    return int(fraction * (1 << HASH_BITS))
+
+
+def row_hash(eids: np.ndarray, seed: int = 0) -> np.ndarray:
+    """31-bit hash of each eid, identical to the one computed by row_hash_sql."""
+    x = (eids.astype(np.int64) + _seed_offset(seed)) & HASH_MASK
+    for multiplier in _HASH_MULTIPLIERS:
+        x = ((x ^ (x >> 16)) * multiplier) & HASH_MASK
+    return x ^ (x >> 16)
+
+
+def row_hash_sql(column: str, seed: int = 0) -> str:
+    """BigQuery expression of row_hash over an eid column."""
+    x = f"((CAST({column} AS INT64) + {_seed_offset(seed)}) & {HASH_MASK})"
+    for multiplier in _HASH_MULTIPLIERS:
+        x = f"((({x} ^ ({x} >> 16)) * {multiplier}) & {HASH_MASK})"
+    return f"({x} ^ ({x} >> 16))"
+
+
+def _seed_offset(seed: int) -> int:
+    return (seed * 0x9E3779B1) & HASH_MASK
+
+
+def _to_numeric(values: pd.Series) -> pd.Series:
+    if pd.api.types.is_numeric_dtype(values):
+        return values
+    return pd.to_numeric(values.replace("", np.nan), errors="coerce")
@@ -0,0 +1,77 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import pandas as pd
+
+
+class LRUCache:
+    """
+    Bounded in-process cache of decoded query results.
+
+    Entries are keyed like `Query.hash()` and evicted least-recently-used
+    first once the total size of the cached DataFrames exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reset(self) -> None:
+        """
+        Replace the lock, which may have been held by another thread of the
+        parent process when this process was forked.
+        """
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        """
+        :return: a copy of the cached DataFrame, so that callers mutating their
+                 result cannot corrupt the cache, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0].copy()
+
+    def set(self, key: str, value: pd.DataFrame) -> None:
+        size = _frame_size(value)
+        if size > self.max_bytes:
+            # Never let a single result flush the whole cache
+            return
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value.copy(), size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _frame_size(frame: pd.DataFrame) -> int:
+    return int(frame.memory_usage(index=True, deep=True).sum())
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from queue import Empty, LifoQueue
+from typing import Callable, Dict, List
+
+from redis import BlockingConnectionPool, Redis
+from requests.adapters import HTTPAdapter
+
+from src._constants import (
+    BIGQUERY_MAX_CONNECTIONS,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_POOL_TIMEOUT,
+)
+
+
+class PoolStats:
+    """Time spent by a worker waiting for connections of a bounded pool."""
+
+    def __init__(self):
+        self.acquired = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.acquired += 1
+        self.wait_seconds += seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def to_dict(self) -> dict:
+        return {
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "wait_ms": 1000 * self.wait_seconds,
+            "max_wait_ms": 1000 * self.max_wait_seconds,
+        }
+
+
+class TimedQueue(LifoQueue):
+    """Queue of the connections of a pool, timing how long `get` blocks."""
+
+    def __init__(self, maxsize: int, stats: PoolStats):
+        super().__init__(maxsize)
+        self.stats = stats
+
+    def get(self, block=True, timeout=None):
+        start = time.perf_counter()
+        try:
+            item = super().get(block, timeout)
+        except Empty:
+            self.stats.timeouts += 1
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return item
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """
+    Redis connection pool of bounded size that records how long callers wait
+    for a connection. Callers block for up to `timeout` seconds when all
+    connections are in use, rather than opening new sockets.
+    """
+
+    def __init__(self, **kwargs):
+        self.stats = PoolStats()
+        super().__init__(
+            queue_class=lambda maxsize: TimedQueue(maxsize, self.stats), **kwargs
+        )
+
+    def to_dict(self) -> dict:
+        idle = sum(connection is not None for connection in list(self.pool.queue))
+        return {
+            "max_connections": self.max_connections,
+            "connections": len(self._connections),
+            "in_use": len(self._connections) - idle,
+            **self.stats.to_dict(),
+        }
+
+
+class InstrumentedHTTPAdapter(HTTPAdapter):
+    """
+    HTTP adapter of the BigQuery client, whose connection pools record how
+    long requests wait for a connection like InstrumentedConnectionPool.
+    Requests block when all connections to a host are in use.
+    """
+
+    def __init__(self, **kwargs):
+        self.stats = PoolStats()
+        super().__init__(pool_block=True, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats = self.stats
+
+        class Queue(TimedQueue):
+            def __init__(self, maxsize: int):
+                super().__init__(maxsize, stats)
+
+        self.poolmanager.pool_classes_by_scheme = {
+            scheme: type(cls.__name__, (cls,), {"QueueCls": Queue})
+            for scheme, cls in self.poolmanager.pool_classes_by_scheme.items()
+        }
+
+    def to_dict(self) -> dict:
+        pools = self.poolmanager.pools
+        pools = [pools[key] for key in pools.keys()]
+        return {
+            "max_connections": self._pool_maxsize,
+            "connections": sum(pool.num_connections for pool in pools),
+            "in_use": sum(pool.pool.maxsize - pool.pool.qsize() for pool in pools),
+            **self.stats.to_dict(),
+        }
+
+
+class ResourceManager:
+    """
+    Owns the connections of the data layer: the Redis client and the
+    BigQuery clients.
+
+    gunicorn imports the app before forking its workers (`--preload`), so
+    anything created at import time would be shared by every worker: several
+    processes writing to the same socket interleave their requests and read
+    each other's replies. Resources are therefore created lazily, on first
+    use, and forgotten in a child process right after a fork, so that each
+    worker opens its own bounded pools.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._resources: Dict[str, object] = {}
+        self._fork_callbacks: List[Callable[[], None]] = []
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def get(self, name: str, factory: Callable[[], object]):
+        """
+        :param name: identifies the resource within this process
+        :param factory: creates the resource the first time it is requested
+        :return: the resource of the current process
+        """
+        resource = self._resources.get(name)
+        if resource is None:
+            with self._lock:
+                resource = self._resources.get(name)
+                if resource is None:
+                    resource = self._resources[name] = factory()
+        return resource
+
+    def on_fork(self, callback: Callable[[], None]) -> None:
+        """Reset process-local state, such as locks, in forked workers."""
+        self._fork_callbacks.append(callback)
+
+    def redis(self, address: str = None) -> Redis:
+        """
+        :param address: `host:port` of a Redis node of a sharded cache, the
+                        instance of this deployment if None
+        """
+        if address is None:
+            return self.get("redis", _make_redis)
+        return self.get(f"redis:{address}", lambda: _make_redis(address))
+
+    def bigquery(self):
+        return self.get("bigquery", _make_bigquery)
+
+    def bigquery_read(self):
+        return self.get("bigquery_read", _make_bigquery_read)
+
+    def metrics(self) -> dict:
+        """Size and contention of the pools of this worker."""
+        metrics = {"pid": self.pid}
+        for name, resource in list(self._resources.items()):
+            if name.startswith("redis"):
+                metrics[name] = resource.connection_pool.to_dict()
+        if "bigquery" in self._resources:
+            session = self._resources["bigquery"]._http
+            metrics["bigquery"] = session.get_adapter("https://").to_dict()
+        return metrics
+
+    def _after_fork(self) -> None:
+        # The parent's connections are left untouched, closing them here
+        # would also close them for the parent
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._resources = {}
+        for callback in self._fork_callbacks:
+            callback()
+
+
+def _make_redis(address: str = None) -> Redis:
+    if address is None:
+        host = os.environ.get(
+            "REDISHOST",
+            "redis" if os.environ.get("ENV") == "LOCALPROD" else "localhost",
+        )
+        port = int(os.environ.get("REDISPORT", 6379))
+    else:
+        host, port = address.rsplit(":", 1)
+    pool = InstrumentedConnectionPool(
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        host=host,
+        port=int(port),
+    )
+    return Redis(connection_pool=pool)
+
+
+def _make_bigquery():
+    import google.auth
+    from google.auth.transport.requests import AuthorizedSession
+    from google.cloud import bigquery
+
+    credentials, project = google.auth.default(scopes=bigquery.Client.SCOPE)
+    session = AuthorizedSession(credentials)
+    # Block when all connections are in use instead of opening extra sockets
+    adapter = InstrumentedHTTPAdapter(
+        pool_maxsize=BIGQUERY_MAX_CONNECTIONS, max_retries=3
+    )
+    session.mount("https://", adapter)
+    return bigquery.Client(project=project, credentials=credentials, _http=session)
+
+
+def _make_bigquery_read():
+    # gRPC channels must not be shared across a fork
+    from google.cloud.bigquery_storage import BigQueryReadClient
+
+    return BigQueryReadClient()
+
+
+manager = ResourceManager()
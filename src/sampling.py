@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src._constants import COHORT_SIZE
+from src.dataset_gateway import DatasetGateway, LocalClient, Query
+from src.predicates import NotNull, hash_threshold, row_hash
+
+# Samples are assembled from bands of the row hash space whose sizes double:
+# [0, 1/1024), [1/1024, 2/1024), [2/1024, 4/1024), ..., [1/2, 1). Each band is
+# cached on its own, so growing a sample only fetches the bands it adds.
+BAND_EDGES = [0.0] + [2.0 ** -k for k in range(10, -1, -1)]
+
+ALLOCATIONS = ["proportional", "equal"]
+
+
+class Sampler:
+    """
+    Seeded uniform and stratified samples of the rows of a query.
+
+    Rows are ranked by a hash of their eid: a sample of size n is made of the
+    n rows with the lowest hashes (within each stratum, when stratified). For
+    a given seed, smaller samples are therefore always subsets of larger ones
+    and moving the sample size slider reuses the rows that are already cached.
+    """
+
+    def __init__(
+        self,
+        _query: Query,
+        seed: int = 0,
+        strata: str = None,
+        allocation: str = "proportional",
+    ):
+        """
+        :param _query: projection to sample from, optionally with predicates
+        :param seed: selects one of many independent samples
+        :param strata: optional column to stratify the sample by
+        :param allocation: "proportional" keeps the share of each stratum in the
+                           population, "equal" draws as many rows from each
+        """
+        if allocation not in ALLOCATIONS:
+            raise ValueError(f"Unknown allocation {allocation}")
+        if not _query.is_filtered_projection() or _query.sampling is not None:
+            raise ValueError("Only projections of the dataset can be sampled")
+        self._query = _query
+        self.seed = seed
+        self.strata = strata
+        self.allocation = allocation
+
+    def draw(self, size: int) -> pd.DataFrame:
+        """
+        :param size: number of rows of the sample
+        :return: the sample, or every row if there are fewer than `size`
+        """
+        fraction = min(1.0, 1.2 * size / _population())
+        while True:
+            edge = next(e for e in BAND_EDGES[1:] if e >= fraction)
+            frame = self._rows_below(edge)
+            sample, complete = self._select(frame, size)
+            if complete or edge >= 1.0:
+                return sample.reset_index(drop=True)
+            # Predicates or rare strata made the bands too small, estimate how
+            # much of the hash space is needed from what was retrieved so far
+            yield_rate = max(len(frame), 1) / edge
+            fraction = min(1.0, max(2 * edge, 1.2 * size / yield_rate))
+
+    def _select(self, frame: pd.DataFrame, size: int) -> Tuple[pd.DataFrame, bool]:
+        """Pick the rows with the lowest hashes from the rows retrieved so far."""
+        hashes = row_hash(frame["eid"].to_numpy(), self.seed)
+        frame = frame.iloc[np.argsort(hashes, kind="stable")]
+        columns = self._query.df_columns
+        if self.strata is None:
+            return frame.head(size)[columns], len(frame) >= size
+
+        counts = frame[self.strata].value_counts()
+        if len(counts) == 0:
+            return frame[columns], False
+        if self.allocation == "equal":
+            quotas = pd.Series(size // len(counts), index=counts.index)
+        else:
+            quotas = (counts / counts.sum() * size).round().astype(int)
+        complete = bool((counts >= quotas).all())
+        rank = frame.groupby(self.strata, sort=False).cumcount()
+        sample = frame[rank.to_numpy() < frame[self.strata].map(quotas).to_numpy()]
+        return sample[columns], complete
+
+    def _rows_below(self, edge: float) -> pd.DataFrame:
+        """Every row whose hash falls below `edge`, assembled from cached bands."""
+        gateway = DatasetGateway()
+        bands = [
+            (lower, upper)
+            for lower, upper in zip(BAND_EDGES, BAND_EDGES[1:])
+            if upper <= edge
+        ]
+        pieces = {
+            band: gateway.lookup(self._band_query(*band).hash()) for band in bands
+        }
+        for run in _missing_runs(bands, pieces):
+            # Fetch contiguous missing bands with a single query, then cache
+            # each band separately
+            fetched = gateway.evaluate(self._band_query(run[0][0], run[-1][1]))
+            hashes = row_hash(fetched["eid"].to_numpy(), self.seed)
+            for lower, upper in run:
+                in_band = (hashes >= hash_threshold(lower)) & (
+                    hashes < hash_threshold(upper)
+                )
+                piece = fetched[in_band].reset_index(drop=True)
+                gateway.store(self._band_query(lower, upper).hash(), piece)
+                pieces[(lower, upper)] = piece
+        return pd.concat([pieces[band] for band in bands], ignore_index=True)
+
+    def _band_query(self, lower: float, upper: float) -> Query:
+        columns = self._query.referenced_columns()
+        predicates = list(self._query.predicates)
+        if self.strata is not None:
+            columns = list(dict.fromkeys([*columns, self.strata]))
+            predicates.append(NotNull(self.strata))
+        return Query(columns).filter(*predicates).sample(upper, self.seed, lower)
+
+
+def _missing_runs(bands: List[tuple], pieces: dict) -> List[List[tuple]]:
+    """Group the bands that are not cached into runs of adjacent bands."""
+    runs, run = [], []
+    for band in bands:
+        if pieces[band] is None:
+            run.append(band)
+        elif run:
+            runs.append(run)
+            run = []
+    if run:
+        runs.append(run)
+    return runs
+
+
+def _population() -> int:
+    """Number of participants in the dataset."""
+    if LocalClient.store.is_available():
+        return LocalClient.store.num_rows
+    return COHORT_SIZE
+
+
+def draw_sample(
+    _query: Query,
+    size: int,
+    seed: int = 0,
+    strata: Optional[str] = None,
+    allocation: str = "proportional",
+) -> pd.DataFrame:
+    """Draw a sample of `size` rows of a query, see Sampler."""
+    return Sampler(_query, seed, strata, allocation).draw(size)
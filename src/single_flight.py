@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+LEASE_PREFIX = "lease:"
+
+
+class SingleFlightStats:
+    """Counts of executions and of the requests that were coalesced into them."""
+
+    def __init__(self):
+        self.executions = 0
+        self.coalesced_local = 0
+        self.coalesced_remote = 0
+        self.expired_leases = 0
+
+    @property
+    def coalesced(self) -> int:
+        return self.coalesced_local + self.coalesced_remote
+
+    def to_dict(self) -> dict:
+        return {
+            "executions": self.executions,
+            "coalesced_local": self.coalesced_local,
+            "coalesced_remote": self.coalesced_remote,
+            "expired_leases": self.expired_leases,
+        }
+
+
+class SingleFlight:
+    """
+    Makes concurrent requests for the same key wait for a single execution.
+
+    Within a worker, the first request for a key registers a future that
+    later requests wait on. Across gunicorn workers, the request that
+    executes holds a lease in Redis: other workers poll the cache for the
+    result until the lease is released, or expires if its holder died.
+    """
+
+    def __init__(
+        self, client=None, lease_ms: int = 120_000, poll_interval: float = 0.1
+    ):
+        """
+        :param client: cache backend holding the leases, None to only
+                       coalesce requests within this process
+        :param lease_ms: time after which the lease of a crashed worker expires
+        :param poll_interval: seconds between two lookups of a pending result
+        """
+        self.client = client
+        self.lease_ms = lease_ms
+        self.poll_interval = poll_interval
+        self.stats = SingleFlightStats()
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the requests in flight, e.g. those of the parent of a fork."""
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+
+    def do(
+        self,
+        key: str,
+        lookup: Callable[[], Optional[pd.DataFrame]],
+        compute: Callable[[], pd.DataFrame],
+    ) -> pd.DataFrame:
+        """
+        :param key: identifies identical requests, e.g. a Query hash
+        :param lookup: returns the cached result, or None if it is not cached
+        :param compute: executes the request and caches its result
+        :return: the result of the single execution for this key
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.stats.coalesced_local += 1
+        if not leader:
+            # Callers may modify their result, do not share it between them
+            return future.result().copy()
+
+        try:
+            result = self._across_workers(key, lookup, compute)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def _across_workers(self, key, lookup, compute) -> pd.DataFrame:
+        if self.client is None:
+            return self._execute(compute)
+        lease, token = LEASE_PREFIX + key, uuid.uuid4().hex
+        waited = False
+        while not self.client.set(lease, token, nx=True, px=self.lease_ms):
+            # Another worker is executing the request
+            if not waited:
+                self.stats.coalesced_remote += 1
+                waited = True
+            if not self._wait_for_release(lease):
+                # The lease outlived its expiry, stop waiting on its holder
+                return self._execute(compute)
+            result = lookup()
+            if result is not None:
+                return result
+        try:
+            # The result may have been cached between our lookup and the lease
+            result = lookup() if waited else None
+            return result if result is not None else self._execute(compute)
+        finally:
+            # Only release our own lease, it may have expired and been taken
+            self.client.delete_if_equal(lease, token)
+
+    def _wait_for_release(self, lease: str) -> bool:
+        """
+        Wait until a lease is released.
+
+        :return: False if the lease outlived its expiry without being released
+        """
+        deadline = time.monotonic() + self.lease_ms / 1000
+        while self.client.exists(lease):
+            if time.monotonic() > deadline:
+                self.stats.expired_leases += 1
+                return False
+            time.sleep(self.poll_interval)
+        return True
+
+    def _execute(self, compute) -> pd.DataFrame:
+        self.stats.executions += 1
+        return compute()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+
+class Aggregator:
+    """An aggregate that is updated one chunk of rows at a time."""
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def result(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+
+class MinMax(Aggregator):
+    """Extremum values of a numeric column."""
+
+    def __init__(self, column: str):
+        self.column = column
+        self.min = np.nan
+        self.max = np.nan
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        values = chunk[self.column].dropna()
+        if len(values):
+            low, high = values.min(), values.max()
+            self.min = low if pd.isna(self.min) else min(self.min, low)
+            self.max = high if pd.isna(self.max) else max(self.max, high)
+
+    def result(self) -> pd.DataFrame:
+        return pd.DataFrame([[self.min, self.max]], columns=["min", "max"])
+
+
+def collect(
+    chunks: Iterable[pd.DataFrame], columns: List[str], limit: int = None
+) -> pd.DataFrame:
+    """
+    Concatenate chunks of rows that have already been filtered, stopping as
+    soon as `limit` rows have been gathered.
+    """
+    frames, rows = [], 0
+    for chunk in chunks:
+        frames.append(chunk)
+        rows += len(chunk)
+        if limit is not None and rows >= limit:
+            break
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    result = pd.concat(frames, ignore_index=True)
+    return result.iloc[:limit] if limit is not None else result
+
+
+def aggregate(
+    chunks: Iterable[pd.DataFrame], *aggregators: Aggregator
+) -> List[pd.DataFrame]:
+    """Feed every chunk to the aggregators, then return their results."""
+    for chunk in chunks:
+        for aggregator in aggregators:
+            aggregator.update(chunk)
+    return [aggregator.result() for aggregator in aggregators]
+
+
+def csv_chunks(path, columns: List[str], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Read the given columns of a CSV, in the requested order, chunk by chunk."""
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_rows):
+        yield chunk[columns]
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+import pandas as pd
+
+from src.dataset_gateway import Singleton
+from src.field_metadata import MetadataCatalog
+from src.hierarchy import HierarchyLoader
+from src.tree.node import NodeIdentifier
+
+
+class NameIndex(metaclass=Singleton):
+    """
+    Human-readable names of the data fields and of their instances, derived
+    once from the hierarchy.
+    """
+
+    def __init__(self, hierarchy: pd.DataFrame = None):
+        if hierarchy is None:
+            hierarchy = HierarchyLoader.fetch_hierarchy()
+        leaves = hierarchy.loc[
+            hierarchy["RelatedFieldID"].isnull() & hierarchy["FieldID"].notnull(),
+            ["FieldID", "NodeName", "InstanceID"],
+        ]
+        field_ids = leaves["FieldID"].astype(int).astype(str)
+        is_field = leaves["InstanceID"].isnull()
+
+        self._names: Dict[str, str] = dict(
+            zip(field_ids[is_field], leaves.loc[is_field, "NodeName"])
+        )
+        self._instance_names: Dict[str, Dict[str, str]] = {}
+        self._titles: Dict[str, str] = {}
+
+        instance_ids = leaves["InstanceID"].astype("Int64").astype(str)
+        for field_id, rows in leaves.assign(
+            field_id=field_ids, instance_id=instance_ids
+        ).groupby("field_id", sort=False):
+            field = MetadataCatalog.get(field_id)
+            if field is None:
+                continue
+            if field.instanced:
+                # The field name is followed by one node per instance
+                rows = rows.loc[rows["InstanceID"].notnull()]
+                meta_ids = field_id + "-" + rows["instance_id"] + ".0"
+            else:
+                instance = (
+                    field.instance_min
+                    if rows["InstanceID"].isna().any()
+                    else rows["instance_id"].iloc[0]
+                )
+                meta_ids = [f"{field_id}-{instance}.0"] * len(rows)
+            self._instance_names[field_id] = dict(zip(meta_ids, rows["NodeName"]))
+
+    @classmethod
+    def field_name(cls, field_id) -> str:
+        """
+        :raises KeyError: if the field is not in the hierarchy
+        """
+        return cls()._names[str(field_id)]
+
+    @classmethod
+    def instance_names(cls, field_id) -> Dict[str, str]:
+        """
+        :return: the name of each instance of a field, keyed by column
+            identifier, e.g. `21001-2.0`
+        """
+        return dict(cls()._instance_names[str(field_id)])
+
+    @classmethod
+    def axis_title(cls, node_id: NodeIdentifier) -> Optional[str]:
+        if not node_id:
+            return None
+        index = cls()
+        db_id = node_id.db_id()
+        title = index._titles.get(db_id)
+        if title is None:
+            title = index._titles[db_id] = f"{index._names[node_id.field_id]} ({db_id})"
+        return title
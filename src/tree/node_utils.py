@@ -154,14 +154,6 @@ def get_hierarchy() -> (List[dict], dict):
     return tree["childNodes"], clopen_state
 
 
-def get_field_names_to_inst():
-    fields_info = HierarchyLoader.fetch_hierarchy()
-    field_names_to_inst = fields_info.loc[
-        fields_info["RelatedFieldID"].isnull() & fields_info["FieldID"].notnull()
-    ][["FieldID", "NodeName", "InstanceID"]]
-    return field_names_to_inst
-
-
 def get_option(node):
     label = node["label"]
     title = None
@@ -0,0 +1,48 @@
+import time
+import unittest
+
+from src.access_counts import AccessCounter
+from src.cache_backends import MemoryBackend
+
+
+class Unavailable(MemoryBackend):
+    def incr_scores(self, name, increments):
+        raise ConnectionError("cache unavailable")
+
+
+class AccessCounterTest(unittest.TestCase):
+    def test_counts_are_flushed_in_one_call(self):
+        backend = MemoryBackend()
+        counter = AccessCounter(backend, "access", flush_seconds=60)
+        counter.record(["21001-0.0", "31-0.0"])
+        counter.record(["21001-0.0"])
+        # Nothing reaches the cache before a flush
+        self.assertEqual(backend.top_scores("access", 5), [])
+        self.assertEqual(counter.flush(), 3)
+        self.assertEqual(
+            backend.top_scores("access", 5), [(b"21001-0.0", 2.0), (b"31-0.0", 1.0)]
+        )
+        self.assertEqual(counter.flush(), 0)
+
+    def test_counts_are_flushed_in_the_background(self):
+        backend = MemoryBackend()
+        counter = AccessCounter(backend, "access", flush_seconds=0.01)
+        counter.record(["21001-0.0"])
+        for _ in range(100):
+            if backend.top_scores("access", 1):
+                break
+            time.sleep(0.01)
+        self.assertEqual(backend.top_scores("access", 1), [(b"21001-0.0", 1.0)])
+        counter.reset()
+
+    def test_failed_flushes_keep_the_counts(self):
+        counter = AccessCounter(Unavailable(), "access", flush_seconds=60)
+        counter.record(["21001-0.0", "31-0.0"])
+        self.assertEqual(counter.flush(), 0)
+        self.assertEqual(counter.pending, 2)
+        counter.client = MemoryBackend()
+        self.assertEqual(counter.flush(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
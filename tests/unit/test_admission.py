@@ -0,0 +1,166 @@
+import io
+import threading
+import unittest
+from contextlib import redirect_stdout
+
+from src.admission import (
+    Admission,
+    CostModel,
+    QueryCost,
+    QueryRejected,
+    notices,
+    notify,
+)
+from src.aggregates import Count
+from src.dataset_gateway import Query
+from src.field_metadata import FieldMetadata
+from src.field_statistics import ColumnStatistics
+from src.predicates import NumericCastable, Range
+from src.value_type import ValueType
+
+STATISTICS = {
+    "21001-0.0": ColumnStatistics(
+        count=400,
+        null_count=600,
+        distinct_count=300,
+        histogram_edges=[10.0, 20.0, 30.0],
+        histogram_counts=[100, 300],
+    ),
+    "31-0.0": ColumnStatistics(count=1000, null_count=0, distinct_count=2),
+}
+
+
+def _field(field_id, value_type):
+    return FieldMetadata(field_id, value_type, None, True, 0, 0, 0, 0, 1000)
+
+
+METADATA = {
+    "21001": _field("21001", ValueType.CONT),
+    "31": _field("31", ValueType.CAT_SINGLE),
+    "20001": _field("20001", ValueType.TEXT),
+}
+
+
+def cost_model():
+    return CostModel(STATISTICS.get, METADATA.get, lambda: 1000)
+
+
+class CostModelTest(unittest.TestCase):
+    def test_projection(self):
+        cost = cost_model().estimate(Query(["eid", "21001-0.0", "20001-0.0"]))
+        self.assertEqual((cost.rows, cost.columns), (1000, 3))
+        self.assertEqual(cost.bytes, 1000 * (8 + 8 + 64))
+
+    def test_predicates_narrow_the_rows(self):
+        query = Query(["eid", "21001-0.0"]).filter(
+            NumericCastable("21001-0.0"), Range("21001-0.0", 10, 15)
+        )
+        # 400 participants have a value, an eighth of which is in [10, 15]
+        self.assertEqual(cost_model().rows(query), 50)
+        self.assertEqual(cost_model().rows(query.sample(0.5)), 25)
+
+    def test_aggregates_cost_their_groups(self):
+        query = Query(["eid"]).group_count("31-0.0")
+        cost = cost_model().estimate(query)
+        self.assertEqual((cost.rows, cost.columns, cost.bytes), (2, 2, 32))
+
+
+class AdmissionTest(unittest.TestCase):
+    def test_admits_queries_within_budget(self):
+        query = Query(["eid", "21001-0.0"])
+        admitted, cost = Admission(16_000, cost_model=cost_model()).admit(query)
+        self.assertIs(admitted, query)
+        self.assertEqual(cost.bytes, 16_000)
+
+    def test_samples_projections_over_budget(self):
+        query = Query(["eid", "21001-0.0"]).filter(NumericCastable("21001-0.0"))
+        admission = Admission(1600, cost_model=cost_model())
+        with notices() as messages:
+            admitted, cost = admission.admit(query)
+        self.assertIsNone(query.sampling)
+        self.assertAlmostEqual(admitted.sampling.fraction, 0.25)
+        self.assertEqual(admitted.predicates, query.predicates)
+        self.assertEqual(cost.rows, 100)
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(admission.stats.sampled, 1)
+
+    def test_notices_are_collected_per_block(self):
+        with notices() as outer:
+            notify("outer")
+            with notices() as inner:
+                notify("inner")
+                notify("inner")
+        self.assertEqual((outer, inner), (["outer"], ["inner"]))
+        with redirect_stdout(io.StringIO()) as output:
+            notify("nobody is listening")
+        self.assertEqual(output.getvalue(), "")
+
+    def test_rejects_queries_that_cannot_be_sampled(self):
+        query = Query(["eid", "21001-0.0"]).aggregate(Count(), group_by="21001-0.0")
+        admission = Admission(100, cost_model=cost_model())
+        with self.assertRaises(QueryRejected):
+            admission.admit(query)
+        self.assertEqual(admission.stats.rejected, 1)
+
+    def test_admit_sample(self):
+        query = Query(["eid", "21001-0.0", "31-0.0"])
+        admission = Admission(2400, cost_model=cost_model())
+        self.assertEqual(admission.admit_sample(query, 50)[0], 50)
+        with notices() as messages:
+            size, cost = admission.admit_sample(query, 500)
+        self.assertEqual((size, cost.bytes), (100, 2400))
+        self.assertEqual(len(messages), 1)
+
+    def test_worker_budget_queues_then_rejects(self):
+        admission = Admission(worker_budget=100, queue_seconds=0.05)
+        with admission.running(QueryCost(10, 1, 80)):
+            self.assertEqual(admission.in_flight, 80)
+            with admission.running(QueryCost(2, 1, 16)):
+                self.assertEqual(admission.in_flight, 96)
+            with self.assertRaises(QueryRejected):
+                with admission.running(QueryCost(10, 1, 80)):
+                    pass
+        self.assertEqual(admission.in_flight, 0)
+        # An idle worker runs any query
+        with admission.running(QueryCost(100, 1, 800)):
+            pass
+
+    def test_counts_of_concurrent_queries(self):
+        admission = Admission(100, cost_model=cost_model())
+        query = Query(["eid", "21001-0.0"]).aggregate(Count(), group_by="21001-0.0")
+
+        def reject():
+            for _ in range(200):
+                with self.assertRaises(QueryRejected):
+                    admission.admit(query)
+
+        threads = [threading.Thread(target=reject) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(admission.stats.rejected, 800)
+
+    def test_queued_query_runs_once_budget_is_freed(self):
+        admission = Admission(worker_budget=100, queue_seconds=5)
+        started, release = threading.Event(), threading.Event()
+
+        def hold():
+            with admission.running(QueryCost(10, 1, 80)):
+                started.set()
+                release.wait()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        started.wait()
+        threading.Timer(0.05, release.set).start()
+        with notices() as messages:
+            with admission.running(QueryCost(10, 1, 80)):
+                self.assertEqual(admission.in_flight, 80)
+        holder.join()
+        self.assertEqual(admission.stats.queued, 1)
+        self.assertEqual(len(messages), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
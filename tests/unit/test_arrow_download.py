@@ -0,0 +1,111 @@
+import unittest
+from types import SimpleNamespace
+
+import numpy as np
+import pyarrow as pa
+
+from src import codec
+from src.arrow_download import ArrowDownloader
+
+
+class FakeReadClient:
+    """Serves a table as Arrow record batches split across read streams."""
+
+    def __init__(self, table: pa.Table, batch_rows: int):
+        self.table = table
+        self.batch_rows = batch_rows
+        self.sessions = []
+
+    def create_read_session(self, parent, read_session, max_stream_count):
+        self.sessions.append((parent, read_session.table, max_stream_count))
+        batches = self.table.to_batches(max_chunksize=self.batch_rows)
+        self.streams = {
+            f"stream-{i}": batches[i::max_stream_count]
+            for i in range(min(max_stream_count, len(batches)))
+        }
+        return SimpleNamespace(
+            arrow_schema=SimpleNamespace(
+                serialized_schema=self.table.schema.serialize().to_pybytes()
+            ),
+            streams=[SimpleNamespace(name=name) for name in self.streams],
+        )
+
+    def read_rows(self, name):
+        for batch in self.streams[name]:
+            yield SimpleNamespace(
+                arrow_record_batch=SimpleNamespace(
+                    serialized_record_batch=batch.serialize().to_pybytes()
+                )
+            )
+
+
+class FakeClient:
+    """Runs every query into the same destination table."""
+
+    def __init__(self, table: pa.Table):
+        self.table = table
+        self.destination = SimpleNamespace(
+            project="biobank", dataset_id="_anonymous", table_id="result"
+        )
+
+    def query(self, sql):
+        rows = SimpleNamespace(
+            total_rows=self.table.num_rows,
+            to_arrow=lambda create_bqstorage_client: self.table,
+        )
+        return SimpleNamespace(
+            result=lambda page_size: rows, destination=self.destination
+        )
+
+
+class ArrowDownloaderTest(unittest.TestCase):
+    def setUp(self):
+        self.table = pa.table(
+            {
+                "eid": np.arange(1000000, 1001000),
+                "_21001_0_0": np.linspace(15, 45, 1000),
+                "_31_0_0": pa.array([str(i % 2) for i in range(1000)]),
+            }
+        )
+        self.read_client = FakeReadClient(self.table, batch_rows=64)
+
+    def downloader(self, min_rows):
+        return ArrowDownloader(
+            FakeClient(self.table), self.read_client, max_streams=4, min_rows=min_rows
+        )
+
+    def test_reads_all_streams(self):
+        result = self.downloader(min_rows=100).query("SELECT ...")
+        self.assertEqual(len(self.read_client.streams), 4)
+        self.assertEqual(result.schema, self.table.schema)
+        self.assertEqual(
+            sorted(result.column("eid").to_pylist()),
+            self.table.column("eid").to_pylist(),
+        )
+        self.assertEqual(
+            self.read_client.sessions,
+            [
+                (
+                    "projects/biobank",
+                    "projects/biobank/datasets/_anonymous/tables/result",
+                    4,
+                )
+            ],
+        )
+
+    def test_small_results_skip_read_session(self):
+        result = self.downloader(min_rows=10_000).query("SELECT ...")
+        self.assertTrue(result.equals(self.table))
+        self.assertEqual(self.read_client.sessions, [])
+
+    def test_downloaded_table_is_encoded_directly(self):
+        result = self.downloader(min_rows=100).query("SELECT ...")
+        columns = ["eid", "21001-0.0", "31-0.0"]
+        arrow = codec.get_codec("arrow-zstd")
+        decoded = codec.decode(arrow.encode_table(result, columns))
+        self.assertEqual(list(decoded.columns), columns)
+        self.assertEqual(len(decoded), 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
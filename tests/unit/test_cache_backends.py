@@ -0,0 +1,168 @@
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from src.cache_backends import DiskBackend, HashRing, MemoryBackend, ShardedBackend
+
+
+class BackendContract:
+    """Behaviour shared by every backend, see CacheBackend."""
+
+    def make_backend(self, max_bytes=1000):
+        raise NotImplementedError
+
+    def test_get_and_set(self):
+        backend = self.make_backend()
+        self.assertIsNone(backend.get("dataset:v1:a"))
+        self.assertTrue(backend.set("dataset:v1:a", b"result"))
+        self.assertEqual(backend.get("dataset:v1:a"), b"result")
+        self.assertTrue(backend.exists("dataset:v1:a"))
+        stats = backend.metrics()
+        self.assertEqual((stats["hits"], stats["misses"], stats["writes"]), (1, 1, 1))
+
+    def test_nx_and_expiry(self):
+        backend = self.make_backend()
+        self.assertTrue(backend.set("lease:a", "token", nx=True, px=50))
+        self.assertFalse(backend.set("lease:a", "other", nx=True, px=50))
+        self.assertEqual(backend.get("lease:a"), b"token")
+        time.sleep(0.1)
+        self.assertFalse(backend.exists("lease:a"))
+        self.assertTrue(backend.set("lease:a", "other", nx=True, px=50))
+
+    def test_delete_if_equal(self):
+        backend = self.make_backend()
+        backend.set("lease:a", "token")
+        self.assertFalse(backend.delete_if_equal("lease:a", "other"))
+        self.assertTrue(backend.exists("lease:a"))
+        self.assertTrue(backend.delete_if_equal("lease:a", "token"))
+        self.assertFalse(backend.exists("lease:a"))
+        self.assertFalse(backend.delete_if_equal("lease:a", "token"))
+
+    def test_scan_and_unlink(self):
+        backend = self.make_backend()
+        for key in ["dataset:v1:a", "dataset:v1:b", "dataset:v2:a", "lease:x"]:
+            backend.set(key, b"1")
+        keys = sorted(backend.scan_iter(match="dataset:v1:*", count=1))
+        self.assertEqual(keys, [b"dataset:v1:a", b"dataset:v1:b"])
+        self.assertEqual(backend.unlink(*keys), 2)
+        self.assertEqual(sorted(backend.scan_iter()), [b"dataset:v2:a", b"lease:x"])
+        self.assertEqual(backend.delete("lease:x", "missing"), 1)
+
+    def test_scores(self):
+        backend = self.make_backend()
+        backend.incr_scores("access:fields", {"31-0.0": 1, "21001-0.0": 1})
+        backend.incr_scores("access:fields", {"21001-0.0": 2})
+        self.assertEqual(backend.top_scores("access:fields", 1), [(b"21001-0.0", 3.0)])
+        self.assertEqual(len(backend.top_scores("access:fields", 5)), 2)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        backend = self.make_backend(max_bytes=250)
+        backend.set("a", b"x" * 100)
+        backend.set("b", b"x" * 100)
+        backend.get("a")
+        backend.set("c", b"x" * 100)
+        self.assertTrue(backend.exists("a"))
+        self.assertFalse(backend.exists("b"))
+        self.assertTrue(backend.exists("c"))
+        # Entries larger than the whole cache are not stored
+        self.assertFalse(backend.set("d", b"x" * 300))
+        self.assertTrue(backend.exists("a"))
+
+
+class MemoryBackendTest(BackendContract, unittest.TestCase):
+    def make_backend(self, max_bytes=1000):
+        return MemoryBackend(max_bytes)
+
+
+class DiskBackendTest(BackendContract, unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name).joinpath("cache.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_backend(self, max_bytes=1000):
+        return DiskBackend(self.path, max_bytes)
+
+    def test_entries_are_shared_and_persisted(self):
+        self.make_backend().set("dataset:v1:a", b"result")
+        self.assertEqual(self.make_backend().get("dataset:v1:a"), b"result")
+
+    def test_total_size_is_kept_up_to_date(self):
+        backend = self.make_backend(max_bytes=250)
+        backend.set("a", b"x" * 100)
+        backend.set("a", b"x" * 50)
+        backend.set("b", b"x" * 100)
+        # Evicts a
+        backend.set("c", b"x" * 150)
+        backend.delete("c")
+
+        def sizes():
+            connection = backend._connection
+            return (
+                connection.execute("SELECT size FROM usage").fetchone()[0],
+                connection.execute("SELECT SUM(size) FROM entries").fetchone()[0],
+            )
+
+        self.assertEqual(sizes(), (100, 100))
+        # Databases created before the total was kept start from their entries
+        backend._connection.executescript(
+            "DROP TRIGGER entries_insert; DROP TRIGGER entries_delete; DROP TABLE usage"
+        )
+        backend = self.make_backend(max_bytes=250)
+        self.assertEqual(sizes(), (100, 100))
+
+    def test_reads_are_written_in_batches(self):
+        backend = self.make_backend()
+
+        def accessed_at():
+            return backend._connection.execute(
+                "SELECT accessed_at FROM entries WHERE key = 'a'"
+            ).fetchone()[0]
+
+        backend.set("a", b"1")
+        written = accessed_at()
+        time.sleep(0.01)
+        backend.get("a")
+        self.assertEqual(accessed_at(), written)
+        # Written along with the next entry
+        backend.set("b", b"1")
+        self.assertGreater(accessed_at(), written)
+
+
+class ShardedBackendTest(BackendContract, unittest.TestCase):
+    def make_backend(self, max_bytes=1000):
+        # Each node is bounded on its own, the sharded cache holds at least
+        # as much as one of them
+        return ShardedBackend({"node": MemoryBackend(max_bytes)})
+
+    def test_keys_are_spread_over_nodes(self):
+        nodes = {f"redis-{i}:6379": MemoryBackend() for i in range(3)}
+        backend = ShardedBackend(nodes)
+        keys = [f"dataset:v1:{i}" for i in range(300)]
+        for key in keys:
+            backend.set(key, b"1")
+        counts = [len(list(node.scan_iter())) for node in nodes.values()]
+        self.assertEqual(sum(counts), 300)
+        self.assertGreater(min(counts), 50)
+        self.assertEqual(len(list(backend.scan_iter("dataset:*"))), 300)
+        self.assertEqual(backend.unlink(*keys), 300)
+        metrics = backend.metrics()
+        self.assertEqual(metrics["writes"], 300)
+        self.assertEqual(sum(n["writes"] for n in metrics["nodes"].values()), 300)
+
+
+class HashRingTest(unittest.TestCase):
+    def test_adding_a_node_only_moves_its_keys(self):
+        keys = [f"dataset:v1:{i}" for i in range(1000)]
+        before = HashRing(["a", "b", "c"])
+        after = HashRing(["a", "b", "c", "d"])
+        moved = [key for key in keys if before.node(key) != after.node(key)]
+        self.assertTrue(all(after.node(key) == "d" for key in moved))
+        self.assertLess(len(moved), 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
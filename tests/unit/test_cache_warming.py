@@ -0,0 +1,93 @@
+import unittest
+from unittest import mock
+
+from src._constants import ACCESS_COUNTS_KEY
+from src.cache_backends import MemoryBackend
+from src.cache_warming import _field_id, _numeric_fields, top_fields, warm_cache
+
+
+class Clock:
+    """Time of the warming, advanced by each query."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+class Gateway:
+    """Records the queries submitted, each taking `seconds` of the clock."""
+
+    def __init__(self, clock, seconds=0.0):
+        self.clock = clock
+        self.seconds = seconds
+        self.submitted = []
+        self.submitted_many = []
+
+    def __call__(self):
+        return self
+
+    def submit_columns(self, _query):
+        self.clock.now += self.seconds
+        self.submitted.append(_query.df_columns)
+
+    def submit_many(self, queries, record_access=True):
+        self.clock.now += self.seconds
+        self.submitted_many.append([_query.min_max_column for _query in queries])
+
+
+class CacheWarmingTest(unittest.TestCase):
+    def setUp(self):
+        backend = MemoryBackend()
+        backend.incr_scores(
+            ACCESS_COUNTS_KEY,
+            {"31-0.0": 5, "21001-0.0": 9, "21003-0.0": 2, "20002-0.0": 7},
+        )
+        self.clock = Clock()
+        self.gateway = Gateway(self.clock)
+        for patch in [
+            mock.patch("src.cache_warming.cache", backend),
+            mock.patch("src.cache_warming.time", self.clock),
+            mock.patch("src.cache_warming.DatasetGateway", self.gateway),
+            mock.patch("src.cache_warming.WARM_BATCH_SIZE", 2),
+            mock.patch("src.cache_warming._numeric_fields", lambda: {"21001", "21003"}),
+            mock.patch("src.cache_warming.FieldStatisticsIndex.lookup", lambda _: None),
+        ]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_top_fields(self):
+        self.assertEqual(top_fields(2), [("21001-0.0", 9), ("20002-0.0", 7)])
+
+    def test_warms_top_fields_by_score(self):
+        report = warm_cache(top_n=3)
+        self.assertEqual(
+            self.gateway.submitted,
+            [["eid", "21001-0.0", "20002-0.0"], ["eid", "31-0.0"]],
+        )
+        # The bounds of the numeric fields share a single submission
+        self.assertEqual(self.gateway.submitted_many, [["21001-0.0"]])
+        self.assertEqual((report["fields"], report["min_max"]), (3, 1))
+
+    def test_stays_within_budget(self):
+        self.gateway.seconds = 6
+        report = warm_cache(top_n=4, budget_seconds=5)
+        # No query is started past the budget
+        self.assertEqual(self.gateway.submitted, [["eid", "21001-0.0", "20002-0.0"]])
+        self.assertEqual(self.gateway.submitted_many, [])
+        self.assertEqual((report["fields"], report["skipped"]), (2, 4))
+
+    def test_field_id(self):
+        self.assertEqual(_field_id("_21001_0_0"), "21001")
+        self.assertEqual(_field_id("21001-0.0"), "21001")
+
+    def test_numeric_fields(self):
+        numeric_fields = _numeric_fields()
+        # Body mass index is continuous, sex is categorical
+        self.assertIn("21001", numeric_fields)
+        self.assertNotIn("31", numeric_fields)
+
+
+if __name__ == "__main__":
+    unittest.main()
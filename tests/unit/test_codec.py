@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src import codec
+
+
+class CodecTest(unittest.TestCase):
+    def setUp(self):
+        self.frame = pd.DataFrame(
+            {
+                "eid": np.arange(1000010, 1000020),
+                "21001-0.0": np.linspace(18.5, 40.0, 10),
+                "31-0.0": np.arange(10) % 2,
+            }
+        )
+        self.frame.loc[3, "21001-0.0"] = np.nan
+
+    def test_arrow_round_trip_preserves_dtypes(self):
+        for compression in codec.COMPRESSIONS:
+            encoded = codec.get_codec(f"arrow-{compression}").encode(self.frame)
+            pd.testing.assert_frame_equal(codec.decode(encoded), self.frame)
+
+    def test_duplicate_columns(self):
+        frame = self.frame[["eid", "31-0.0", "31-0.0"]]
+        decoded = codec.decode(codec.get_codec("arrow-lz4").encode(frame))
+        self.assertEqual(list(decoded.columns), ["eid", "31-0.0", "31-0.0"])
+
+    def test_filtered_frame_round_trip(self):
+        frame = self.frame[self.frame["21001-0.0"].notna()].iloc[2:]
+        for compression in codec.COMPRESSIONS:
+            encoded = codec.get_codec(f"arrow-{compression}").encode(frame)
+            pd.testing.assert_frame_equal(
+                codec.decode(encoded), frame.reset_index(drop=True)
+            )
+
+    def test_legacy_json_entries(self):
+        decoded = codec.decode(self.frame.to_json().encode("utf-8"))
+        self.assertEqual(list(decoded.columns), list(self.frame.columns))
+        self.assertEqual(len(decoded), len(self.frame))
+
+    def test_unsupported_version(self):
+        encoded = bytearray(codec.get_codec("arrow").encode(self.frame))
+        encoded[4] = codec.FORMAT_VERSION + 1
+        with self.assertRaises(codec.CodecError):
+            codec.decode(bytes(encoded))
+
+    def test_benchmark_reports_every_codec(self):
+        report = codec.benchmark(self.frame)
+        self.assertEqual(len(report), 1 + len(codec.COMPRESSIONS))
+        self.assertTrue((report["compression_ratio"] > 0).all())
+        self.assertTrue((report["decoded"] == 1).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
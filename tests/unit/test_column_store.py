@@ -0,0 +1,113 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.column_store import ColumnStore
+
+
+class ColumnStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_path = Path(self.tmp.name).joinpath("dataset.csv")
+        pd.DataFrame(
+            {
+                "31-0.0": [0, 1, 1, 0],
+                "eid": [1000010, 1000022, 1000035, 1000046],
+                "21001-0.0": [22.5, np.nan, 31.2, 27.9],
+                "20002-0.0": ["1065", "", "1111", "1065"],
+            }
+        ).to_csv(self.csv_path, index=False)
+        self.store = ColumnStore.ingest(
+            self.csv_path, Path(self.tmp.name).joinpath("store"), columns_per_pass=2
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_manifest(self):
+        self.assertTrue(self.store.is_available())
+        self.assertEqual(self.store.num_rows, 4)
+        self.assertEqual(self.store.columns()[0], "eid")
+        self.assertEqual(len(self.store.columns()), 4)
+
+    def test_read_matches_csv(self):
+        columns = ["eid", "21001-0.0", "31-0.0"]
+        expected = pd.read_csv(self.csv_path, usecols=columns)[columns]
+        pd.testing.assert_frame_equal(self.store.read(columns), expected)
+
+    def test_mapped_frame_is_zero_copy(self):
+        columns = ["eid", "21001-0.0"]
+        mapped = self.store.mapped_frame(columns)
+        pd.testing.assert_frame_equal(mapped, self.store.read(columns))
+        # Views over the memory-mapped files are read-only
+        self.assertFalse(mapped["21001-0.0"].to_numpy().flags.writeable)
+        self.assertIs(self.store.map_column("eid"), self.store.map_column("eid"))
+
+    def test_iter_chunks(self):
+        columns = ["eid", "20002-0.0"]
+        chunks = list(self.store.iter_chunks(columns, chunk_rows=3))
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 1])
+        pd.testing.assert_frame_equal(
+            pd.concat(chunks, ignore_index=True), self.store.read(columns)
+        )
+
+    def test_read_unknown_column(self):
+        with self.assertRaises(KeyError):
+            self.store.read(["eid", "4-0.0"])
+
+    def test_packed_fields(self):
+        store = ColumnStore.ingest(
+            self.csv_path,
+            Path(self.tmp.name).joinpath("packed"),
+            packed_fields=["20002"],
+        )
+        self.assertEqual(store.manifest["packed"], {"20002-0": ["20002-0.0"]})
+        self.assertTrue(store.has_packed("20002-0"))
+        self.assertFalse(store.has_packed("20002-1"))
+        packed = store.map_packed("20002-0")
+        np.testing.assert_array_equal(packed.eids, store.map_column("eid"))
+        self.assertEqual(
+            packed.count().to_dict("list"), {"value": ["1065", "1111"], "count": [2, 1]}
+        )
+
+    def test_update(self):
+        delta_path = Path(self.tmp.name).joinpath("delta.csv")
+        pd.DataFrame(
+            {
+                "eid": [1000035, 1000010],
+                "21001-0.0": [np.nan, 24.1],
+                "50-0.0": [170, 182],
+            }
+        ).to_csv(delta_path, index=False)
+        mapped = self.store.map_column("21001-0.0")
+
+        changed = ColumnStore(self.store.path).update(delta_path)
+        self.assertEqual(changed, ["21001-0.0", "50-0.0"])
+        self.assertTrue(self.store.refresh())
+        self.assertIsNot(self.store.map_column("21001-0.0"), mapped)
+        self.assertEqual(self.store.revision("21001-0.0"), 1)
+        self.assertEqual(self.store.revision("31-0.0"), 0)
+
+        frame = self.store.read(["eid", "21001-0.0", "50-0.0", "31-0.0"])
+        np.testing.assert_array_equal(frame["21001-0.0"], [24.1, np.nan, np.nan, 27.9])
+        np.testing.assert_array_equal(frame["50-0.0"], [182, np.nan, 170, np.nan])
+        self.assertEqual(frame["31-0.0"].tolist(), [0, 1, 1, 0])
+
+    def test_update_with_unknown_participants(self):
+        delta_path = Path(self.tmp.name).joinpath("delta.csv")
+        pd.DataFrame({"eid": [1000099], "50-0.0": [170]}).to_csv(
+            delta_path, index=False
+        )
+        with self.assertRaises(ValueError):
+            self.store.update(delta_path)
+        self.assertFalse(self.store.refresh())
+
+    def test_not_available_before_ingest(self):
+        self.assertFalse(ColumnStore(Path(self.tmp.name)).is_available())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from src import local_engine
+from src.access_counts import AccessCounter
+from src.admission import Admission, CostModel
+from src.cache_backends import MemoryBackend
+from src.dataset_gateway import (
+    DatasetGateway,
+    LocalClient,
+    Query,
+    _assemble,
+    _to_numeric_frame,
+    column_key,
+)
+from src.query_cache import LRUCache
+from src.single_flight import SingleFlight
+
+
+class DatasetGatewayTest(unittest.TestCase):
+    def test_projection(self):
+        self.assertTrue(Query(["eid", "31-0.0"]).is_projection())
+        self.assertFalse(Query(["eid", "31-0.0"]).limit_output(10).is_projection())
+        self.assertFalse(Query(["eid", "31-0.0"]).get_min_max().is_projection())
+
+    def test_min_max_column(self):
+        self.assertEqual(
+            Query(["eid", "31-0.0"]).get_min_max().min_max_column, "31-0.0"
+        )
+        self.assertIsNone(Query(["eid", "31-0.0"]).min_max_column)
+        self.assertIsNone(
+            Query(["eid", "31-0.0", "21001-0.0"]).get_min_max().min_max_column
+        )
+
+    def test_can_map(self):
+        with mock.patch.object(LocalClient.store, "is_available", lambda: True):
+            self.assertTrue(LocalClient.can_map(Query(["eid", "31-0.0"])))
+            # Raw SQL conditions can't be evaluated on the mapped columns
+            self.assertFalse(
+                LocalClient.can_map(Query(["eid", "31-0.0"], where="`31-0.0` = 1"))
+            )
+            self.assertFalse(LocalClient.can_map(Query(["eid"]).group_count("31-0.0")))
+
+    def test_numeric_frame(self):
+        frame = _to_numeric_frame(pd.DataFrame({"20002-0.0": ["1065", "", "abc"]}))
+        self.assertEqual(frame["20002-0.0"].iloc[0], 1065)
+        self.assertTrue(frame["20002-0.0"].iloc[1:].isna().all())
+
+    def test_column_keys_are_distinct(self):
+        self.assertNotEqual(column_key("31-0.0"), column_key("21001-0.0"))
+        self.assertNotEqual(column_key("31-0.0"), Query(["31-0.0"]).hash())
+
+    def test_assemble_aligned_columns(self):
+        pieces = {
+            "31-0.0": pd.DataFrame({"eid": [1, 2, 3], "31-0.0": [0, 1, 0]}),
+            "21001-0.0": pd.DataFrame(
+                {"eid": [1, 2, 3], "21001-0.0": [20.1, 25.3, 30.2]}
+            ),
+        }
+        result = _assemble(pieces, ["21001-0.0", "31-0.0"])
+        self.assertEqual(list(result.columns), ["eid", "21001-0.0", "31-0.0"])
+        self.assertEqual(result["31-0.0"].tolist(), [0, 1, 0])
+
+    def test_assemble_misaligned_columns(self):
+        pieces = {
+            "31-0.0": pd.DataFrame({"eid": [1, 2, 3], "31-0.0": [0, 1, 0]}),
+            "21001-0.0": pd.DataFrame({"eid": [2, 3], "21001-0.0": [25.3, 30.2]}),
+        }
+        result = _assemble(pieces, ["31-0.0", "21001-0.0"])
+        self.assertEqual(result["eid"].tolist(), [1, 2, 3])
+        self.assertTrue(pd.isna(result["21001-0.0"].iloc[0]))
+        self.assertEqual(result["21001-0.0"].iloc[2], 30.2)
+
+
+class Job:
+    def __init__(self, df):
+        self.df = df
+
+    def result(self):
+        return self
+
+    def to_dataframe(self):
+        return self.df
+
+
+class Source:
+    """Data source answering queries from a frame, recording each scan."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.scans = []
+
+    def query(self, _query):
+        self.scans.append(_query.referenced_columns())
+        return Job(local_engine.execute(_query, [self.frame]))
+
+
+class GatewayCachingTest(unittest.TestCase):
+    def setUp(self):
+        self.source = Source(
+            pd.DataFrame(
+                {
+                    "eid": [1000003, 1000001, 1000002],
+                    "31-0.0": [0, 1, 0],
+                    "21001-0.0": [20.1, 25.3, 30.2],
+                    "50-0.0": [170.0, 182.5, 165.0],
+                    "21003-0.0": [63.0, 50.0, 58.0],
+                }
+            )
+        )
+        self.gateway = DatasetGateway()
+        self.admission = Admission(
+            cost_model=CostModel(lambda _: None, lambda _: None, lambda: 3)
+        )
+        for patch in [
+            mock.patch("src.dataset_gateway.cache", MemoryBackend()),
+            mock.patch("src.dataset_gateway.admission", self.admission),
+            mock.patch.object(LocalClient, "can_map", lambda _: False),
+            mock.patch.object(
+                DatasetGateway, "client", mock.PropertyMock(return_value=self.source)
+            ),
+            mock.patch.object(
+                DatasetGateway, "downloader", mock.PropertyMock(return_value=None)
+            ),
+            mock.patch.object(self.gateway, "local_cache", LRUCache(10 ** 6)),
+            mock.patch.object(self.gateway, "single_flight", SingleFlight()),
+            mock.patch.object(
+                self.gateway, "access_counts", AccessCounter(MemoryBackend())
+            ),
+        ]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_subset_is_served_from_cached_columns(self):
+        DatasetGateway.submit(Query(["eid", "31-0.0", "21001-0.0"]))
+        # Served by the shared cache rather than by this worker
+        self.gateway.local_cache.clear()
+        result = DatasetGateway.submit(Query(["eid", "21001-0.0"]))
+        self.assertEqual(len(self.source.scans), 1)
+        self.assertEqual(result["eid"].tolist(), [1000001, 1000002, 1000003])
+        self.assertEqual(result["21001-0.0"].tolist(), [25.3, 30.2, 20.1])
+
+    def test_only_missing_columns_are_fetched(self):
+        DatasetGateway.submit(Query(["eid", "31-0.0", "21001-0.0"]))
+        result = DatasetGateway.submit(Query(["eid", "21001-0.0", "50-0.0"]))
+        self.assertEqual(self.source.scans[1], ["eid", "50-0.0"])
+        self.assertEqual(list(result.columns), ["eid", "21001-0.0", "50-0.0"])
+        self.assertEqual(result["50-0.0"].tolist(), [182.5, 165.0, 170.0])
+
+    def test_submit_many_scans_once(self):
+        first, second, bounds = DatasetGateway.submit_many(
+            [
+                Query(["eid", "31-0.0"]),
+                Query(["eid", "21001-0.0"]),
+                Query(["eid", "21001-0.0"]).get_min_max(),
+            ]
+        )
+        self.assertEqual(self.source.scans, [["eid", "31-0.0", "21001-0.0"]])
+        # The shared scan runs within the budget of the worker
+        self.assertEqual(self.admission.stats.admitted, 1)
+        self.assertEqual(first["31-0.0"].tolist(), [1, 0, 0])
+        self.assertEqual(second["21001-0.0"].tolist(), [25.3, 30.2, 20.1])
+        self.assertEqual(bounds.iloc[0].tolist(), [20.1, 30.2])
+        # Bounds of columns that aren't cached share a single aggregation
+        bounds = DatasetGateway.submit_many(
+            [
+                Query(["eid", "31-0.0"]).get_min_max(),
+                Query(["eid", "50-0.0"]).get_min_max(),
+                Query(["eid", "21003-0.0"]).get_min_max(),
+            ]
+        )
+        self.assertEqual(self.source.scans[1:], [["eid", "50-0.0", "21003-0.0"]])
+        self.assertEqual(self.admission.stats.admitted, 2)
+        self.assertEqual(
+            [frame.iloc[0].tolist() for frame in bounds],
+            [[0, 1], [165.0, 182.5], [50.0, 63.0]],
+        )
+
+    def test_submit_many_over_budget_fetches_each_query(self):
+        # Each column of the 3 participants takes 24 bytes
+        self.admission.request_budget = 60
+        DatasetGateway.submit_many(
+            [
+                Query(["eid", "31-0.0"]),
+                Query(["eid", "21001-0.0"]),
+                Query(["eid", "21001-0.0"]).get_min_max(),
+            ]
+        )
+        self.assertEqual(self.source.scans, [["eid", "31-0.0"], ["eid", "21001-0.0"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
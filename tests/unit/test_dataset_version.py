@@ -0,0 +1,68 @@
+import fnmatch
+import unittest
+
+from src.dataset_gateway import Query, column_key
+from src.dataset_version import (
+    KEY_PREFIX,
+    DatasetVersion,
+    dataset_version,
+    invalidate,
+    version_id,
+)
+
+
+class Keys:
+    """The subset of the Redis client used for invalidation, held in memory."""
+
+    def __init__(self, keys):
+        self.keys = set(key.encode() for key in keys)
+
+    def scan_iter(self, match, count=None):
+        return iter(sorted(k for k in self.keys if fnmatch.fnmatch(k.decode(), match)))
+
+    def unlink(self, *keys):
+        deleted = self.keys.intersection(keys)
+        self.keys -= deleted
+        return len(deleted)
+
+
+class DatasetVersionTest(unittest.TestCase):
+    def setUp(self):
+        self.fingerprints = ["ukbb-dataset.csv@100-1"]
+        self.version = DatasetVersion(lambda: self.fingerprints[-1], check_seconds=0)
+
+    def test_key_includes_version(self):
+        key = self.version.key("abc")
+        self.assertEqual(key, f"{KEY_PREFIX}{version_id(self.fingerprints[-1])}:abc")
+
+    def test_refreshed_dataset_changes_keys(self):
+        before = self.version.key("abc")
+        self.fingerprints.append("ukbb-dataset.csv@120-2")
+        self.assertNotEqual(self.version.key("abc"), before)
+
+    def test_fingerprint_is_checked_periodically(self):
+        version = DatasetVersion(lambda: self.fingerprints[-1], check_seconds=3600)
+        before = version.current()
+        self.fingerprints.append("ukbb-dataset.csv@120-2")
+        self.assertEqual(version.current(), before)
+
+    def test_query_keys_are_versioned(self):
+        prefix = f"{KEY_PREFIX}{dataset_version.current()}:"
+        self.assertTrue(Query(["eid", "31-0.0"]).hash().startswith(prefix))
+        self.assertTrue(column_key("31-0.0").startswith(prefix))
+
+    def test_invalidate_previous_versions(self):
+        client = Keys(
+            ["dataset:old:a", "dataset:old:b", "dataset:new:a", "access:fields"]
+        )
+        self.assertEqual(invalidate(keep="new", client=client), 2)
+        self.assertEqual(client.keys, {b"dataset:new:a", b"access:fields"})
+
+    def test_invalidate_version(self):
+        client = Keys(["dataset:old:a", "dataset:older:a", "dataset:new:a"])
+        self.assertEqual(invalidate("old", client=client), 1)
+        self.assertEqual(client.keys, {b"dataset:older:a", b"dataset:new:a"})
+
+
+if __name__ == "__main__":
+    unittest.main()
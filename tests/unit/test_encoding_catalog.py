@@ -0,0 +1,68 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.encoding_catalog import EncodingCatalog
+
+
+class EncodingCatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name).joinpath("encodings.arrow")
+        self.encodings = {
+            9: {0: "Female", 1: "Male"},
+            10: {11012: "Barts", 11021: "Birmingham"},
+            19: {"A00": "Cholera", "A01": "Typhoid and paratyphoid fevers"},
+        }
+        self.fetched = []
+
+        def fetch(encoding_id):
+            self.fetched.append(encoding_id)
+            return self.encodings[encoding_id]
+
+        self.catalog = EncodingCatalog()
+        self.default_path = self.catalog.path
+        self.catalog.path = self.path
+        EncodingCatalog.build([10, 9, 19], fetch, self.path)
+
+    def tearDown(self):
+        self.catalog.path = self.default_path
+        self.catalog.load()
+        self.tmp.cleanup()
+
+    def test_lookup(self):
+        self.assertEqual(self.catalog.encoding(9), self.encodings[9])
+        self.assertEqual(self.catalog.encoding(10)[11021], "Birmingham")
+        self.assertEqual(self.catalog.encoding(19)["A00"], "Cholera")
+
+    def test_catalog_is_read_without_fetching(self):
+        self.assertEqual(self.fetched, [9, 10, 19])
+        self.assertEqual(EncodingCatalog.lookup("10")[11012], "Barts")
+        self.assertEqual(self.fetched, [9, 10, 19])
+
+    def test_missing_codings(self):
+        encoding = self.catalog.encoding(10)
+        self.assertNotIn(11013, encoding)
+        self.assertNotIn("A00", encoding)
+        self.assertIsNone(self.catalog.encoding(19).get(0))
+        self.assertEqual(list(encoding), [11012, 11021])
+
+    def test_lookup_tables_are_built_once(self):
+        self.assertIs(self.catalog.encoding(9), self.catalog.encoding(9))
+        self.assertEqual(len(self.catalog.encoding(10)), 2)
+
+    def test_update(self):
+        self.encodings[9] = {0: "Female", 1: "Male", 2: "Intersex"}
+        EncodingCatalog.update([9], lambda e: self.encodings[e], self.path)
+        self.assertEqual(self.catalog.encoding(9)[2], "Intersex")
+        self.assertEqual(self.catalog.encoding(10)[11021], "Birmingham")
+        self.assertEqual(self.catalog.encoding(19)["A00"], "Cholera")
+
+    def test_missing_catalog_is_empty(self):
+        self.catalog.path = Path(self.tmp.name).joinpath("missing.arrow")
+        self.catalog.load()
+        self.assertEqual(self.catalog._offsets, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+from src.field_metadata import MetadataCatalog
+from src.value_type import ValueType
+
+
+class MetadataCatalogTest(unittest.TestCase):
+    def test_lookup(self):
+        sex = MetadataCatalog.lookup(31)
+        self.assertEqual(sex.value_type, ValueType.CAT_SINGLE)
+        self.assertEqual(sex.encoding_id, 9)
+        self.assertFalse(sex.instanced)
+        self.assertTrue(sex.is_categorical)
+
+    def test_lookup_by_column(self):
+        self.assertIs(
+            MetadataCatalog.lookup("21001-1.0"), MetadataCatalog.lookup("21001")
+        )
+
+    def test_instances_and_arrays(self):
+        bmi = MetadataCatalog.lookup("21001")
+        self.assertTrue(bmi.instanced)
+        self.assertIsNone(bmi.encoding_id)
+        self.assertEqual(list(bmi.instances), [0, 1, 2, 3])
+        self.assertEqual(bmi.columns()[:2], ["21001-0.0", "21001-1.0"])
+
+    def test_unknown_field(self):
+        self.assertIsNone(MetadataCatalog.get("0"))
+        with self.assertRaises(KeyError):
+            MetadataCatalog.lookup("0")
+
+    def test_fields_by_value_type(self):
+        numeric = MetadataCatalog.fields([ValueType.CONT])
+        self.assertTrue(numeric)
+        self.assertTrue(all(f.value_type == ValueType.CONT for f in numeric))
+
+
+if __name__ == "__main__":
+    unittest.main()
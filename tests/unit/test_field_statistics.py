@@ -0,0 +1,63 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.field_statistics import (
+    HISTOGRAM_BINS,
+    ColumnStatistics,
+    FieldStatisticsIndex,
+    _meta_id,
+)
+
+
+class FieldStatisticsTest(unittest.TestCase):
+    def test_compute(self):
+        values = pd.Series(["22.5", "", None, "31.2", "22.5", "abc"])
+        statistics = ColumnStatistics.compute(values)
+        self.assertEqual(statistics.count, 4)
+        self.assertEqual(statistics.null_count, 2)
+        self.assertEqual(statistics.distinct_count, 3)
+        self.assertEqual((statistics.min, statistics.max), (22.5, 31.2))
+        self.assertEqual(len(statistics.histogram_counts), HISTOGRAM_BINS)
+        self.assertEqual(sum(statistics.histogram_counts), 3)
+
+    def test_compute_without_numeric_values(self):
+        statistics = ColumnStatistics.compute(pd.Series([np.nan, np.nan]))
+        self.assertEqual(statistics.count, 0)
+        self.assertIsNone(statistics.min)
+        self.assertEqual(statistics.histogram_counts, [])
+
+    def test_round_trip(self):
+        statistics = ColumnStatistics.compute(pd.Series([1.0, 2.0, 3.0]))
+        restored = ColumnStatistics.from_dict(statistics.to_dict())
+        self.assertEqual(restored.to_dict(), statistics.to_dict())
+
+    def test_update(self):
+        columns = {
+            "31-0.0": pd.Series([0.0, 1.0]),
+            "21001-0.0": pd.Series([20.0, 30.0]),
+            "50-0.0": pd.Series([170.0]),
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp).joinpath("statistics.json")
+            FieldStatisticsIndex.build(["31-0.0", "21001-0.0"], columns.get, path)
+            columns["21001-0.0"] = pd.Series([10.0, 40.0, 25.0])
+            FieldStatisticsIndex.update(["21001-0.0", "50-0.0"], columns.get, path)
+            with open(path) as f:
+                statistics = json.load(f)["columns"]
+        self.assertEqual(list(statistics), ["31-0.0", "21001-0.0", "50-0.0"])
+        self.assertEqual(statistics["31-0.0"]["maximum"], 1.0)
+        self.assertEqual(statistics["21001-0.0"]["count"], 3)
+        self.assertEqual(statistics["21001-0.0"]["maximum"], 40.0)
+
+    def test_meta_id(self):
+        self.assertEqual(_meta_id("_21001_1_0"), "21001-1.0")
+        self.assertEqual(_meta_id("21001-1.0"), "21001-1.0")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.graph_data import weighted_describe
+
+
+class WeightedDescribeTest(unittest.TestCase):
+    def assert_describes(self, series: pd.Series):
+        counts = series.value_counts()
+        pd.testing.assert_series_equal(
+            weighted_describe(counts.index.to_numpy(float), counts.to_numpy(float)),
+            series.describe(),
+            check_names=False,
+        )
+
+    def test_matches_describe(self):
+        rng = np.random.default_rng(0)
+        for size in (1, 2, 3, 10, 1000):
+            self.assert_describes(pd.Series(rng.choice([-3.0, 1.0, 2.0, 5.0], size)))
+
+    def test_ignores_missing_values(self):
+        self.assert_describes(pd.Series([1.0, np.nan, 2.0, 2.0]))
+
+    def test_no_values(self):
+        self.assert_describes(pd.Series([np.nan]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.instances import to_long
+
+
+class InstancesTest(unittest.TestCase):
+    def test_to_long(self):
+        wide = pd.DataFrame(
+            {
+                "eid": [1000001, 1000002, 1000003],
+                "21001-0.0": [22.5, 31.2, np.nan],
+                "21001-2.0": [23.1, np.nan, 27.4],
+            }
+        )
+        long = to_long(wide)
+        self.assertEqual(list(long.columns), ["eid", "instance", "value"])
+        self.assertEqual(long["instance"].tolist(), [0, 0, 2, 2])
+        self.assertEqual(long["eid"].tolist(), [1000001, 1000002, 1000001, 1000003])
+        self.assertEqual(long["value"].tolist(), [22.5, 31.2, 23.1, 27.4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src import local_engine
+from src.aggregates import Count, Max, Min
+from src.dataset_gateway import Query
+from src.predicates import InList, Range
+
+
+class LocalEngineTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.frame = pd.DataFrame(
+            {
+                "eid": np.arange(1000000, 1001000),
+                "31-0.0": rng.choice([0.0, 1.0, np.nan], 1000),
+                "21001-0.0": rng.uniform(15, 45, 1000),
+                "20002-0.0": rng.choice(["1065", "1074", "", "abc"], 1000),
+            }
+        )
+        self.chunks = [self.frame.iloc[i : i + 128] for i in range(0, 1000, 128)]
+
+    def test_projection(self):
+        _query = Query(["eid", "21001-0.0"]).filter(InList("31-0.0", ["1"]))
+        result = local_engine.execute(_query, self.chunks)
+        expected = self.frame.loc[self.frame["31-0.0"] == 1, ["eid", "21001-0.0"]]
+        self.assertTrue(result.equals(expected.reset_index(drop=True)))
+
+    def test_min_max_of_several_columns(self):
+        _query = Query(["eid", "21001-0.0", "20002-0.0"]).get_min_max()
+        result = local_engine.execute(_query, self.chunks)
+        self.assertEqual(
+            list(result.columns),
+            ["min(21001-0.0)", "max(21001-0.0)", "min(20002-0.0)", "max(20002-0.0)"],
+        )
+        bmi = self.frame["21001-0.0"]
+        self.assertEqual(result.iloc[0].tolist(), [bmi.min(), bmi.max(), 1065, 1074])
+
+    def test_group_by(self):
+        _query = Query(["eid"]).aggregate(
+            Count(), Min("21001-0.0"), Max("21001-0.0"), group_by="31-0.0"
+        )
+        _query.filter(Range("21001-0.0", 20, 40))
+        result = local_engine.execute(_query, self.chunks)
+
+        selected = self.frame[self.frame["21001-0.0"].between(20, 40)]
+        expected = selected.groupby("31-0.0")["21001-0.0"].agg(["size", "min", "max"])
+        self.assertEqual(result["31-0.0"].tolist(), [0.0, 1.0])
+        self.assertEqual(result["count"].tolist(), expected["size"].tolist())
+        self.assertEqual(result["min(21001-0.0)"].tolist(), expected["min"].tolist())
+        self.assertEqual(result["max(21001-0.0)"].tolist(), expected["max"].tolist())
+
+    def test_cross_tabulation(self):
+        _query = Query(["eid"]).group_count("20002-0.0", "31-0.0")
+        result = local_engine.execute(_query, self.chunks)
+
+        selected = self.frame[self.frame["20002-0.0"] != ""]
+        expected = selected.value_counts(["20002-0.0", "31-0.0"]).sort_index()
+        self.assertEqual(list(result.columns), ["20002-0.0", "31-0.0", "count"])
+        self.assertEqual(
+            list(zip(result["20002-0.0"], result["31-0.0"])), expected.index.tolist()
+        )
+        self.assertEqual(result["count"].tolist(), expected.tolist())
+
+    def test_aggregate_without_rows(self):
+        _query = Query(["eid", "21001-0.0"]).get_min_max()
+        _query.filter(Range("21001-0.0", 50, 60))
+        result = local_engine.execute(_query, self.chunks)
+        self.assertEqual(len(result), 1)
+        self.assertTrue(result.iloc[0].isna().all())
+
+    def test_plan_compiles_to_sql(self):
+        sql = Query(["eid"]).group_count("31-0.0").build()
+        self.assertIn("SELECT 31-0.0,COUNT(*)", sql)
+        self.assertTrue(sql.endswith("GROUP BY 31-0.0 ORDER BY 31-0.0"))
+
+        sql = Query(["eid"]).group_count("20002-0.0", "31-0.0").build()
+        self.assertIn("SELECT 20002-0.0,31-0.0,COUNT(*)", sql)
+        self.assertTrue(
+            sql.endswith("GROUP BY 20002-0.0,31-0.0 ORDER BY 20002-0.0,31-0.0")
+        )
+
+    def test_raw_sql_conditions_are_rejected(self):
+        with self.assertRaises(NotImplementedError):
+            local_engine.execute(Query(["eid"], where="1 = 1"), self.chunks)
+
+
+if __name__ == "__main__":
+    unittest.main()
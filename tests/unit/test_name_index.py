@@ -0,0 +1,60 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.dataset_gateway import Singleton
+from src.tree.name_index import NameIndex
+from src.tree.node import NodeIdentifier
+
+
+class NameIndexTest(unittest.TestCase):
+    def setUp(self):
+        hierarchy = pd.DataFrame(
+            {
+                "FieldID": [np.nan, 31, 21001, 21001, 21001],
+                "NodeName": [
+                    "Population characteristics",
+                    "Sex",
+                    "Body mass index (BMI)",
+                    "Initial assessment visit",
+                    "Imaging visit",
+                ],
+                "InstanceID": [np.nan, np.nan, np.nan, 0, 2],
+                "RelatedFieldID": [np.nan] * 5,
+            }
+        )
+        self.previous = Singleton._instances.pop(NameIndex, None)
+        Singleton._instances[NameIndex] = super(Singleton, NameIndex).__call__(
+            hierarchy
+        )
+
+    def tearDown(self):
+        Singleton._instances.pop(NameIndex)
+        if self.previous is not None:
+            Singleton._instances[NameIndex] = self.previous
+
+    def test_field_name(self):
+        self.assertEqual(NameIndex.field_name(31), "Sex")
+        self.assertEqual(NameIndex.field_name("21001"), "Body mass index (BMI)")
+
+    def test_instance_names(self):
+        self.assertEqual(NameIndex.instance_names("31"), {"31-0.0": "Sex"})
+        self.assertEqual(
+            NameIndex.instance_names("21001"),
+            {"21001-0.0": "Initial assessment visit", "21001-2.0": "Imaging visit"},
+        )
+        # Callers can't modify the index
+        NameIndex.instance_names("31").clear()
+        self.assertEqual(NameIndex.instance_names("31"), {"31-0.0": "Sex"})
+
+    def test_axis_title(self):
+        node_id = NodeIdentifier("21001-2.0")
+        title = NameIndex.axis_title(node_id)
+        self.assertEqual(title, f"Body mass index (BMI) ({node_id.db_id()})")
+        self.assertIs(NameIndex.axis_title(node_id), title)
+        self.assertIsNone(NameIndex.axis_title(None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.packed_fields import PackedField
+
+
+class PackedFieldTest(unittest.TestCase):
+    def setUp(self):
+        self.eids = np.array([1000010, 1000022, 1000035, 1000046])
+        slots = pd.DataFrame(
+            {
+                "20002-0.0": [1065.0, np.nan, 1111.0, 1065.0],
+                "20002-0.1": [1226.0, np.nan, 1065.0, 1065.0],
+                "20002-0.2": [np.nan, np.nan, 1074.0, np.nan],
+            }
+        )
+        self.packed = PackedField.from_columns(self.eids, slots)
+
+    def test_from_columns(self):
+        self.assertEqual(len(self.packed), 4)
+        self.assertEqual(list(self.packed.dictionary), ["1065", "1074", "1111", "1226"])
+        np.testing.assert_array_equal(self.packed.offsets, [0, 2, 2, 5, 7])
+        np.testing.assert_array_equal(self.packed.codes, [0, 3, 2, 0, 1, 0, 0])
+
+    def test_from_string_columns(self):
+        slots = pd.DataFrame(
+            {"20002-0.0": ["1065", "", "1111"], "20002-0.1": ["", "", "1065"]}
+        )
+        packed = PackedField.from_columns(self.eids[:3], slots)
+        self.assertEqual(list(packed.dictionary), ["1065", "1111"])
+        np.testing.assert_array_equal(packed.offsets, [0, 1, 1, 3])
+
+    def test_count_once_per_participant(self):
+        counts = self.packed.count()
+        self.assertEqual(counts["value"].tolist(), ["1065", "1074", "1111", "1226"])
+        # The last participant reports 1065 twice
+        self.assertEqual(counts["count"].tolist(), [3, 1, 1, 1])
+
+    def test_count_rows(self):
+        counts = self.packed.count(rows=np.array([True, True, False, True]))
+        self.assertEqual(counts["value"].tolist(), ["1065", "1226"])
+        self.assertEqual(counts["count"].tolist(), [2, 1])
+
+    def test_count_groups(self):
+        counts = self.packed.count(groups=np.array([0, 1, 1, 0]))
+        self.assertEqual(
+            counts.to_dict("list"),
+            {
+                "group": [0, 0, 1, 1, 1],
+                "value": ["1065", "1226", "1065", "1074", "1111"],
+                "count": [2, 1, 1, 1, 1],
+            },
+        )
+
+    def test_contains(self):
+        np.testing.assert_array_equal(
+            self.packed.contains([1226, 1074]), [True, False, True, False]
+        )
+        np.testing.assert_array_equal(self.packed.contains(["9999"]), [False] * 4)
+
+    def test_between(self):
+        packed = self.packed.between(1070, 1200)
+        self.assertEqual(len(packed), 4)
+        self.assertEqual(list(packed.dictionary), ["1074", "1111"])
+        np.testing.assert_array_equal(packed.offsets, [0, 0, 0, 2, 2])
+        np.testing.assert_array_equal(packed.codes, [1, 0])
+        self.assertEqual(packed.count()["count"].tolist(), [1, 1])
+
+    def test_arrow_round_trip(self):
+        packed = PackedField.from_arrow(self.eids, self.packed.to_arrow())
+        np.testing.assert_array_equal(packed.offsets, self.packed.offsets)
+        np.testing.assert_array_equal(packed.codes, self.packed.codes)
+        np.testing.assert_array_equal(packed.dictionary, self.packed.dictionary)
+        pd.testing.assert_frame_equal(packed.count(), self.packed.count())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.predicates import (
+    HASH_BITS,
+    InList,
+    NotNull,
+    NumericCastable,
+    Range,
+    Sample,
+    row_hash,
+    row_hash_sql,
+)
+
+
+class PredicatesTest(unittest.TestCase):
+    def setUp(self):
+        self.frame = pd.DataFrame(
+            {
+                "eid": [1000010, 1000022, 1000035, 1000046, 1000051],
+                "21001-0.0": ["22.5", "", "31.2", "abc", None],
+                "31-0.0": [0.0, 1.0, 1.0, np.nan, 0.0],
+            }
+        )
+
+    def test_not_null(self):
+        mask = NotNull("21001-0.0").mask(self.frame)
+        self.assertEqual(mask.tolist(), [True, False, True, True, False])
+
+    def test_numeric_castable(self):
+        mask = NumericCastable("21001-0.0").mask(self.frame)
+        self.assertEqual(mask.tolist(), [True, False, True, False, False])
+
+    def test_range(self):
+        mask = Range("21001-0.0", 20, 30).mask(self.frame)
+        self.assertEqual(mask.tolist(), [True, False, False, False, False])
+        self.assertIn("BETWEEN 20.0 AND 30.0", Range("_21001_0_0", 20, 30).to_sql())
+        self.assertIn(
+            "BETWEEN 20.0 AND 30.5", Range("_21001_0_0", "20", "30.5").to_sql()
+        )
+        with self.assertRaises(ValueError):
+            Range("_21001_0_0", "0 OR TRUE", 30)
+
+    def test_in_list_matches_integer_codings(self):
+        mask = InList("31-0.0", [1]).mask(self.frame)
+        self.assertEqual(mask.tolist(), [False, True, True, False, False])
+        self.assertEqual(
+            InList("_31_0_0", [0, 1]).to_sql(), 'CAST(_31_0_0 AS STRING) IN ("0", "1")'
+        )
+
+    def test_keys_identify_predicates(self):
+        self.assertEqual(Range("31-0.0", 0, 1), Range("31-0.0", 0, 1))
+        self.assertNotEqual(Range("31-0.0", 0, 1), Range("31-0.0", 0, 2))
+
+    def test_samples_are_nested(self):
+        frame = pd.DataFrame({"eid": np.arange(1000000, 1100000)})
+        small = Sample(0.01, seed=3).mask(frame)
+        large = Sample(0.1, seed=3).mask(frame)
+        self.assertTrue(np.all(large[small]))
+        self.assertAlmostEqual(large.mean(), 0.1, delta=0.01)
+
+    def test_sample_bands_partition_samples(self):
+        frame = pd.DataFrame({"eid": np.arange(1000000, 1100000)})
+        small = Sample(0.01, seed=3).mask(frame)
+        band = Sample(0.1, seed=3, start=0.01).mask(frame)
+        large = Sample(0.1, seed=3).mask(frame)
+        self.assertFalse(np.any(small & band))
+        self.assertTrue(np.array_equal(small | band, large))
+        self.assertIn(">=", Sample(0.1, start=0.01).to_sql())
+
+    def test_row_hash_sql_matches_numpy(self):
+        # Evaluate the SQL expression with Python integer semantics
+        eid = 1000035
+        expression = row_hash_sql("eid", seed=5).replace("CAST(eid AS INT64)", str(eid))
+        self.assertEqual(eval(expression), row_hash(np.array([eid]), seed=5)[0])
+        self.assertLess(eval(expression), 1 << HASH_BITS)
+
+
+if __name__ == "__main__":
+    unittest.main()
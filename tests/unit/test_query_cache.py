@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.query_cache import LRUCache
+
+
+def _frame(rows):
+    return pd.DataFrame({"eid": np.arange(rows), "21001-0.0": np.ones(rows)})
+
+
+class LRUCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.entry_size = int(_frame(100).memory_usage(index=True, deep=True).sum())
+        self.cache = LRUCache(max_bytes=2 * self.entry_size)
+
+    def test_hit_and_miss(self):
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.set("a", _frame(100))
+        pd.testing.assert_frame_equal(self.cache.get("a"), _frame(100))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.set("a", _frame(100))
+        self.cache.set("b", _frame(100))
+        self.cache.get("a")
+        self.cache.set("c", _frame(100))
+        self.assertIn("a", self.cache)
+        self.assertNotIn("b", self.cache)
+        self.assertLessEqual(self.cache.current_bytes, self.cache.max_bytes)
+
+    def test_oversized_entry_is_not_cached(self):
+        self.cache.set("a", _frame(100))
+        self.cache.set("big", _frame(1000))
+        self.assertNotIn("big", self.cache)
+        self.assertIn("a", self.cache)
+
+    def test_results_are_isolated_from_callers(self):
+        self.cache.set("a", _frame(100))
+        result = self.cache.get("a")
+        result["21001-0.0"] = 0.0
+        self.assertEqual(self.cache.get("a")["21001-0.0"].sum(), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
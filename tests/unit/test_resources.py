@@ -0,0 +1,69 @@
+import os
+import unittest
+from queue import Empty
+
+from urllib3.exceptions import EmptyPoolError
+
+from src.resources import (
+    InstrumentedConnectionPool,
+    InstrumentedHTTPAdapter,
+    ResourceManager,
+)
+
+
+class ResourceManagerTest(unittest.TestCase):
+    def test_resources_are_created_once_per_process(self):
+        manager = ResourceManager()
+        created = []
+        factory = lambda: created.append(object()) or created[-1]
+        self.assertIs(manager.get("client", factory), manager.get("client", factory))
+        self.assertEqual(len(created), 1)
+
+        # A forked worker creates its own resources
+        manager._after_fork()
+        self.assertIsNot(manager.get("client", factory), created[0])
+        self.assertEqual(len(created), 2)
+
+    def test_fork_callbacks(self):
+        manager = ResourceManager()
+        resets = []
+        manager.on_fork(lambda: resets.append(os.getpid()))
+        manager._after_fork()
+        self.assertEqual(resets, [os.getpid()])
+
+    def test_metrics_of_unused_resources(self):
+        self.assertEqual(ResourceManager().metrics(), {"pid": os.getpid()})
+
+
+class InstrumentedConnectionPoolTest(unittest.TestCase):
+    def test_pool_is_bounded_and_timed(self):
+        pool = InstrumentedConnectionPool(max_connections=2, timeout=0.01)
+        pool.pool.get(timeout=pool.timeout)
+        pool.pool.get(timeout=pool.timeout)
+        with self.assertRaises(Empty):
+            pool.pool.get(timeout=pool.timeout)
+
+        metrics = pool.to_dict()
+        self.assertEqual(metrics["max_connections"], 2)
+        self.assertEqual(metrics["acquired"], 2)
+        self.assertEqual(metrics["timeouts"], 1)
+        self.assertGreaterEqual(metrics["max_wait_ms"], 0)
+
+
+class InstrumentedHTTPAdapterTest(unittest.TestCase):
+    def test_pools_are_bounded_and_timed(self):
+        adapter = InstrumentedHTTPAdapter(pool_maxsize=1)
+        pool = adapter.poolmanager.connection_from_url("https://bigquery.local")
+        pool._get_conn(timeout=0.01)
+        with self.assertRaises(EmptyPoolError):
+            pool._get_conn(timeout=0.01)
+
+        metrics = adapter.to_dict()
+        self.assertEqual(metrics["max_connections"], 1)
+        self.assertEqual((metrics["connections"], metrics["in_use"]), (1, 1))
+        self.assertEqual(metrics["acquired"], 1)
+        self.assertEqual(metrics["timeouts"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
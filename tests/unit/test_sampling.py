@@ -0,0 +1,76 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.dataset_gateway import Query
+from src.predicates import row_hash
+from src.sampling import BAND_EDGES, Sampler, _missing_runs
+
+
+class SamplingTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.frame = pd.DataFrame(
+            {
+                "eid": np.arange(1000000, 1010000),
+                "21001-0.0": rng.normal(27, 4, 10000),
+                "31-0.0": rng.choice([0.0, 1.0], 10000, p=[0.8, 0.2]),
+            }
+        )
+        self.query = Query(["eid", "21001-0.0"])
+
+    def test_uniform_sample_takes_lowest_hashes(self):
+        sample, complete = Sampler(self.query, seed=3)._select(self.frame, 100)
+        self.assertTrue(complete)
+        self.assertEqual(list(sample.columns), ["eid", "21001-0.0"])
+        hashes = row_hash(self.frame["eid"].to_numpy(), 3)
+        expected = self.frame["eid"].to_numpy()[np.argsort(hashes)[:100]]
+        self.assertEqual(sorted(sample["eid"]), sorted(expected))
+
+    def test_samples_are_nested(self):
+        sampler = Sampler(self.query, seed=1)
+        small, _ = sampler._select(self.frame, 100)
+        large, _ = sampler._select(self.frame, 1000)
+        self.assertTrue(set(small["eid"]).issubset(large["eid"]))
+
+    def test_seeds_draw_different_samples(self):
+        first, _ = Sampler(self.query, seed=1)._select(self.frame, 100)
+        second, _ = Sampler(self.query, seed=2)._select(self.frame, 100)
+        self.assertLess(len(set(first["eid"]) & set(second["eid"])), 20)
+
+    def test_incomplete_sample(self):
+        sample, complete = Sampler(self.query)._select(self.frame.head(50), 100)
+        self.assertFalse(complete)
+        self.assertEqual(len(sample), 50)
+
+    def test_proportional_stratified_sample(self):
+        sampler = Sampler(self.query, strata="31-0.0")
+        sample, complete = sampler._select(self.frame, 1000)
+        self.assertTrue(complete)
+        strata = self.frame.set_index("eid").loc[sample["eid"], "31-0.0"]
+        shares = self.frame["31-0.0"].value_counts(normalize=True)
+        self.assertAlmostEqual(strata.value_counts()[1.0], 1000 * shares[1.0], delta=1)
+
+    def test_equal_stratified_sample(self):
+        sampler = Sampler(self.query, strata="31-0.0", allocation="equal")
+        sample, complete = sampler._select(self.frame, 1000)
+        self.assertTrue(complete)
+        strata = self.frame.set_index("eid").loc[sample["eid"], "31-0.0"]
+        self.assertEqual(strata.value_counts().tolist(), [500, 500])
+
+    def test_rejects_limited_queries(self):
+        with self.assertRaises(ValueError):
+            Sampler(Query(["eid", "21001-0.0"]).limit_output(10))
+        with self.assertRaises(ValueError):
+            Sampler(self.query, allocation="optimal")
+
+    def test_missing_runs(self):
+        bands = list(zip(BAND_EDGES, BAND_EDGES[1:]))[:5]
+        pieces = {band: None for band in bands}
+        pieces[bands[2]] = self.frame
+        self.assertEqual(_missing_runs(bands, pieces), [bands[:2], bands[3:]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import threading
+import unittest
+
+import pandas as pd
+
+from src.single_flight import LEASE_PREFIX, SingleFlight
+
+
+class Leases:
+    """The subset of the Redis client used for leases, held in memory."""
+
+    def __init__(self):
+        self.values = {}
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value.encode()
+        return True
+
+    def exists(self, key):
+        return int(key in self.values)
+
+    def delete_if_equal(self, key, value):
+        if self.values.get(key) != value.encode():
+            return False
+        del self.values[key]
+        return True
+
+
+class SingleFlightTest(unittest.TestCase):
+    def setUp(self):
+        self.result = pd.DataFrame({"eid": [1000010, 1000022], "31-0.0": [0, 1]})
+
+    def test_concurrent_requests_are_coalesced(self):
+        single_flight = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+
+        def compute():
+            started.set()
+            release.wait(5)
+            return self.result
+
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(
+                single_flight.do("key", lambda: None, compute)
+            )
+        )
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(
+                target=lambda: results.append(
+                    single_flight.do("key", lambda: None, compute)
+                )
+            )
+            for _ in range(3)
+        ]
+        for follower in followers:
+            follower.start()
+        while single_flight.stats.coalesced_local < 3:
+            pass
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+
+        self.assertEqual(single_flight.stats.executions, 1)
+        self.assertEqual(single_flight.stats.coalesced, 3)
+        self.assertEqual(len(results), 4)
+        for result in results:
+            pd.testing.assert_frame_equal(result, self.result)
+
+    def test_sequential_requests_are_executed(self):
+        single_flight = SingleFlight()
+        single_flight.do("key", lambda: None, lambda: self.result)
+        single_flight.do("key", lambda: None, lambda: self.result)
+        self.assertEqual(single_flight.stats.executions, 2)
+        self.assertEqual(single_flight.stats.coalesced, 0)
+
+    def test_errors_are_raised_and_not_cached(self):
+        single_flight = SingleFlight()
+
+        def fail():
+            raise RuntimeError("Query failed")
+
+        with self.assertRaises(RuntimeError):
+            single_flight.do("key", lambda: None, fail)
+        single_flight.do("key", lambda: None, lambda: self.result)
+        self.assertEqual(single_flight.stats.executions, 2)
+
+    def test_lease_is_released(self):
+        leases = Leases()
+        SingleFlight(leases).do("key", lambda: None, lambda: self.result)
+        self.assertFalse(leases.exists(LEASE_PREFIX + "key"))
+
+    def test_lease_of_other_worker_is_kept(self):
+        leases = Leases()
+
+        def compute():
+            # Our lease expired and was taken by another worker
+            leases.values[LEASE_PREFIX + "key"] = b"other-worker"
+            return self.result
+
+        SingleFlight(leases).do("key", lambda: None, compute)
+        self.assertTrue(leases.exists(LEASE_PREFIX + "key"))
+
+    def test_waits_for_other_worker(self):
+        leases = Leases()
+        leases.set(LEASE_PREFIX + "key", "other-worker")
+        single_flight = SingleFlight(leases, poll_interval=0.01)
+        cached = []
+        # The other worker caches its result and releases its lease
+        threading.Timer(
+            0.05,
+            lambda: (
+                cached.append(self.result),
+                leases.delete_if_equal(LEASE_PREFIX + "key", "other-worker"),
+            ),
+        ).start()
+
+        result = single_flight.do(
+            "key", lambda: cached[0] if cached else None, lambda: None
+        )
+        pd.testing.assert_frame_equal(result, self.result)
+        self.assertEqual(single_flight.stats.executions, 0)
+        self.assertEqual(single_flight.stats.coalesced_remote, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
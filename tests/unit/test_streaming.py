@@ -0,0 +1,62 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.streaming import MinMax, aggregate, collect
+
+
+class StreamingTest(unittest.TestCase):
+    def setUp(self):
+        self.frame = pd.DataFrame(
+            {
+                "eid": np.arange(1000000, 1000010),
+                "31-0.0": [0.0, 1.0, 1.0, np.nan, 0.0, 1.0, 0.0, 0.0, np.nan, 1.0],
+                "21001-0.0": [
+                    22.5,
+                    np.nan,
+                    31.2,
+                    19.0,
+                    40.1,
+                    25.0,
+                    27.3,
+                    30.0,
+                    18.2,
+                    33.3,
+                ],
+            }
+        )
+        self.chunks = [self.frame.iloc[i : i + 3] for i in range(0, 10, 3)]
+
+    def test_collect(self):
+        result = collect(self.chunks, list(self.frame.columns))
+        pd.testing.assert_frame_equal(result, self.frame)
+
+    def test_collect_stops_at_limit(self):
+        consumed = []
+
+        def chunks():
+            for chunk in self.chunks:
+                consumed.append(chunk)
+                yield chunk
+
+        result = collect(chunks(), list(self.frame.columns), limit=4)
+        self.assertEqual(result["eid"].tolist(), list(range(1000000, 1000004)))
+        self.assertEqual(len(consumed), 2)
+
+    def test_collect_without_chunks(self):
+        result = collect([], ["eid", "31-0.0"])
+        self.assertEqual(list(result.columns), ["eid", "31-0.0"])
+        self.assertEqual(len(result), 0)
+
+    def test_aggregates_match_whole_frame(self):
+        (min_max,) = aggregate(self.chunks, MinMax("21001-0.0"))
+        self.assertEqual(min_max.iloc[0].tolist(), [18.2, 40.1])
+
+    def test_min_max_of_empty_column(self):
+        (min_max,) = aggregate([self.frame.iloc[3:4]], MinMax("31-0.0"))
+        self.assertTrue(min_max.isna().all(axis=None))
+
+
+if __name__ == "__main__":
+    unittest.main()